@@ -1,31 +1,50 @@
-from flask import Flask, make_response, request, jsonify
+from flask import Flask, Response, make_response, redirect, request, jsonify, send_file
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from video_processor import VideoProcessor
+from frame_extractor import EncodedFrame
+from ingest_pipeline import IngestPipeline, PipelineStats
+from ingest_jobs import IngestJob, IngestJobManager, snapshot_events
+from frame_index import FrameIndex
+from sampling import SAMPLERS, sample_frames
+from frame_cache import FrameCache, FRAME_PREFETCH_AHEAD
+from disk_cache import DiskCache
+from video_cache import VideoCache
+from meta_cache import FrameSetMeta, MetaCache
+from phash import NearDuplicateFilter, from_hex as phash_from_hex, to_hex as phash_to_hex
 from dotenv import load_dotenv
 import os
 import utils
 import cv2
 import base64
-import random
+import json
 import uuid
 import tempfile
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 # ============================= INITIALIZATION ===============================
 # Load environment variables
 load_dotenv()
 
-# Initialize R2 Storage
-from storage.r2_storage import R2Storage
-r2_storage = R2Storage()
+# Initialize the storage backend (R2 or local, see STORAGE_BACKEND)
+from storage import LocalStorage, get_storage
+from storage.r2_storage import PRESIGNED_URL_TTL
+storage_backend = get_storage()
 
 # Import database functions
 try:
     from database.database import (
-        init_db, save_annotation_session, save_frame_annotation,
-        update_session_progress, load_annotation_session,
+        init_db, load_annotation_session,
         list_annotation_sessions, delete_annotation_session,
-        create_user_token, validate_user_token
+        create_user_token, validate_user_token, deactivate_user_token,
+        update_session_total_frames,
+        auto_save_frame_annotation, save_frame_annotations_bulk,
+        begin_request_scope, end_request_scope, pool_stats,
+        get_session_owner, cache_stats
     )
     DB_AVAILABLE = True
 except Exception as e:
@@ -39,90 +58,779 @@ CORS(app, origins = ['https://pose-annotator.onrender.com'])
 if DB_AVAILABLE:
     init_db()
 
+    # All DB calls of a request share one pooled connection and transaction,
+    # committed before the response is sent
+    @app.before_request
+    def _begin_db_scope():
+        begin_request_scope()
+
+    @app.after_request
+    def _commit_db_scope(response):
+        try:
+            end_request_scope()
+        except Exception as e:
+            print(f"Error committing request transaction: {e}")
+            response = jsonify({'error': f'Failed to commit changes: {e}'})
+            response.status_code = 500
+        return response
+
+    @app.teardown_request
+    def _end_db_scope(error = None):
+        # Rolls back if the request failed before committing
+        try:
+            end_request_scope(commit = False)
+        except Exception as e:
+            print(f"Error ending request transaction: {e}")
+
 # ============================== CONFIGURATION ===============================
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
+CROP_SIDES = {'left', 'right', 'top', 'bottom'}
 
 # R2 Storage folders (prefixes)
 R2_FRAMESETS_PREFIX = 'frame_sets'
 
-# Store video processors and frame sets in memory (cache)
-FRAME_SETS_META = {} # frame_set_id -> metadata
+# Frame set metadata in memory (cache), bounded and compact
+FRAME_SETS_META = MetaCache() # frame_set_id -> FrameSetMeta
+
+# Background frame set ingest (keeps the request workers free)
+INGEST_JOBS = IngestJobManager(store = storage_backend)
+
+# Time spent in each stage of the ingest pipelines of this process
+PIPELINE_STATS = PipelineStats()
+
+# Frame images never change once uploaded, so clients and CDNs may cache
+# them for a year
+FRAME_CACHE_MAX_AGE = int(os.getenv('FRAME_CACHE_MAX_AGE', 31536000))
+
+# Recently viewed, prefetched and freshly ingested frame JPEGs, keyed by
+# (frame_set_id, frame_idx)
+FRAME_CACHE = FrameCache()
+
+# Max frames per GET /frame-set/<id>/frames
+FRAMES_BATCH_MAX = int(os.getenv('FRAMES_BATCH_MAX', 64))
+
+# Frame JPEGs and frame set metadata on local disk, keyed by their R2 key;
+# shared by all workers and kept across restarts. Disabled for local
+# storage, whose frames are already on disk
+DISK_CACHE = DiskCache(max_bytes = 0) \
+    if isinstance(storage_backend, LocalStorage) else DiskCache()
+
+# How frame images reach the client:
+#   'proxy'     - frame_url points at this API, which streams from R2
+#   'redirect'  - frame_url points at this API, which redirects (302) to a
+#                 presigned R2 URL
+#   'presigned' - frame_url is a presigned R2 URL; the API never sees the
+#                 image bytes
+FRAME_SERVING_MODES = {'proxy', 'redirect', 'presigned'}
+FRAME_SERVING = os.getenv('FRAME_SERVING', 'proxy')
+if FRAME_SERVING not in FRAME_SERVING_MODES:
+    raise ValueError(f"FRAME_SERVING must be one of {sorted(FRAME_SERVING_MODES)}")
+if FRAME_SERVING != 'proxy' and not storage_backend.supports_presigned:
+    print(f"Warning: FRAME_SERVING '{FRAME_SERVING}' needs presigned URLs, "
+          f"which {type(storage_backend).__name__} lacks; using 'proxy'")
+    FRAME_SERVING = 'proxy'
+
+# How frames are stored in R2:
+#   'objects' - one object per frame, frame_sets/<id>/frames/frame_<idx>.jpg
+#   'pack'    - one object per ingest (frame_sets/<id>/frames.<start>.pack)
+#               holding the JPEGs back to back, read with range GETs
+# Either way, a frame's location is its `r2_key` (plus offset and length)
+# in meta.json's frame_paths. Don't derive keys from frame indices: frames
+# re-indexed after dedup (see _renumber_frames) keep the key they were
+# uploaded under.
+FRAME_STORAGE_LAYOUTS = {'objects', 'pack'}
+FRAME_STORAGE_LAYOUT = os.getenv('FRAME_STORAGE_LAYOUT', 'objects')
+
+# Near-duplicate rejection: max perceptual-hash Hamming distance (negative
+# disables it) and how many times rejected frames are resampled
+DEDUP_DISTANCE = int(os.getenv('DEDUP_DISTANCE', -1))
+DEDUP_MAX_ROUNDS = int(os.getenv('DEDUP_MAX_ROUNDS', 3))
+
+# Local copies of kept videos, for extending frame sets (size-bounded, see
+# VIDEO_CACHE_MB)
+VIDEO_CACHE = VideoCache()
+
+# Deletes the R2 files of deleted sessions in the background, one frame
+# set at a time
+_CLEANUP_EXECUTOR = ThreadPoolExecutor(max_workers = 1,
+                                       thread_name_prefix = 'cleanup')
+
+# Serializes extensions of the same frame set within this process:
+# frame_set_id -> [lock, number of holders and waiters]
+_EXTEND_LOCKS = {}
+_EXTEND_LOCKS_LOCK = threading.Lock()
 
 # ================================= HELPERS ==================================
 def _is_valid_video_file(filename: str) -> bool:
     return ('.' in filename and filename.rsplit('.', 1)[1].lower() in
             ALLOWED_EXTENSIONS)
 
-# def _frame_to_base64(frame: np.ndarray) -> bytes:
-#     """Convert a frame to base64 encoded JPEG."""
-#     _, buffer = cv2.imencode('.jpg', frame)
-#     return base64.b64encode(buffer).decode('utf-8')
+def _compact_meta(frame_set_id: str, meta: dict,
+                  etag: str = None) -> FrameSetMeta:
+    frame_set_meta = FrameSetMeta(
+        meta, f"{R2_FRAMESETS_PREFIX}/{frame_set_id}/frames/", etag)
+    FRAME_SETS_META.put(frame_set_id, frame_set_meta)
+    return frame_set_meta
+
+def _cache_meta(frame_set_id: str, meta: dict, etag: str = None) -> FrameSetMeta:
+    """
+    Cache metadata in memory (compacted) and, with the `etag` of the stored
+    meta.json it was read from, on disk
+    """
+    object_key = f"{R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json"
+    if etag:
+        DISK_CACHE.put(object_key, json.dumps(
+            {'etag': etag, 'meta': meta}).encode('utf-8'))
+    else:
+        # A disk copy can't be revalidated without its ETag
+        DISK_CACHE.delete(object_key)
+    return _compact_meta(frame_set_id, meta, etag)
+
+def _invalidate_meta(frame_set_id: str):
+    FRAME_SETS_META.invalidate(frame_set_id)
+    DISK_CACHE.delete(f"{R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json")
+
+def _load_meta(frame_set_id: str, min_count: int = 0) -> FrameSetMeta:
+    """
+    Load metadata from cache (memory, then disk) or R2. Since other servers
+    may have extended the frame set, cached copies are only used while
+    their ETag still matches R2's (checked with a HEAD request). The memory
+    copy is checked at most every META_REVALIDATE_AFTER seconds, or right
+    away when it has fewer than `min_count` frames (e.g. a frame index
+    past its end was requested)
+    """
+    object_key = f"{R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json"
 
-def _load_meta(frame_set_id: str) -> dict:
-    """Load metadata from cache or R2"""
     # Check the cache first
-    if frame_set_id in FRAME_SETS_META:
-        return FRAME_SETS_META[frame_set_id]
+    meta = FRAME_SETS_META.get(frame_set_id)
+    if meta is not None:
+        if not meta.needs_revalidation(min_count):
+            return meta
+        if meta.etag and meta.etag == storage_backend.get_etag(object_key):
+            meta.checked_at = time.time()
+            return meta
+    else:
+        data = DISK_CACHE.get(object_key)
+        if data is not None:
+            cached = json.loads(data)
+            if 'etag' in cached and \
+                    cached['etag'] == storage_backend.get_etag(object_key):
+                return _compact_meta(frame_set_id, cached['meta'],
+                                     cached['etag'])
     
     # Load from R2
-    object_key = f"{R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json"
-    meta = r2_storage.download_json(object_key)
+    meta, etag = storage_backend.download_json_with_etag(object_key)
 
     if not meta:
+        _invalidate_meta(frame_set_id)
         raise FileNotFoundError(f"Metadata for frame set {frame_set_id} not found in R2")
     
-    # Cache in memory
-    FRAME_SETS_META[frame_set_id] = meta
-    
-    return meta
+    return _cache_meta(frame_set_id, meta, etag)
+
+def _is_packed(frame_info: dict) -> bool:
+    return 'offset' in frame_info
+
+def _frame_url(frame_set_id: str, frame_info: dict, job_id: str = None) -> str:
+    """
+    Return the URL the client loads a frame image from. With the `job_id`
+    of its ingest, the URL works before the frame set's metadata is saved.
+    """
+    # Packed frames are byte ranges, which a plain presigned URL can't select
+    if FRAME_SERVING == 'presigned' and not _is_packed(frame_info):
+        return storage_backend.get_presigned_url(frame_info['r2_key'])
+    url = f"/frame-set/{frame_set_id}/frame/{frame_info['frame_idx']}.jpg"
+    return f"{url}?job={job_id}" if job_id else url
+
+def _frame_urls(frame_set_id: str, meta: FrameSetMeta) -> list[str]:
+    """Return the image URLs of all frames of a set, in index order."""
+    frame_infos = [meta.frame_info(idx) for idx in range(meta.count)]
+    if FRAME_SERVING == 'presigned':
+        # Sign the whole set at once
+        urls = storage_backend.get_presigned_urls(
+            [info['r2_key'] for info in frame_infos
+             if info and not _is_packed(info)])
+    else:
+        urls = {}
+    return [None if not info else urls.get(info['r2_key']) or
+            _frame_url(frame_set_id, info) for info in frame_infos]
+
+def _frame_cache_key(frame_info: dict) -> str:
+    """Disk cache key of a frame: its R2 key, plus its offset if packed."""
+    if _is_packed(frame_info):
+        return f"{frame_info['r2_key']}@{frame_info['offset']}"
+    return frame_info['r2_key']
+
+def _frame_request(frame_info: dict):
+    """The `R2Storage.get_many` request of a frame: its key, or the byte
+    range of its pack."""
+    if _is_packed(frame_info):
+        return (frame_info['r2_key'], frame_info['offset'], frame_info['length'])
+    return frame_info['r2_key']
+
+def _download_frame(frame_info: dict) -> bytes:
+    if _is_packed(frame_info):
+        # Read just the frame out of its pack
+        return storage_backend.get_bytes(
+            frame_info['r2_key'], frame_info['offset'], frame_info['length'])
+    return storage_backend.get_bytes(frame_info['r2_key'])
+
+def _load_frame(frame_info: dict) -> bytes:
+    """Return a frame JPEG from the disk cache, or download and cache it."""
+    cache_key = _frame_cache_key(frame_info)
+    data = DISK_CACHE.get(cache_key)
+    if data is None:
+        data = _download_frame(frame_info)
+        DISK_CACHE.put(cache_key, data)
+    return data
+
+def _prefetch_frames(frame_set_id: str, meta: FrameSetMeta, frame_idx: int):
+    """Load the FRAME_PREFETCH_AHEAD frames after `frame_idx` into the frame
+    cache in the background, since frames are mostly viewed in order."""
+    ahead = {}
+    for idx in range(frame_idx + 1, frame_idx + 1 + FRAME_PREFETCH_AHEAD):
+        info = meta.frame_info(idx)
+        if info:
+            ahead[(frame_set_id, idx)] = info
+    FRAME_CACHE.prefetch(ahead, lambda key: _load_frame(ahead[key]))
+
+def _get_frame_bytes(frame_set_id: str, meta: FrameSetMeta,
+                     frame_idx: int) -> bytes:
+    """
+    Return the JPEG of a frame, from the frame cache, the disk cache or R2,
+    and prefetch the frames after it.
+    """
+    frame_info = meta.frame_info(frame_idx)
+    data = FRAME_CACHE.get_or_load(
+        (frame_set_id, frame_idx), lambda: _load_frame(frame_info))
+    _prefetch_frames(frame_set_id, meta, frame_idx)
+    return data
+
+def _get_frames_bytes(frame_set_id: str, meta: FrameSetMeta,
+                      frame_idxs: list[int]) -> list[bytes]:
+    """
+    Return the JPEGs of several frames from the frame cache, the disk
+    cache or, for the rest, R2 with one concurrent bulk download, and
+    prefetch the frames after the last one.
+    """
+    frames, missing = [], {}
+    for i, frame_idx in enumerate(frame_idxs):
+        frame_info = meta.frame_info(frame_idx)
+        data = FRAME_CACHE.get((frame_set_id, frame_idx))
+        if data is None:
+            data = DISK_CACHE.get(_frame_cache_key(frame_info))
+            if data is not None:
+                FRAME_CACHE.put((frame_set_id, frame_idx), data)
+            else:
+                missing[_frame_request(frame_info)] = (i, frame_info)
+        frames.append(data)
+
+    for request_, data in storage_backend.get_many(missing).items():
+        if isinstance(data, Exception):
+            raise data
+        i, frame_info = missing[request_]
+        frames[i] = data
+        FRAME_CACHE.put((frame_set_id, frame_info['frame_idx']), data)
+        DISK_CACHE.put(_frame_cache_key(frame_info), data)
+
+    if frame_idxs:
+        _prefetch_frames(frame_set_id, meta, frame_idxs[-1])
+    return frames
+
+def _frame_etag(frame_set_id: str, frame_info: dict) -> str:
+    """Strong ETag of a frame image: frame sets are append-only, so the
+    frame at an index never changes (the hash guards against reuse)."""
+    return f"{frame_set_id}-{frame_info['frame_idx']}-{frame_info.get('phash', '')}"
+
+def _parse_transform(form) -> dict:
+    """
+    Parse the optional crop and rotation options of a /frame-set upload.
+
+    Raises ValueError on invalid values.
+    """
+    crop = {}
+    for key in ('width_perc', 'height_perc'):
+        value = form.get(f'crop_{key}', type = float)
+        if value is not None:
+            if not 0 < value <= 1:
+                raise ValueError(f'crop_{key} must be in (0, 1]')
+            crop[key] = value
+    for key in ('width_px', 'height_px'):
+        value = form.get(f'crop_{key}', type = int)
+        if value is not None:
+            if value <= 0:
+                raise ValueError(f'crop_{key} must be greater than 0')
+            crop[key] = value
+    side = form.get('crop_side')
+    if side:
+        if side not in CROP_SIDES:
+            raise ValueError(f"crop_side must be one of {sorted(CROP_SIDES)}")
+        crop['cropped_side'] = side
+    if crop and 'crop_from_center' in form:
+        crop['from_center'] = form.get(
+            'crop_from_center').lower() in ('1', 'true', 'yes')
+
+    rotate = form.get('rotate', 0, type = int)
+    if rotate not in (0, 90, 180):
+        raise ValueError('rotate must be 0, 90 or 180')
+
+    return {'crop': crop or None, 'rotate': rotate or None}
+
+def _extract_and_upload_frames(video_path: str, frame_set_id: str,
+                               frame_numbers: list[int], video_id: str,
+                               transform: dict = None, job: IngestJob = None,
+                               frame_index: FrameIndex = None,
+                               start_idx: int = 0,
+                               dedup: NearDuplicateFilter = None,
+                               pack = None, cached: list = None):
+    """
+    Extract frames from video and upload them as individual JPEGS to
+    storage, or append them to `pack` (see `Storage.open_pack`).
+
+    Decoding, cropping/rotating (`transform`), resizing (max height = 720
+    px), JPEG encoding and uploading run as overlapping pipeline stages.
+    Progress, and without `dedup` or `pack` the first frame as soon as it
+    is uploaded, are reported to `job`. Frames rejected by `dedup` are
+    dropped before encoding; the kept ones are indexed consecutively from
+    `start_idx`. The disk cache keys of the frames are appended to
+    `cached`, so they can be evicted if the frame set isn't saved.
+
+    Returns the kept frame numbers (in index order) and their frame paths.
+    """
+    def uploaded(idx: int, frame: EncodedFrame, info: dict):
+        if cached is not None:
+            cached.append(_frame_cache_key(info))
+        FRAME_CACHE.put((frame_set_id, idx), frame.data)
+        DISK_CACHE.put(_frame_cache_key(info), frame.data)
+
+        if job is not None:
+            # With dedup, resampled frames may still take index 0; packed
+            # frames can't be read before the pack is closed
+            if idx == 0 and dedup is None and pack is None:
+                _publish_first_frame(job, frame_set_id, info, frame.data)
+            job.advance(idx)
+
+    def upload_many(frames: list[tuple[int, EncodedFrame]]) -> dict:
+        infos = {}
+        for i, frame in frames:
+            idx = i + start_idx
+            infos[i] = {
+                'frame_num': frame.frame_num,
+                'frame_idx': idx,
+                'width': frame.width,
+                'height': frame.height,
+                'phash': phash_to_hex(frame.phash),
+                # PATH: frame_sets/{frame_set_id}/frames/frame_{idx}.jpg
+                'r2_key': pack.object_key if pack is not None else
+                    f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/frames/frame_{idx}.jpg'
+            }
+
+        results = {}
+        if pack is not None:
+            for i, frame in frames:
+                try:
+                    infos[i]['offset'], infos[i]['length'] = \
+                        pack.append(frame.data)
+                except Exception as e:
+                    results[i] = e
+        else:
+            # Upload the batch to R2 concurrently
+            errors = storage_backend.put_many(
+                {infos[i]['r2_key']: frame.data for i, frame in frames},
+                'image/jpeg')
+            results = {i: errors[infos[i]['r2_key']] for i, _ in frames
+                       if errors[infos[i]['r2_key']] is not None}
+
+        for i, frame in frames:
+            if i not in results:
+                uploaded(infos[i]['frame_idx'], frame, infos[i])
+                results[i] = infos[i]
+        return results
+
+    pipeline = IngestPipeline(upload_many = upload_many, transform = transform,
+                              frame_index = frame_index, dedup = dedup)
+    results = pipeline.run(video_path, frame_numbers)
+    PIPELINE_STATS.add(pipeline.stats)
+
+    return pipeline.accepted, {info['frame_idx']: info for info in results.values()}
+
+def _publish_first_frame(job: IngestJob, frame_set_id: str, frame_info: dict,
+                         data: bytes):
+    job.set_first_frame({
+        'frame_idx': 0,
+        'frame_num': frame_info['frame_num'],
+        'frame_img': base64.b64encode(data).decode('utf-8'),
+        'frame_url': _frame_url(frame_set_id, frame_info, job.id),
+        'render_width': frame_info['width'],
+        'render_height': frame_info['height']
+    }, frame_info)
+
+def _evict_frames(frame_set_id: str, start_idx: int, cache_keys: list[str]):
+    """Drop frames from index `start_idx` on of a frame set that was not
+    saved from the caches."""
+    FRAME_CACHE.discard(
+        lambda key: key[0] == frame_set_id and key[1] >= start_idx)
+    for cache_key in cache_keys:
+        DISK_CACHE.delete(cache_key)
+
+def _renumber_frames(frame_set_id: str, kept: list[int], frame_paths: dict,
+                     start_idx: int):
+    """
+    Re-index frames extracted over several rounds in frame order, so that
+    resampled frames don't end up after later ones. Returns the sorted
+    frame numbers and the re-indexed frame paths.
 
-def _extract_and_upload_frames(processor: VideoProcessor, frame_set_id: str,
-                               frame_numbers: list[int], video_id: str):
+    The objects are not renamed: a re-indexed frame keeps the `r2_key` it
+    was uploaded under, so `frame_{index}.jpg` may hold another index's
+    frame. Keys are only ever read from the frame paths.
     """
-    Extract franmes from video and upload them as individual JPEGS to R2.
+    order = sorted(range(len(kept)), key = lambda i: kept[i])
+    renumbered = {}
+    for new_idx, i in enumerate(order, start_idx):
+        info = frame_paths.get(start_idx + i)
+        if info is not None:
+            renumbered[new_idx] = {**info, 'frame_idx': new_idx}
+
+    # The frame cache is keyed by index; the disk cache by storage key
+    FRAME_CACHE.discard(
+        lambda key: key[0] == frame_set_id and key[1] >= start_idx)
+    return [kept[i] for i in order], renumbered
+
+def _extract_unique_frames(job: IngestJob, video_path: str, video_id: str,
+                           frame_numbers: list[int], total_frames: int,
+                           sampling: str, transform: dict,
+                           frame_index: FrameIndex, dedup: NearDuplicateFilter,
+                           exclude: list[int] = (), start_idx: int = 0,
+                           layout: str = 'objects'):
     """
-    frame_paths = {}
+    Extract and upload frames, replacing near-duplicates rejected by `dedup`
+    with newly sampled frames (up to DEDUP_MAX_ROUNDS times). With the
+    'pack' layout, all frames go into one new pack object.
 
-    for idx, frame_num in enumerate(frame_numbers):
-        # Get frame
-        frame = processor.get_frame(number = frame_num)
-        # Resize to max height = 720 px
-        frame_resized = processor.resize(frame, height = 720)
-        # Encode as JPEG
-        _, buffer = cv2.imencode('.jpg', frame_resized, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        #Upload to R2 - PATH: frame_sets/{frame_set_id}/frames/frame_{idx}.jpg
-        frame_key = f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/frames/frame_{idx}.jpg'
+    Returns the kept frame numbers (sorted, in index order) and their frame
+    paths. If it fails, the frames are evicted from the caches again.
+    """
+    wanted = len(frame_numbers)
+    tried = set(exclude) | set(frame_numbers)
+    kept, frame_paths, cached = [], {}, []
 
+    pack = None
+    if layout == 'pack':
+        pack = storage_backend.open_pack(
+            f'{R2_FRAMESETS_PREFIX}/{job.frame_set_id}/frames.{start_idx}.pack')
+
+    try:
+        for _ in range(DEDUP_MAX_ROUNDS + 1):
+            accepted, paths = _extract_and_upload_frames(
+                video_path, job.frame_set_id, frame_numbers, video_id,
+                transform, job, frame_index, start_idx + len(kept), dedup,
+                pack, cached
+            )
+            kept += accepted
+            frame_paths.update(paths)
+
+            shortfall = wanted - len(kept)
+            if shortfall <= 0 or dedup is None:
+                break
+
+            # Resample replacements for the rejected frames
+            frame_numbers = sample_frames(
+                video_path, total_frames, shortfall, sampling, exclude = tried,
+                frame_index = frame_index)
+            if not frame_numbers:
+                break
+            tried.update(frame_numbers)
+
+        if pack is not None:
+            pack.close()
+    except BaseException:
+        # Nothing may be served from an aborted pack, or from frames that
+        # a retry will upload again under the same keys
+        if pack is not None:
+            pack.abort()
+        _evict_frames(job.frame_set_id, start_idx, cached)
+        raise
+
+    if dedup is not None:
+        print(f"Frame set {job.frame_set_id}: rejected {dedup.rejected} near-duplicate frames")
+        if any(a > b for a, b in zip(kept, kept[1:])):
+            kept, frame_paths = _renumber_frames(
+                job.frame_set_id, kept, frame_paths, start_idx)
+    if (dedup is not None or pack is not None) and start_idx == 0 and \
+            0 in frame_paths:
+        _publish_first_frame(job, job.frame_set_id, frame_paths[0],
+                             _load_frame(frame_paths[0]))
+
+    return kept, frame_paths
+
+def _delete_frame_set_files(frame_set_id: str):
+    """Delete all R2 files of a frame set and its locally cached video."""
+    # Delete entire frame_set folder of that unique frame_set_id from R2
+    frame_set_prefix = f"{R2_FRAMESETS_PREFIX}/{frame_set_id}/"
+    progress = lambda deleted: print(
+        f"Frame set {frame_set_id}: deleted {deleted} files from R2")
+    if not storage_backend.delete_folder(frame_set_prefix, progress):
+        print(f"Warning: Some files of frame set {frame_set_id} were not deleted from R2")
+
+    # Drop the local copy of its kept video, if any
+    VIDEO_CACHE.delete(f'{frame_set_id}.')
+
+def _delete_frame_set_files_later(frame_set_id: str):
+    """Delete the files of a frame set on the cleanup thread, logging
+    failures (nobody waits for the result)."""
+    def log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error deleting files of frame set {frame_set_id}: "
+                  f"{future.exception()!r}")
+
+    future = _CLEANUP_EXECUTOR.submit(_delete_frame_set_files, frame_set_id)
+    future.add_done_callback(log_failure)
+    return future
+
+def _kept_video(meta: dict):
+    """
+    Context manager giving a local path of the original video kept in R2,
+    downloading it into the video cache unless it is already there. The
+    file is not evicted from the cache before the block exits.
+    """
+    video_key = meta['video_key']
+    name = f"{meta['frame_set_id']}{os.path.splitext(video_key)[1]}"
+    return VIDEO_CACHE.open(
+        name, lambda path: storage_backend.download_file(video_key, path))
+
+@contextmanager
+def _extend_lock(frame_set_id: str):
+    """Hold the extend lock of a frame set; it is dropped once unused."""
+    with _EXTEND_LOCKS_LOCK:
+        entry = _EXTEND_LOCKS.setdefault(frame_set_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _EXTEND_LOCKS_LOCK:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _EXTEND_LOCKS[frame_set_id]
+
+def _load_frame_index(meta: dict, video_path: str) -> FrameIndex:
+    """Load the frame index of a frame set from R2, or rebuild it."""
+    frame_index_key = meta.get('frame_index_key')
+    if frame_index_key:
         try:
-            r2_storage.s3_client.put_object(
-                Bucket = r2_storage.bucket_name,
-                Key = frame_key,
-                Body = buffer.tobytes(),
-                ContentType = 'image/jpeg'
+            return FrameIndex.from_bytes(storage_backend.get_bytes(frame_index_key))
+        except Exception as e:
+            print(f"Warning: Failed to load frame index from R2: {e}")
+    return FrameIndex.build(video_path)
+
+def _extend_frame_set(job: IngestJob, count: int, sampling: str,
+                      dedup_distance: int) -> dict:
+    """
+    Background part of POST /frame-set/<id>/extend: sample `count` new
+    frames from the kept video, extract and upload only those, and append
+    them to the frame set's metadata.
+    """
+    frame_set_id = job.frame_set_id
+    meta_key = f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json'
+
+    with _extend_lock(frame_set_id):
+        meta, etag = storage_backend.download_json_with_etag(meta_key)
+        if not meta:
+            raise FileNotFoundError(f"Metadata for frame set {frame_set_id} not found in R2")
+
+        with _kept_video(meta) as video_path:
+            frame_index = _load_frame_index(meta, video_path)
+            total_frames = frame_index.total_frames if frame_index else \
+                meta['total_frames']
+
+            # Sample frame numbers that are not in the set yet
+            frame_numbers = meta['frame_numbers']
+            new_frame_numbers = sample_frames(
+                video_path, total_frames, count, sampling,
+                exclude = frame_numbers, frame_index = frame_index)
+            job.total = len(new_frame_numbers)
+
+            # Skip frames that duplicate one already in the set, using the
+            # stored hashes
+            dedup = None
+            if dedup_distance >= 0:
+                dedup = NearDuplicateFilter(dedup_distance, (
+                    phash_from_hex(info['phash'])
+                    for info in meta['frame_paths'].values() if info.get('phash')))
+
+            # Extract and upload only the new frames, after the existing ones
+            new_frame_numbers, new_frame_paths = _extract_unique_frames(
+                job, video_path, meta['video_id'], new_frame_numbers,
+                total_frames, sampling, meta.get('transform'), frame_index,
+                dedup, exclude = frame_numbers, start_idx = len(frame_numbers),
+                layout = meta.get('layout', 'objects')
             )
+            if not new_frame_paths:
+                raise RuntimeError('Failed to extract and upload frames')
 
-            frame_paths[idx] = {
-                'frame_num': frame_num,
-                'frame_idx': idx,
-                'r2_key': frame_key,
-                'width': frame_resized.shape[1],
-                'height': frame_resized.shape[0]
-            }
-        
+            meta['frame_numbers'] = frame_numbers + new_frame_numbers
+            meta['num_frames'] = len(meta['frame_numbers'])
+            meta['frame_paths'] = {**meta['frame_paths'], **new_frame_paths}
+            meta['total_frames'] = total_frames
+
+        # Only replace meta.json if nobody else changed it in the meantime
+        if not storage_backend.upload_json(meta, meta_key, if_match = etag):
+            _evict_frames(frame_set_id, len(frame_numbers), [
+                _frame_cache_key(info) for info in new_frame_paths.values()])
+            raise RuntimeError(
+                'Failed to update metadata in R2 (it may have been modified concurrently)')
+
+        _cache_meta(frame_set_id, meta)
+
+    if DB_AVAILABLE:
+        try:
+            update_session_total_frames(frame_set_id, meta['num_frames'])
         except Exception as e:
-            print(f"Error uploading frame {frame_num} to R2: {e}")
-            continue
+            print(f"Warning: Failed to update session total frames: {e}")
+
+    return {
+        'frame_set_id': frame_set_id,
+        'count': meta['num_frames'],
+        'added': len(new_frame_numbers),
+        'frame_numbers': meta['frame_numbers'],
+        'new_frame_numbers': new_frame_numbers
+    }
+
+def _ingest_frame_set(job: IngestJob, video_path: str, video: dict,
+                      num_frames: int, transform: dict,
+                      keep_video: bool, get_first_frame: bool,
+                      sampling: str = 'random',
+                      dedup_distance: int = DEDUP_DISTANCE,
+                      layout: str = FRAME_STORAGE_LAYOUT) -> dict:
+    """
+    Background part of POST /frame-set: index the video, sample and
+    extract the frames, and upload them, the frame index, the optional
+    original video and the metadata. Returns the frame set info that used
+    to be the response of the upload request.
+    """
+    frame_set_id = job.frame_set_id
+    video_id = video['video_id']
+
+    try:
+        # Index keyframes/timestamps in one demux pass; this also gives the
+        # exact frame count (the container header is only an estimate)
+        frame_index = FrameIndex.build(video_path)
+        total_frames = frame_index.total_frames if frame_index else \
+            video['total_frames']
+        if total_frames <= 0:
+            raise ValueError('Could not read frames from uploaded video')
+
+        # Choose the frame numbers with the requested sampling strategy
+        frame_numbers = sample_frames(
+            video_path, total_frames, num_frames, sampling,
+            frame_index = frame_index)
+        job.total = len(frame_numbers)
+
+        # Extract and upload frames to R2, replacing near-duplicates
+        dedup = None
+        if dedup_distance >= 0:
+            dedup = NearDuplicateFilter(dedup_distance)
+        frame_numbers, frame_paths = _extract_unique_frames(
+            job, video_path, video_id, frame_numbers, total_frames, sampling,
+            transform, frame_index, dedup, layout = layout
+        )
+
+        if not frame_paths:
+            raise RuntimeError('Failed to extract and upload frames')
+
+        # Get render dimensions from the first frame
+        first_frame_info = frame_paths[0]
+        render_width = first_frame_info.get('width', video['width'])
+        render_height = first_frame_info.get('height', video['height'])
+
+        # OPTIONAL: Upload original video to R2
+        video_path_r2 = None
+        if keep_video:
+            video_path_r2 = f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/video{video["ext"]}'
+            if not storage_backend.upload_file(video_path, video_path_r2):
+                print("Warning: Failed to upload original video to R2")
+                video_path_r2 = None
+
+        # Store the frame index next to the metadata
+        frame_index_key = None
+        if frame_index is not None:
+            frame_index_key = f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/frame_index.npz'
+            try:
+                storage_backend.put_bytes(frame_index_key, frame_index.to_bytes(),
+                                          'application/octet-stream')
+            except Exception as e:
+                print(f"Warning: Failed to upload frame index to R2: {e}")
+                frame_index_key = None
+
+        # Create metadata
+        meta = {
+            'frame_set_id': frame_set_id,
+            'video_id': video_id,
+            'fps': video['fps'],
+            'width': video['width'],
+            'height': video['height'],
+            'total_frames': total_frames,
+            'num_frames': len(frame_numbers),
+            'frame_numbers': frame_numbers,
+            'frame_paths': frame_paths,
+            'transform': transform,
+            'sampling': sampling,
+            'dedup_distance': dedup_distance,
+            'layout': layout,
+            'video_key': video_path_r2,
+            'frame_index_key': frame_index_key
+        }
 
-    return frame_paths
+        # Save the metadata to R2
+        meta_key = f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json'
+        if not storage_backend.upload_json(meta, meta_key):
+            raise RuntimeError('Failed to upload metadata to R2')
+
+        # Cache metadata in memory (its ETag is unknown, so not on disk)
+        _cache_meta(frame_set_id, meta)
+
+        resp = {
+            'video_id': video_id,
+            'frame_set_id': frame_set_id,
+            'fps': video['fps'],
+            'orig_width': video['width'],
+            'orig_height': video['height'],
+            'render_width': render_width,
+            'render_height': render_height,
+            'total_frames': total_frames,
+            'count': len(frame_numbers),
+            'frame_numbers': frame_numbers,
+            'transform': transform
+        }
+
+        # Without the base64 image: the result is sent with every status
+        # poll and stored with the job state
+        if get_first_frame and job.first_frame is not None:
+            resp['first_frame'] = job.first_frame_summary()
+
+        return resp
+
+    finally:
+        # Clean up temp file!
+        if os.path.exists(video_path):
+            try:
+                os.unlink(video_path)
+            except Exception as e:
+                print(f"Warning: Failed to delete temp file {video_path}: {e}")
 
 # ================================= ROUTES ===================================
 @app.route('/frame-set', methods = ['POST'])
 def upload_and_create_frame_set():
-    """Upload a video file and create a randomly selected set of frames given a
-    user-specified number of frames and upload the frames to R2.
+    """Upload a video file and create a set of frames (randomly selected, or
+    with the `sampling` strategy given) of a user-specified number of frames
+    and upload the frames to R2.
+
+    Frames are extracted and uploaded by a background ingest job. Responds
+    with 202 and the job id; poll GET /frame-set/jobs/<job_id> or stream
+    GET /frame-set/jobs/<job_id>/events for progress and the result.
 
     Structure: frame_sets/{frame_set_id}/frames/frame_{index}.jpg
                frame_sets/{frame_set_id}/meta.json
+    (frame keys are listed in meta.json; see FRAME_STORAGE_LAYOUT)
     """
     if 'video' not in request.files:
         return jsonify({'error': 'No video file provided'}), 400
@@ -145,6 +853,27 @@ def upload_and_create_frame_set():
     # OPTIONAL: keeping the original video in R2, we'll keep this false for now
     keep_video = request.form.get('keep_video', 'false').lower() in ('1', 'true', 'yes')
 
+    # OPTIONAL: crop / rotate frames at ingest (fused with the resize)
+    try:
+        transform = _parse_transform(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # OPTIONAL: how frames are chosen (random, uniform, stratified,
+    # keyframe-aligned or diverse)
+    sampling = request.form.get('sampling', 'random')
+    if sampling not in SAMPLERS:
+        return jsonify({'error': f'sampling must be one of {sorted(SAMPLERS)}'}), 400
+
+    # OPTIONAL: drop (and resample) frames within this perceptual-hash
+    # Hamming distance of an already kept frame; negative disables it
+    dedup_distance = request.form.get('dedup_distance', DEDUP_DISTANCE, type = int)
+
+    # OPTIONAL: store frames as separate objects or in one pack object
+    layout = request.form.get('layout', FRAME_STORAGE_LAYOUT)
+    if layout not in FRAME_STORAGE_LAYOUTS:
+        return jsonify({'error': f'layout must be one of {sorted(FRAME_STORAGE_LAYOUTS)}'}), 400
+
     # Save video
     filename = secure_filename(file.filename)
     ext = os.path.splitext(filename)[1].lower()
@@ -159,117 +888,165 @@ def upload_and_create_frame_set():
     file.save(temp_file.name)
     temp_file.close()
 
+    submitted = False
     try:
         processor = VideoProcessor(temp_file.name)
         
-        # Get frame count
-        total_frames = int(processor.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Get frame count (estimated from the header; the ingest job
+        # counts the frames exactly)
+        total_frames = int(processor.cap.get(cv2.CAP_PROP_FRAME_COUNT)) \
+            if processor.cap.isOpened() else 0
         if total_frames <= 0:
+            processor.cap.release()
             return jsonify(
                 {'error': 'Could not read frames from uploaded video'}), 400
 
-        num_frames = min(num_frames, total_frames)
+        # Record the crop window in original pixels so annotations can be
+        # mapped back to the original frame
+        if transform['crop']:
+            transform['crop_box'] = processor.crop_box(**transform['crop'])
 
-        # Generate random frame numbers
-        frame_numbers = sorted(random.sample(range(total_frames), num_frames))
-
-        # Extract and upload frames to R2
-        frame_paths = _extract_and_upload_frames(
-            processor, frame_set_id, frame_numbers, video_id
-        )
-
-        if not frame_paths:
-            return jsonify({'error': 'Failed to extract and upload frames'}), 500
-        
-        # Get render dimensions from the first frame
-        first_frame_info = frame_paths[0]
-        render_width = first_frame_info.get('width', processor.width)
-        render_height = first_frame_info.get('height', processor.height)
-
-        # OPTIONAL: Upload original video to R2
-        video_path_r2 = None
-        if keep_video:
-            video_path_r2 = f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/video{ext}'
-            if not r2_storage.upload_file(temp_file.name, video_path_r2):
-                print("Warning: Failed to upload original video to R2")
-                video_path_r2 = None
-                
-        # Create metadata
-        meta = {
-            'frame_set_id': frame_set_id,
+        video = {
             'video_id': video_id,
+            'ext': ext,
             'fps': processor.fps,
             'width': processor.width,
             'height': processor.height,
-            'total_frames': total_frames,
-            'num_frames': num_frames,
-            'frame_numbers': frame_numbers,
-            'frame_paths': frame_paths
+            'total_frames': total_frames
         }
+        processor.cap.release()
 
-        # Save the metadata to R2
-        meta_key = f'{R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json'
-        if not r2_storage.upload_json(meta, meta_key):
-            return jsonify({'error': 'Failed to upload metadata to R2'}), 500
-        
-        # Cache metadata in memory
-        FRAME_SETS_META[frame_set_id] = meta
+        # Hand the heavy lifting to the ingest executor
+        job = INGEST_JOBS.submit(
+            IngestJob(frame_set_id, num_frames), _ingest_frame_set,
+            temp_file.name, video, num_frames, transform, keep_video,
+            get_first_frame, sampling, dedup_distance, layout
+        )
+        submitted = True
 
-        resp = {
-            'video_id': video_id,
+        resp = jsonify({
+            'job_id': job.id,
             'frame_set_id': frame_set_id,
-            'fps': processor.fps,
-            'orig_width': processor.width,
-            'orig_height': processor.height,
-            'render_width': render_width,
-            'render_height': render_height,
-            'total_frames': total_frames,
-            'count': len(frame_numbers),
-            'frame_numbers': frame_numbers
-        }
-
-        if get_first_frame and 0 in frame_paths:
-            # Download first frame from R2
-            first_frame_key = frame_paths[0]['r2_key']
-
-            try:
-                response = r2_storage.s3_client.get_object(
-                    Bucket = r2_storage.bucket_name,
-                    Key = first_frame_key
-                )
-                frame_bytes = response['Body'].read()
-                frame_b64 = base64.b64encode(frame_bytes).decode('utf-8')
-
-                resp['first_frame'] = {
-                    'frame_idx': 0,
-                    'frame_num': frame_numbers[0],
-                    'frame_img': frame_b64,
-                    'render_width': render_width,
-                    'render_height': render_height
-                }
-            except Exception as e:
-                print(f"Warning: Failed to download first frame from R2: {e}")
-        
-        return jsonify(resp)
+            'status': job.status,
+            'status_url': f'/frame-set/jobs/{job.id}',
+            'events_url': f'/frame-set/jobs/{job.id}/events'
+        })
+        resp.headers['Location'] = f'/frame-set/jobs/{job.id}'
+        return resp, 202
     
     except Exception as e:
         print(f"Error processing video: {e}")
         return jsonify({'error': str(e)}), 500
     
     finally:
-        # Clean up temp file!
-        if os.path.exists(temp_file.name):
+        # Clean up temp file, unless the ingest job owns it now
+        if not submitted and os.path.exists(temp_file.name):
             try:
                 os.unlink(temp_file.name)
             except Exception as e:
                 print(f"Warning: Failed to delete temp file {temp_file.name}: {e}")
 
+@app.route('/frame-set/<frame_set_id>/extend', methods = ['POST'])
+def extend_frame_set(frame_set_id: str):
+    """
+    Add frames to an existing frame set, sampled from its kept video
+    (uploaded with keep_video=true). Runs as a background ingest job, like
+    POST /frame-set.
+
+    Examples
+    --------
+    POST /frame-set/<id>/extend?count=50
+    POST /frame-set/<id>/extend?count=50&sampling=diverse
+    POST /frame-set/<id>/extend?count=50&dedup_distance=6
+    """
+    count = request.args.get('count', type = int)
+    if count is None or count <= 0:
+        return jsonify({'error': 'count must be greater than 0'}), 400
+
+    try:
+        meta = _load_meta(frame_set_id)
+    except FileNotFoundError:
+        return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
+
+    if not meta.get('video_key'):
+        return jsonify({'error': 'Frame set has no kept video to extend from'}), 409
+
+    if meta.count >= meta.get('total_frames', 0):
+        return jsonify({'error': 'Frame set already contains every frame'}), 400
+
+    sampling = request.args.get('sampling', meta.get('sampling', 'random'))
+    if sampling not in SAMPLERS:
+        return jsonify({'error': f'sampling must be one of {sorted(SAMPLERS)}'}), 400
+
+    dedup_distance = request.args.get(
+        'dedup_distance', meta.get('dedup_distance', DEDUP_DISTANCE), type = int)
+
+    job = INGEST_JOBS.submit(
+        IngestJob(frame_set_id, count), _extend_frame_set, count, sampling,
+        dedup_distance)
+
+    resp = jsonify({
+        'job_id': job.id,
+        'frame_set_id': frame_set_id,
+        'status': job.status,
+        'status_url': f'/frame-set/jobs/{job.id}',
+        'events_url': f'/frame-set/jobs/{job.id}/events'
+    })
+    resp.headers['Location'] = f'/frame-set/jobs/{job.id}'
+    return resp, 202
+
+@app.route('/frame-set/jobs/<job_id>', methods = ['GET'])
+def get_ingest_job(job_id: str):
+    """
+    Status of a frame set ingest job. Once `status` is 'completed', `result`
+    holds the frame set info (including `first_frame`); `first_frame` is
+    available as soon as it has been encoded. Any worker can answer, as job
+    state is shared through storage.
+    """
+    status = INGEST_JOBS.status(job_id)
+    if status is None:
+        return jsonify({'error': f'Ingest job {job_id} not found'}), 404
+    return jsonify(status)
+
+@app.route('/frame-set/jobs/<job_id>/events', methods = ['GET'])
+def stream_ingest_job(job_id: str):
+    """
+    Server-sent events for a frame set ingest job: 'status', 'first_frame',
+    'progress' as frames are stored (only the latest, if several were
+    stored since the last event) and a final 'completed' or 'failed'.
+    Workers other than the one running the job follow its shared state
+    instead, with progress at most once per INGEST_JOB_SYNC_INTERVAL.
+
+    The stream holds a connection (and, with gunicorn's sync workers, a
+    whole worker) until the job ends, so serve it with a threaded or async
+    worker class; otherwise poll GET /frame-set/jobs/<id>, as the frontend
+    does.
+    """
+    job = INGEST_JOBS.get(job_id)
+    if job is not None:
+        events = job.events()
+    elif INGEST_JOBS.status(job_id) is not None:
+        events = snapshot_events(lambda: INGEST_JOBS.status(job_id))
+    else:
+        return jsonify({'error': f'Ingest job {job_id} not found'}), 404
+
+    def stream():
+        for event in events:
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream(), mimetype = 'text/event-stream',
+                    headers = {'Cache-Control': 'no-cache',
+                               'X-Accel-Buffering': 'no'})
+
 @app.route('/frame-set/<frame_set_id>/info', methods = ['GET'])
 def get_frame_set_info(frame_set_id: str):
     """Load frame set metadata from R2."""
     try:
         metadata = _load_meta(frame_set_id)
-        frame_numbers = metadata.get('frame_numbers', [])
+        frame_numbers = metadata.frame_numbers.tolist()
         return jsonify({
             'frame_set_id': metadata.get('frame_set_id'),
             'video_id': metadata.get('video_id'),
@@ -278,7 +1055,9 @@ def get_frame_set_info(frame_set_id: str):
             'orig_height': metadata.get('height'),
             'total_frames': metadata.get('total_frames'),
             'count': len(frame_numbers),
-            'frame_numbers': frame_numbers
+            'frame_numbers': frame_numbers,
+            'frame_urls': _frame_urls(frame_set_id, metadata),
+            'transform': metadata.get('transform')
         })
     except FileNotFoundError:
         return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
@@ -295,50 +1074,203 @@ def get_frame_from_set(frame_set_id: str):
     GET /frame-set/<id>/frame?index=0
     """
 
-    try:
-        meta = _load_meta(frame_set_id)
-    except FileNotFoundError:
-        return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
-
     frame_idx = request.args.get('index', type = int)
     if frame_idx is None:
         return jsonify({'error': 'Missing index parameter'}), 400
 
-    frame_numbers = meta.get('frame_numbers', [])
-    if frame_idx < 0 or frame_idx >= len(frame_numbers):
+    try:
+        meta = _load_meta(frame_set_id, min_count = frame_idx + 1)
+    except FileNotFoundError:
+        return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
+
+    if frame_idx < 0 or frame_idx >= meta.count:
         return jsonify({'error': 'index out of range'}), 400
-    
-    frame_paths = meta.get('frame_paths', {})
 
-    # Ensure to handle both strings or int for frame_paths keys
-    frame_info = frame_paths.get(frame_idx) or frame_paths.get(str(frame_idx))
+    frame_info = meta.frame_info(frame_idx)
 
     if not frame_info:
         return jsonify({'error': f'Frame index {frame_idx} not found in frame paths'}), 404
     
-    # Fetch frame from R2
-    frame_key = frame_info['r2_key']
-
+    # Fetch frame from the cache or R2
     try:
-        response = r2_storage.s3_client.get_object(
-            Bucket = r2_storage.bucket_name,
-            Key = frame_key
-        )
-        frame_bytes = response['Body'].read()
+        frame_bytes = _get_frame_bytes(frame_set_id, meta, frame_idx)
         frame_b64 = base64.b64encode(frame_bytes).decode('utf-8')
     except Exception as e:
         return jsonify({'error': f'Failed to download frame from R2: {e}'}), 500
 
     return jsonify({
         'frame_set_id': frame_set_id,
-        'frame_count': len(frame_numbers),
+        'frame_count': meta.count,
         'frame_idx': frame_idx,
         'frame_num': frame_info['frame_num'],
         'frame_img': frame_b64,
+        'frame_url': _frame_url(frame_set_id, frame_info),
         'render_width': frame_info['width'],
         'render_height': frame_info['height']
     })
 
+@app.route('/frame-set/<frame_set_id>/frame/<int:frame_idx>', methods = ['GET'])
+def get_frame_meta(frame_set_id: str, frame_idx: int):
+    """
+    Metadata of a frame, without the image. The image itself is served
+    (and cached) at `frame_url`.
+
+    Examples
+    --------
+    GET /frame-set/<id>/frame/0
+    """
+    try:
+        meta = _load_meta(frame_set_id, min_count = frame_idx + 1)
+    except FileNotFoundError:
+        return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
+
+    frame_info = meta.frame_info(frame_idx)
+    if not frame_info:
+        return jsonify({'error': f'Frame index {frame_idx} not found'}), 404
+
+    return jsonify({
+        'frame_set_id': frame_set_id,
+        'frame_count': meta.count,
+        'frame_idx': frame_idx,
+        'frame_num': frame_info['frame_num'],
+        'frame_url': _frame_url(frame_set_id, frame_info),
+        'render_width': frame_info['width'],
+        'render_height': frame_info['height']
+    })
+
+@app.route('/frame-set/<frame_set_id>/frame/<int:frame_idx>.jpg', methods = ['GET'])
+def get_frame_image(frame_set_id: str, frame_idx: int):
+    """
+    Serve the JPEG of a frame as is, from memory, straight from the disk
+    cache file (or the stored file, for local storage), or from R2.
+    Responses carry a strong ETag and a long-lived Cache-Control, and
+    `If-None-Match` is answered with 304 without touching R2. Unless FRAME_SERVING is 'proxy', redirects to a
+    presigned R2 URL instead (except for packed frames, which are byte
+    ranges of a pack object).
+
+    While the frame set is still being ingested, its first frame is found
+    through the ingest job given as `job` (see `_frame_url`).
+
+    Examples
+    --------
+    GET /frame-set/<id>/frame/0.jpg
+    GET /frame-set/<id>/frame/0.jpg?job=<job_id>
+    """
+    try:
+        meta = _load_meta(frame_set_id, min_count = frame_idx + 1)
+        frame_info = meta.frame_info(frame_idx)
+    except FileNotFoundError:
+        meta = frame_info = None
+        job_id = request.args.get('job')
+        if job_id:
+            frame_info = INGEST_JOBS.first_frame_info(job_id)
+        if not frame_info or frame_info['frame_set_id'] != frame_set_id or \
+                frame_info['frame_idx'] != frame_idx:
+            return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
+
+    if not frame_info:
+        return jsonify({'error': f'Frame index {frame_idx} not found'}), 404
+
+    if FRAME_SERVING != 'proxy' and not _is_packed(frame_info):
+        resp = redirect(storage_backend.get_presigned_url(frame_info['r2_key']))
+        # The signed URL handed out stays valid for at least half its TTL
+        resp.headers['Cache-Control'] = f'private, max-age={PRESIGNED_URL_TTL // 2}'
+        return resp
+
+    etag = _frame_etag(frame_set_id, frame_info)
+    cache_control = f'public, max-age={FRAME_CACHE_MAX_AGE}, immutable'
+
+    if request.if_none_match.contains(etag):
+        resp = Response(status = 304)
+    elif (frame_bytes := FRAME_CACHE.get((frame_set_id, frame_idx))) is not None:
+        resp = Response(frame_bytes, mimetype = 'image/jpeg')
+        if meta is not None:
+            _prefetch_frames(frame_set_id, meta, frame_idx)
+    elif (frame_path := DISK_CACHE.path(_frame_cache_key(frame_info)) or
+          (None if _is_packed(frame_info)
+           else storage_backend.local_path(frame_info['r2_key']))) is not None:
+        # Let the server send the cached file without copying it
+        resp = send_file(frame_path, mimetype = 'image/jpeg',
+                         etag = False, conditional = False)
+        if meta is not None:
+            _prefetch_frames(frame_set_id, meta, frame_idx)
+    else:
+        try:
+            frame_bytes = _get_frame_bytes(frame_set_id, meta, frame_idx) \
+                if meta is not None else _load_frame(frame_info)
+        except Exception as e:
+            return jsonify({'error': f'Failed to download frame from R2: {e}'}), 500
+
+        resp = Response(frame_bytes, mimetype = 'image/jpeg')
+
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = cache_control
+    return resp
+
+@app.route('/frame-set/<frame_set_id>/frames', methods = ['GET'])
+def get_frames_packed(frame_set_id: str):
+    """
+    Fetch a window of frames in one request, packed into one binary
+    response (application/octet-stream):
+
+        4 bytes   length N of the JSON header (unsigned, big-endian)
+        N bytes   JSON header: {'frame_set_id', 'frame_count', 'start',
+                  'frames': [{'frame_idx', 'frame_num', 'render_width',
+                  'render_height', 'offset', 'length'}, ...]}
+        ...       the JPEGs, back to back; `offset` counts from the end
+                  of the header
+
+    At most FRAMES_BATCH_MAX frames are returned; the window is cut at
+    the end of the set.
+
+    Examples
+    --------
+    GET /frame-set/<id>/frames?start=0&count=16
+    """
+    start = request.args.get('start', 0, type = int)
+    count = request.args.get('count', 16, type = int)
+    try:
+        meta = _load_meta(frame_set_id, min_count = start + 1)
+    except FileNotFoundError:
+        return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
+
+    if start < 0 or start >= meta.count:
+        return jsonify({'error': 'start out of range'}), 400
+    if count <= 0 or count > FRAMES_BATCH_MAX:
+        return jsonify({'error': f'count must be between 1 and {FRAMES_BATCH_MAX}'}), 400
+
+    frame_infos = [meta.frame_info(idx)
+                   for idx in range(start, min(start + count, meta.count))]
+    frame_infos = [info for info in frame_infos if info]
+
+    try:
+        frames = _get_frames_bytes(
+            frame_set_id, meta, [info['frame_idx'] for info in frame_infos])
+    except Exception as e:
+        return jsonify({'error': f'Failed to download frames from R2: {e}'}), 500
+
+    entries, offset = [], 0
+    for info, data in zip(frame_infos, frames):
+        entries.append({
+            'frame_idx': info['frame_idx'],
+            'frame_num': info['frame_num'],
+            'render_width': info['width'],
+            'render_height': info['height'],
+            'offset': offset,
+            'length': len(data)
+        })
+        offset += len(data)
+
+    header = json.dumps({
+        'frame_set_id': frame_set_id,
+        'frame_count': meta.count,
+        'start': start,
+        'frames': entries
+    }).encode('utf-8')
+
+    body = b''.join([struct.pack('>I', len(header)), header, *frames])
+    return Response(body, mimetype = 'application/octet-stream')
+
 
 @app.route('/annotations/export-csv', methods = ['POST'])
 def export_annotations_csv():
@@ -348,6 +1280,7 @@ def export_annotations_csv():
     Examples
     --------
     POST /annotations/export-csv
+    POST /annotations/export-csv?frame_set_id=<id>
     """
     try:
         # Get JSON data from request body
@@ -356,6 +1289,16 @@ def export_annotations_csv():
         if not all_annotations:
             return jsonify({'error': 'No annotations data provided'}), 400
 
+        # Map coordinates of frames cropped/rotated at ingest back to the
+        # original frame
+        frame_set_id = request.args.get('frame_set_id')
+        if frame_set_id and 'transform' not in all_annotations:
+            try:
+                meta = _load_meta(frame_set_id)
+            except FileNotFoundError:
+                return jsonify({'error': f'{frame_set_id}/meta.json not found'}), 404
+            all_annotations['transform'] = meta.get('transform')
+
         # Format data for CSV
         annotations_df = utils.process_annotations(all_annotations)
         csv_content = annotations_df.to_csv(index = False)
@@ -426,14 +1369,8 @@ def save_annotations():
         if token and not validate_user_token(token):
             return jsonify({'error': 'Invalid user token'}), 401
         
-        # Save or update annotation session
-        save_annotation_session(
-            frame_set_id, video_id, orig_width, orig_height,
-            render_width, render_height, total_frames, last_frame_annotated, user_token=token
-        )
-
-        # Save each frame's annotations
-        saved_count = 0
+        # Collect each frame's annotations
+        rows = []
         for frame_num_str, frame_data in frame_annotations.items():
             try:
                 frame_num = int(frame_num_str)
@@ -447,11 +1384,15 @@ def save_annotations():
                  for ann in frame_data.values()
             )
 
-            save_frame_annotation(frame_set_id, frame_num, frame_data, is_complete)
-            saved_count += 1
-        
-        # Update session progress
-        update_session_progress(frame_set_id)
+            rows.append((frame_num, frame_data, is_complete))
+
+        # Save or update the annotation session and save the frames in one
+        # batched upsert
+        saved_count = save_frame_annotations_bulk(
+            frame_set_id, video_id, orig_width, orig_height,
+            render_width, render_height, total_frames, rows,
+            last_frame_annotated, user_token = token
+        )
 
         return jsonify({
             'success': True,
@@ -475,6 +1416,13 @@ def load_annotations(frame_set_id: str):
         if token and not validate_user_token(token):
             return jsonify({'error': 'Invalid user token'}), 401
 
+        # Check if session belongs to this user before loading its frames
+        exists, owner = get_session_owner(frame_set_id)
+        if not exists:
+            return jsonify({'error': 'Session not found'}), 404
+        if token and owner != token:
+            return jsonify({'error': 'Unauthorized to access this session'}), 403
+
         data = load_annotation_session(frame_set_id)
 
         if not data:
@@ -482,10 +1430,6 @@ def load_annotations(frame_set_id: str):
         
         session = data['session']
 
-        # Check if session belongs to this user
-        if token and session.get('user_token') != token:
-            return jsonify({'error': 'Unauthorized to access this session'}), 403
-
         frames = data['frames']
 
         # Reconstruct annotations object
@@ -563,22 +1507,21 @@ def delete_session(frame_set_id: str):
 
         # Optional: Verify the session belongs to this user before deleting
         if token:
-            session_data = load_annotation_session(frame_set_id)
-            if session_data and session_data['session'].get('user_token') != token:
+            exists, owner = get_session_owner(frame_set_id)
+            if exists and owner != token:
                 return jsonify({'error': 'Unauthorized to delete this session'}), 403
 
         deleted = delete_annotation_session(frame_set_id)
 
         if not deleted:
             return jsonify({'error': 'Session not found'}), 404
-        
-        # Delete entire frame_set folder of that unique frame_set_id from R2
-        frame_set_prefix = f"{R2_FRAMESETS_PREFIX}/{frame_set_id}/"
-        r2_storage.delete_folder(frame_set_prefix)
 
         # Remove it from the cache (if Render Free Tier hasn't purged it already)
-        if frame_set_id in FRAME_SETS_META:
-            del FRAME_SETS_META[frame_set_id]
+        _invalidate_meta(frame_set_id)
+        FRAME_CACHE.discard(lambda key: key[0] == frame_set_id)
+
+        # The R2 files go in the background; the session is already gone
+        _delete_frame_set_files_later(frame_set_id)
         
         return jsonify({
             'success': True,
@@ -619,20 +1562,7 @@ def auto_save_frame():
         if not all([frame_set_id, video_id, frame_num is not None]):
             return jsonify({'error': f"Missing required fields"}), 400
         
-        # Get and validate token
         token = data.get('token') or request.args.get('token')
-        if token and not validate_user_token(token):
-            return jsonify({'error': 'Invalid user token'}), 401
-        
-        # Check if session exists
-        save_annotation_session(
-            frame_set_id, video_id,
-            data.get('orig_width'), data.get('orig_height'),
-            data.get('render_width'), data.get('render_height'),
-            data.get('total_frames', 0),
-            data.get('last_frame_annotated', 0),
-            user_token=token  # Add this
-        )
 
         # Check if frame is complete
         is_complete = all(
@@ -641,7 +1571,18 @@ def auto_save_frame():
              for ann in annotations.values()
         )
 
-        save_frame_annotation(frame_set_id, frame_num, annotations, is_complete)
+        # Validate the token, upsert the session and save the frame in one
+        # round trip
+        saved = auto_save_frame_annotation(
+            frame_set_id, video_id, frame_num, annotations, is_complete,
+            data.get('orig_width'), data.get('orig_height'),
+            data.get('render_width'), data.get('render_height'),
+            data.get('total_frames', 0),
+            data.get('last_frame_annotated', 0),
+            user_token = token or None
+        )
+        if not saved:
+            return jsonify({'error': 'Invalid user token'}), 401
 
         return jsonify({
             'success': True,
@@ -667,6 +1608,19 @@ def generate_user_token():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/admin/deactivate-token/<token>', methods = ['POST'])
+def revoke_user_token(token: str):
+    """
+    Deactivate a user token. Other workers may still accept it for up to
+    TOKEN_CACHE_TTL seconds (see database.database).
+    """
+    try:
+        if not deactivate_user_token(token):
+            return jsonify({'error': 'Token not found'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/validate-token/<token>', methods = ['GET'])
 def check_token(token: str):
     """ Validate a user token. """
@@ -685,7 +1639,11 @@ def check_token(token: str):
 @app.route('/health', methods = ['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({'status': 'ok'})
+    return jsonify({'status': 'ok', 'frame_cache': FRAME_CACHE.stats(),
+                    'meta_cache': FRAME_SETS_META.stats(),
+                    'ingest_pipeline': PIPELINE_STATS.stats(),
+                    'db_pool': pool_stats() if DB_AVAILABLE else None,
+                    'db_caches': cache_stats() if DB_AVAILABLE else None})
 
 
 if __name__ == '__main__':
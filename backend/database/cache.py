@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+import threading
+import time
+
+# Returned by `TTLCache.get` on a miss (cached values may be None or False)
+MISSING = object()
+
+# Keys share this many invalidation counters (see `TTLCache.generation`)
+_GENERATION_STRIPES = 1024
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache of small values whose entries expire after a
+    TTL. Caches are per process, so changes made by other workers show up
+    once the TTL runs out unless they are invalidated here too.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        """Initialize the TTLCache instance.
+
+        Attributes
+        ----------
+        max_entries : int
+            The maximum number of entries; the least recently used go first.
+        ttl : float
+            Seconds an entry stays valid.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Invalidation counters, each shared by the keys hashing to it
+        self._generations = [0] * _GENERATION_STRIPES
+        self._items = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or MISSING."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] >= time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+        return MISSING
+
+    def _stripe(self, key: Hashable) -> int:
+        return hash(key) % _GENERATION_STRIPES
+
+    def generation(self, key: Hashable) -> int:
+        """Return the invalidation counter of `key`, to pass to `put`."""
+        with self._lock:
+            return self._generations[self._stripe(key)]
+
+    def put(self, key: Hashable, value: Any, generation: int = None):
+        """
+        Cache a value. Pass the `generation(key)` read before loading the
+        value to drop it if the key was invalidated meanwhile (it may be
+        stale). Invalidations of other keys only rarely drop it.
+        """
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and \
+                    generation != self._generations[self._stripe(key)]:
+                return
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last = False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+            self._generations[self._stripe(key)] += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._generations = [generation + 1
+                                 for generation in self._generations]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._items), 'hits': self.hits,
+                    'misses': self.misses, 'max_entries': self.max_entries,
+                    'ttl': self.ttl}
+
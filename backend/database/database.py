@@ -1,8 +1,11 @@
 import os
 import psycopg2
 import secrets
-from psycopg2.extras import RealDictCursor, Json
+import threading
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from contextlib import contextmanager
+from .cache import MISSING, TTLCache
+from .pool import ConnectionPool
 
 # Render's DATABASE_URL environment variable
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -10,13 +13,114 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-@contextmanager
-def get_db_connection():
-    """Context manager for database connection."""
+# Token validity and session owners, cached per process for TOKEN_CACHE_TTL
+# and SESSION_OWNER_CACHE_TTL seconds. Writes only invalidate the cache of
+# the worker making them, so e.g. a token deactivated on one worker is still
+# accepted by the others for at most TOKEN_CACHE_TTL
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 15))
+SESSION_OWNER_CACHE_TTL = int(os.getenv('SESSION_OWNER_CACHE_TTL', 15))
+_TOKEN_CACHE = TTLCache(int(os.getenv('TOKEN_CACHE_ENTRIES', 10000)),
+                        TOKEN_CACHE_TTL)
+_OWNER_CACHE = TTLCache(int(os.getenv('SESSION_OWNER_CACHE_ENTRIES', 10000)),
+                        SESSION_OWNER_CACHE_TTL)
+
+# Shared by all threads of a process; created on first use (and again in
+# forked workers)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+# The connection shared by the DB calls of the current request, if any
+_request_scope = threading.local()
+
+def get_pool() -> ConnectionPool:
+    """Return this process's connection pool, creating it if needed."""
+    global _pool, _pool_pid
     if not DATABASE_URL:
         raise Exception("DATABASE_URL environment variable is not set.")
-    
-    conn = psycopg2.connect(DATABASE_URL)
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(DATABASE_URL)
+            _pool_pid = os.getpid()
+        return _pool
+
+def pool_stats():
+    """Connection pool stats (checkouts, wait times, sizes), or None."""
+    return _pool.stats() if _pool is not None and _pool_pid == os.getpid() \
+        else None
+
+def cache_stats():
+    """Token and session owner cache stats."""
+    return {'tokens': _TOKEN_CACHE.stats(), 'session_owners': _OWNER_CACHE.stats()}
+
+def begin_request_scope():
+    """
+    Make the DB calls that follow on this thread, until
+    `end_request_scope`, share one connection and transaction. The
+    connection is checked out on the first call.
+    """
+    _request_scope.conn = None
+    _request_scope.invalidations = []
+    _request_scope.active = True
+
+def end_request_scope(commit: bool = True):
+    """Commit (or roll back) the request's transaction, if any, return its
+    connection to the pool and then invalidate the cache entries its
+    writes made stale."""
+    conn = getattr(_request_scope, 'conn', None)
+    invalidations = getattr(_request_scope, 'invalidations', [])
+    _request_scope.conn = None
+    _request_scope.invalidations = []
+    _request_scope.active = False
+    try:
+        if conn is None:
+            return
+        try:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        finally:
+            get_pool().putconn(conn)
+    finally:
+        # Only once the writes are visible, or a concurrent lookup could
+        # cache the old value again
+        for cache, key in invalidations:
+            cache.invalidate(key)
+
+def _invalidate_after_commit(cache: TTLCache, key):
+    """
+    Invalidate a cache entry once the current transaction has committed:
+    at the end of the request scope if one is active, otherwise right
+    away (call it after the `get_db_connection` block).
+    """
+    if getattr(_request_scope, 'active', False):
+        _request_scope.invalidations.append((cache, key))
+    else:
+        cache.invalidate(key)
+
+@contextmanager
+def get_db_connection():
+    """
+    Context manager for database connection. Inside a request scope the
+    request's connection is used and committed when the request ends;
+    otherwise a pooled connection is committed and returned on exit. An
+    error rolls back the transaction either way.
+    """
+    if getattr(_request_scope, 'active', False):
+        if _request_scope.conn is None:
+            _request_scope.conn = get_pool().getconn()
+        conn = _request_scope.conn
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        return
+
+    pool = get_pool()
+    conn = pool.getconn()
 
     try:
         yield conn
@@ -25,7 +129,7 @@ def get_db_connection():
         conn.rollback()
         raise
     finally:
-        conn.close()
+        pool.putconn(conn)
 
 def init_db():
     """Initialize the database with required tables."""
@@ -111,6 +215,8 @@ def init_db():
                 ON annotation_sessions(user_token)
             """)
 
+            _create_progress_triggers(cursor)
+
             conn.commit()
             print("Database initialized successfully.")
             return True
@@ -118,12 +224,175 @@ def init_db():
         print(f"Error initializing database: {e}")
         return False
     
-def save_annotation_session(frame_set_id: str, video_id: str, orig_width: int,
-                            orig_height: int,render_width: int, render_height: int,
-                            total_frames: int, last_frame_annotated: int = 0, user_token: str = None):
-    """Create or update annotation session."""
+def _create_progress_triggers(cursor):
+    """
+    Keep annotation_sessions.annotated_frames and status up to date as
+    frame_annotations rows are inserted, updated and deleted. Statement
+    level triggers apply the net change in completed frames per session,
+    so saving many frames updates each session once.
+    """
+    # Serialize with other workers initializing at the same time
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('annotation_progress'))")
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION apply_annotation_progress() RETURNS trigger AS $$
+        DECLARE
+            ids TEXT[];
+            deltas INTEGER[];
+        BEGIN
+            -- Net change in completed frames per frame set
+            IF TG_OP = 'INSERT' THEN
+                SELECT array_agg(frame_set_id), array_agg(delta) INTO ids, deltas
+                FROM (SELECT frame_set_id, COUNT(*) FILTER (WHERE is_completed) AS delta
+                      FROM new_rows GROUP BY frame_set_id) d;
+            ELSIF TG_OP = 'UPDATE' THEN
+                SELECT array_agg(frame_set_id), array_agg(delta) INTO ids, deltas
+                FROM (SELECT frame_set_id, SUM(delta) AS delta FROM (
+                          SELECT frame_set_id, is_completed::INTEGER AS delta
+                          FROM new_rows
+                          UNION ALL
+                          SELECT frame_set_id, -is_completed::INTEGER FROM old_rows
+                      ) c GROUP BY frame_set_id) d;
+            ELSE
+                SELECT array_agg(frame_set_id), array_agg(delta) INTO ids, deltas
+                FROM (SELECT frame_set_id, -COUNT(*) FILTER (WHERE is_completed) AS delta
+                      FROM old_rows GROUP BY frame_set_id) d;
+            END IF;
+
+            UPDATE annotation_sessions s
+            SET annotated_frames = s.annotated_frames + d.delta,
+                status = CASE
+                    WHEN s.annotated_frames + d.delta >= s.total_frames THEN 'completed'
+                    ELSE 'in_progress'
+                END
+            FROM unnest(ids, deltas) AS d(frame_set_id, delta)
+            WHERE s.frame_set_id = d.frame_set_id AND d.delta <> 0;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    cursor.execute("""
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = 'frame_annotations_progress_insert'
+    """)
+    if cursor.fetchone():
+        return
+
+    # Transition tables can't be shared by several events, hence one
+    # trigger per event
+    for event, tables in (
+            ('insert', 'NEW TABLE AS new_rows'),
+            ('update', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('delete', 'OLD TABLE AS old_rows')):
+        cursor.execute(f"""
+            CREATE TRIGGER frame_annotations_progress_{event}
+            AFTER {event.upper()} ON frame_annotations
+            REFERENCING {tables}
+            FOR EACH STATEMENT EXECUTE FUNCTION apply_annotation_progress()
+        """)
+
+    # Bring counts kept before the triggers existed up to date
+    cursor.execute("""
+        UPDATE annotation_sessions s
+        SET annotated_frames = c.completed,
+            status = CASE
+                WHEN c.completed >= s.total_frames THEN 'completed'
+                ELSE 'in_progress'
+            END
+        FROM (
+            SELECT s2.frame_set_id,
+                   COUNT(f.id) FILTER (WHERE f.is_completed) AS completed
+            FROM annotation_sessions s2
+            LEFT JOIN frame_annotations f ON f.frame_set_id = s2.frame_set_id
+            GROUP BY s2.frame_set_id
+        ) c
+        WHERE s.frame_set_id = c.frame_set_id
+    """)
+
+def auto_save_frame_annotation(frame_set_id: str, video_id: str, frame_num: int,
+                               annotations: dict, is_completed: bool,
+                               orig_width: int, orig_height: int,
+                               render_width: int, render_height: int,
+                               total_frames: int, last_frame_annotated: int = 0,
+                               user_token: str = None) -> bool:
+    """
+    Validate the user token (if given), upsert the session and upsert the
+    frame's annotations in one statement. Returns False, saving nothing,
+    if the token is not active. `total_frames` is only used to create the
+    session; an existing session keeps its own.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # The frame row's foreign key is checked at the end of the statement,
+        # after the session upsert
+        cursor.execute("""
+            WITH session AS (
+                INSERT INTO annotation_sessions
+                    (frame_set_id, video_id, orig_width, orig_height, render_width,
+                     render_height, total_frames, last_frame_annotated, user_token)
+                SELECT %(frame_set_id)s, %(video_id)s, %(orig_width)s,
+                       %(orig_height)s, %(render_width)s, %(render_height)s,
+                       %(total_frames)s, %(last_frame_annotated)s, %(user_token)s
+                WHERE %(user_token)s::TEXT IS NULL OR EXISTS (
+                    SELECT 1 FROM user_tokens
+                    WHERE token = %(user_token)s AND is_active
+                )
+                ON CONFLICT (frame_set_id)
+                DO UPDATE SET
+                    -- The stored frame count (and the status derived from
+                    -- it) is kept: the client's may be stale or missing, and
+                    -- extending updates it (update_session_total_frames)
+                    updated_at = CURRENT_TIMESTAMP,
+                    orig_width = EXCLUDED.orig_width,
+                    orig_height = EXCLUDED.orig_height,
+                    render_width = EXCLUDED.render_width,
+                    render_height = EXCLUDED.render_height,
+                    last_frame_annotated = EXCLUDED.last_frame_annotated,
+                    user_token = EXCLUDED.user_token
+                RETURNING frame_set_id
+            )
+            INSERT INTO frame_annotations
+                (frame_set_id, frame_num, annotations, is_completed)
+            SELECT frame_set_id, %(frame_num)s, %(annotations)s, %(is_completed)s
+            FROM session
+            ON CONFLICT (frame_set_id, frame_num)
+            DO UPDATE SET
+                annotations = EXCLUDED.annotations,
+                is_completed = EXCLUDED.is_completed,
+                updated_at = CURRENT_TIMESTAMP
+        """, {'frame_set_id': frame_set_id, 'video_id': video_id,
+              'orig_width': orig_width, 'orig_height': orig_height,
+              'render_width': render_width, 'render_height': render_height,
+              'total_frames': total_frames,
+              'last_frame_annotated': last_frame_annotated,
+              'user_token': user_token, 'frame_num': frame_num,
+              'annotations': Json(annotations), 'is_completed': is_completed})
+        saved = cursor.rowcount > 0
+
+    _invalidate_after_commit(_OWNER_CACHE, frame_set_id)
+    return saved
+
+def save_frame_annotations_bulk(frame_set_id: str, video_id: str,
+                                orig_width: int, orig_height: int,
+                                render_width: int, render_height: int,
+                                total_frames: int, rows,
+                                last_frame_annotated: int = 0,
+                                user_token: str = None) -> int:
+    """
+    Create or update the annotation session and save or update many
+    frames' annotations with one batched upsert, in one transaction
+    (triggers update the session's progress).
+
+    :param rows: (frame_num, annotations, is_completed) tuples; for repeated
+        frame numbers the last one wins
+    :return: The number of frames saved
+    """
+    frames = {frame_num: (annotations, is_completed)
+              for frame_num, annotations, is_completed in rows}
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        # Before the frames, which reference it
         cursor.execute("""
             INSERT INTO annotation_sessions
                 (frame_set_id, video_id, orig_width, orig_height, render_width, 
@@ -137,54 +406,48 @@ def save_annotation_session(frame_set_id: str, video_id: str, orig_width: int,
                 render_width = EXCLUDED.render_width,
                 render_height = EXCLUDED.render_height,
                 total_frames = EXCLUDED.total_frames,
+                status = CASE
+                    WHEN annotation_sessions.annotated_frames >= EXCLUDED.total_frames
+                        THEN 'completed'
+                    ELSE 'in_progress'
+                END,
                 last_frame_annotated = EXCLUDED.last_frame_annotated,
                 user_token = EXCLUDED.user_token
             """, (frame_set_id, video_id, orig_width, orig_height, render_width,
                   render_height, total_frames, last_frame_annotated, user_token))
-        
-def save_frame_annotation(frame_set_id: str, frame_num: int, annotations: dict, is_completed: bool):
-    """Save or update a single frame's annotations."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO frame_annotations
-                (frame_set_id, frame_num, annotations, is_completed)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (frame_set_id, frame_num)
-            DO UPDATE SET
-                annotations = EXCLUDED.annotations,
-                is_completed = EXCLUDED.is_completed,
-                updated_at = CURRENT_TIMESTAMP
-        """, (frame_set_id, frame_num, Json(annotations), is_completed))
-    
-        #update sessions's updated_at timestamp
-        cursor.execute("""
-            UPDATE annotation_sessions
-            SET updated_at = CURRENT_TIMESTAMP
-            WHERE frame_set_id = %s
-        """, (frame_set_id,))
 
-def update_session_progress(frame_set_id: str):
-    """Update the session's progress"""
+        if frames:
+            execute_values(cursor, """
+                INSERT INTO frame_annotations
+                    (frame_set_id, frame_num, annotations, is_completed)
+                VALUES %s
+                ON CONFLICT (frame_set_id, frame_num)
+                DO UPDATE SET
+                    annotations = EXCLUDED.annotations,
+                    is_completed = EXCLUDED.is_completed,
+                    updated_at = CURRENT_TIMESTAMP
+            """, [(frame_set_id, frame_num, Json(annotations), is_completed)
+                  for frame_num, (annotations, is_completed) in frames.items()],
+                page_size = 1000)
+
+    _invalidate_after_commit(_OWNER_CACHE, frame_set_id)
+    return len(frames)
+
+def update_session_total_frames(frame_set_id: str, total_frames: int):
+    """Update the session's frame count after its frame set was extended."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE annotation_sessions
-            SET annotated_frames = (
-                SELECT COUNT(*) FROM frame_annotations
-                WHERE frame_set_id = %s AND is_completed = TRUE
-            ),
+            SET total_frames = %s,
             status = CASE
-                WHEN (
-                       SELECT COUNT(*) FROM frame_annotations
-                       WHERE frame_set_id = %s AND is_completed = TRUE
-                       ) >= total_frames THEN 'completed'
+                WHEN annotated_frames >= %s THEN 'completed'
                 ELSE 'in_progress'
             END,
             updated_at = CURRENT_TIMESTAMP
             WHERE frame_set_id = %s
-    """, (frame_set_id, frame_set_id, frame_set_id))
-        
+        """, (total_frames, total_frames, frame_set_id))
+
 def load_annotation_session(frame_set_id: str):
     """Load all annotations for a frame set."""
     with get_db_connection() as conn:
@@ -255,7 +518,37 @@ def delete_annotation_session(frame_set_id: str):
             DELETE FROM annotation_sessions
             WHERE frame_set_id = %s
         """, (frame_set_id,))
-        return cursor.rowcount > 0
+        deleted = cursor.rowcount > 0
+
+    _invalidate_after_commit(_OWNER_CACHE, frame_set_id)
+    return deleted
+
+def get_session_owner(frame_set_id: str):
+    """
+    Look up who owns a session, without loading its annotations.
+
+    :return: (exists, owner token); the token is None for sessions saved
+        without one
+    """
+    owner = _OWNER_CACHE.get(frame_set_id)
+    if owner is not MISSING:
+        return owner
+
+    generation = _OWNER_CACHE.generation(frame_set_id)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT user_token FROM annotation_sessions
+            WHERE frame_set_id = %s
+        """, (frame_set_id,))
+        result = cursor.fetchone()
+
+    if not result:
+        # Not cached: the session may be created next, on any worker
+        return (False, None)
+    owner = (True, result[0])
+    _OWNER_CACHE.put(frame_set_id, owner, generation)
+    return owner
 
 # =============== USER TOKEN MANAGEMENT ===============
 
@@ -269,10 +562,16 @@ def create_user_token() -> str:
             VALUES (%s, CURRENT_TIMESTAMP)
         """, (token,))
 
+    _invalidate_after_commit(_TOKEN_CACHE, token)
     return token
 
 def validate_user_token(token: str) -> bool:
     """ Validates if the given user token is active. """
+    is_valid = _TOKEN_CACHE.get(token)
+    if is_valid is not MISSING:
+        return is_valid
+
+    generation = _TOKEN_CACHE.generation(token)
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -281,4 +580,20 @@ def validate_user_token(token: str) -> bool:
         """, (token,))
 
         result = cursor.fetchone()
-        return result is not None and result[0]
+    is_valid = result is not None and bool(result[0])
+    _TOKEN_CACHE.put(token, is_valid, generation)
+    return is_valid
+
+def deactivate_user_token(token: str) -> bool:
+    """ Deactivates a user token; False if there is no such token. """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE user_tokens
+            SET is_active = FALSE
+            WHERE token = %s
+        """, (token,))
+        deactivated = cursor.rowcount > 0
+
+    _invalidate_after_commit(_TOKEN_CACHE, token)
+    return deactivated
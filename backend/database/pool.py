@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+
+# Connections kept open when idle, and the most open at once
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+
+# Seconds before a connection is replaced (picks up DNS/failover changes and
+# bounds server-side memory growth)
+DB_POOL_MAX_AGE = int(os.getenv('DB_POOL_MAX_AGE', 1800))
+
+# Seconds a connection may sit idle before it is pinged on checkout
+DB_POOL_CHECK_AFTER = int(os.getenv('DB_POOL_CHECK_AFTER', 30))
+
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's timeout."""
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections.
+
+    Connections are reused until they reach `max_age`; ones that sat idle
+    for `check_after` seconds are pinged before being handed out, and
+    broken ones are replaced. When all `max_size` connections are in use,
+    `getconn` waits for one to be returned.
+    """
+
+    def __init__(self, dsn: str, min_size: int = DB_POOL_MIN,
+                 max_size: int = DB_POOL_MAX, max_age: int = DB_POOL_MAX_AGE,
+                 check_after: int = DB_POOL_CHECK_AFTER,
+                 timeout: float = DB_POOL_TIMEOUT):
+        """Initialize the ConnectionPool instance.
+
+        Attributes
+        ----------
+        dsn : str
+            The PostgreSQL connection string.
+        min_size : int
+            The number of connections kept open when idle.
+        max_size : int
+            The maximum number of open connections.
+        max_age : int
+            Seconds before a connection is closed and replaced.
+        check_after : int
+            Seconds of idleness after which a connection is pinged on
+            checkout.
+        timeout : float
+            Seconds `getconn` waits for a free connection.
+        """
+        self.dsn = dsn
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.check_after = check_after
+        self.timeout = timeout
+        self._idle = []  # (conn, created_at, returned_at), most recent last
+        self._created_at = {}  # id(conn) -> created_at, of checked out conns
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0,
+                       'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+                       'created': 0, 'closed': 0, 'failed_checks': 0}
+
+        for _ in range(self.min_size):
+            try:
+                conn = self._connect()
+            except psycopg2.Error as e:
+                print(f"Warning: Failed to open pooled DB connection: {e}")
+                break
+            now = time.monotonic()
+            self._idle.append((conn, now, now))
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        with self._cond:
+            self._size += 1
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        """Close a connection and free its slot (not holding the lock)."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+
+    def _healthy(self, conn, created_at: float, returned_at: float) -> bool:
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_age:
+            return False
+        if now - returned_at < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond:
+                self._stats['failed_checks'] += 1
+            return False
+
+    def getconn(self):
+        """Check out a connection; raises PoolTimeout if none is free in
+        time."""
+        start = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No DB connection free after {self.timeout}s "
+                            f"({self.max_size} in use)")
+                    waited = True
+                    self._cond.wait(remaining)
+
+                item = self._idle.pop() if self._idle else None
+                if item is None:
+                    self._size += 1  # reserve the slot while connecting
+
+            if item is None:
+                try:
+                    conn = psycopg2.connect(self.dsn)
+                except BaseException:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                created_at = time.monotonic()
+                break
+
+            conn, created_at, returned_at = item
+            if self._healthy(conn, created_at, returned_at):
+                break
+            self._discard(conn)
+
+        wait = time.monotonic() - start
+        with self._cond:
+            self._created_at[id(conn)] = created_at
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['wait_seconds'] += wait
+            self._stats['max_wait_seconds'] = max(
+                self._stats['max_wait_seconds'], wait)
+        return conn
+
+    def putconn(self, conn):
+        """Return a checked out connection, rolling back any open
+        transaction."""
+        with self._cond:
+            created_at = self._created_at.pop(id(conn))
+
+        if not conn.closed and \
+                conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_age or \
+                conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+    def closeall(self):
+        """Close the idle connections (checked out ones close on return)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({'size': self._size, 'idle': len(self._idle),
+                          'in_use': self._size - len(self._idle),
+                          'max_size': self.max_size})
+        checkouts = stats['checkouts']
+        stats['avg_wait_seconds'] = stats['wait_seconds'] / checkouts \
+            if checkouts else 0.0
+        return stats
@@ -0,0 +1,219 @@
+from typing import Callable, Optional
+import hashlib
+import os
+import tempfile
+import threading
+from storage.atomic import write_atomic
+
+# Directory of the on-disk cache, shared by all workers on the machine
+DISK_CACHE_DIR = os.getenv(
+    'DISK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pose-annotator-cache'))
+
+# Max total size of the cached objects (default: 2 GB); 0 disables the cache
+DISK_CACHE_BYTES = int(os.getenv('DISK_CACHE_MB', 2048)) * 1024 * 1024
+
+# Once the cache exceeds its size, the least recently used objects are
+# evicted until it is below this fraction of it
+_PRUNE_TARGET = 0.9
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def prune_lru(directory: str, max_bytes: int,
+              evict: Optional[Callable[[str], bool]] = None) -> int:
+    """
+    If the files under `directory` total more than `max_bytes`, delete the
+    least recently modified ones until they total less than 90% of it.
+    Temporary files ('.tmp-*') are left alone.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to prune (recursively).
+    max_bytes : int
+        The max total size of its files.
+    evict : callable, optional
+        Deletes a file instead of `os.unlink`, returning False if the file
+        must be kept.
+
+    Returns
+    -------
+    freed : int
+        The number of bytes deleted.
+    """
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.startswith('.tmp-'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return 0
+
+    files.sort()
+    target = max_bytes * _PRUNE_TARGET
+    freed = 0
+    for _, size, path in files:
+        if total - freed <= target:
+            break
+        try:
+            if evict is not None:
+                if not evict(path):
+                    continue
+            else:
+                os.unlink(path)
+        except OSError:
+            # Already evicted by another worker
+            pass
+        freed += size
+    return freed
+
+
+class DiskCache:
+    """
+    A content-addressed file cache, shared by every process using the same
+    directory and kept across restarts.
+
+    Values are stored once per content under `objects/`; keys point at
+    them through small files under `refs/`. Both are written atomically
+    (write to a temporary file, then rename), so concurrent readers only
+    ever see complete files. Reads refresh the file's modification time,
+    which drives least-recently-used eviction. Eviction runs on a
+    background thread and also deletes the refs left pointing at evicted
+    objects.
+    """
+
+    def __init__(self, directory: str = DISK_CACHE_DIR,
+                 max_bytes: int = DISK_CACHE_BYTES):
+        """Initialize the DiskCache instance.
+
+        Attributes
+        ----------
+        directory : str
+            The cache directory; created if missing.
+        max_bytes : int
+            The max total size of the cached objects. Zero or less
+            disables the cache.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self._written = 0  # bytes written since the last size check
+        self._pruning = False
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(os.path.join(directory, 'objects'), exist_ok = True)
+            os.makedirs(os.path.join(directory, 'refs'), exist_ok = True)
+
+    def _ref_path(self, key: str) -> str:
+        digest = _digest(key.encode('utf-8'))
+        return os.path.join(self.directory, 'refs', digest[:2], digest)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def path(self, key: str) -> Optional[str]:
+        """Return the path of the file holding the value of `key`, or None.
+        The file can be served directly (e.g. with `send_file`)."""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._ref_path(key), 'r') as f:
+                object_path = self._object_path(f.read().strip())
+            # Mark as recently used
+            os.utime(object_path)
+            return object_path
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value of `key`, or None."""
+        object_path = self.path(key)
+        if object_path is None:
+            return None
+        try:
+            with open(object_path, 'rb') as f:
+                return f.read()
+        except OSError:
+            # Evicted in the meantime
+            return None
+
+    def put(self, key: str, data: bytes):
+        """Cache a value under `key`. Errors are reported, not raised."""
+        if not self.enabled:
+            return
+        digest = _digest(data)
+        object_path = self._object_path(digest)
+        try:
+            if os.path.exists(object_path):
+                os.utime(object_path)
+            else:
+                write_atomic(object_path, lambda f: f.write(data))
+            write_atomic(self._ref_path(key),
+                         lambda f: f.write(digest.encode('ascii')))
+        except OSError as e:
+            print(f"Warning: Failed to write {key} to the disk cache: {e}")
+            return
+
+        with self._lock:
+            self._written += len(data)
+            check = self._written > self.max_bytes * (1 - _PRUNE_TARGET) \
+                and not self._pruning
+            if check:
+                self._written = 0
+                self._pruning = True
+        if check:
+            # Walking the cache takes a while; don't hold up the writer
+            threading.Thread(target = self._prune_in_background, daemon = True,
+                             name = 'disk-cache-prune').start()
+
+    def _prune_in_background(self):
+        try:
+            self.prune()
+        except Exception as e:
+            print(f"Warning: Failed to prune the disk cache: {e}")
+        finally:
+            with self._lock:
+                self._pruning = False
+
+    def delete(self, key: str):
+        """Forget `key`. Its content is left to eviction, as other keys
+        may share it."""
+        if not self.enabled:
+            return
+        try:
+            os.unlink(self._ref_path(key))
+        except OSError:
+            pass
+
+    def prune(self):
+        """
+        Evict the least recently used objects while over the max size, and
+        delete the refs to evicted objects.
+        """
+        if prune_lru(os.path.join(self.directory, 'objects'), self.max_bytes):
+            self._delete_dangling_refs()
+
+    def _delete_dangling_refs(self):
+        for root, _, names in os.walk(os.path.join(self.directory, 'refs')):
+            for name in names:
+                if name.startswith('.tmp-'):
+                    continue
+                ref_path = os.path.join(root, name)
+                try:
+                    with open(ref_path, 'r') as f:
+                        object_path = self._object_path(f.read().strip())
+                    if not os.path.exists(object_path):
+                        os.unlink(ref_path)
+                except (OSError, ValueError):
+                    # Deleted or replaced by another worker meanwhile
+                    pass
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Iterable, Optional
+import os
+import threading
+
+# Max total size of the cached frames (default: 256 MB)
+FRAME_CACHE_BYTES = int(os.getenv('FRAME_CACHE_MB', 256)) * 1024 * 1024
+
+# Number of frames after the requested one that are fetched in advance
+FRAME_PREFETCH_AHEAD = int(os.getenv('FRAME_PREFETCH_AHEAD', 4))
+FRAME_PREFETCH_WORKERS = int(os.getenv('FRAME_PREFETCH_WORKERS', 4))
+
+
+class FrameCache:
+    """
+    A thread-safe LRU cache of encoded frame bytes, bounded by total size,
+    that can load frames in the background ahead of their use.
+    """
+
+    def __init__(self, max_bytes: int = FRAME_CACHE_BYTES,
+                 prefetch_workers: int = FRAME_PREFETCH_WORKERS):
+        """Initialize the FrameCache instance.
+
+        Attributes
+        ----------
+        max_bytes : int
+            The max total size of the cached values; the least recently
+            used values are evicted beyond it.
+        prefetch_workers : int
+            The number of threads that load prefetched values.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()  # key -> bytes, least recent first
+        self._loading = set()        # keys being prefetched
+        self._stale = set()          # of those, keys discarded meanwhile
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers = prefetch_workers, thread_name_prefix = 'prefetch')
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return the cached value of `key`, or None, counting the lookup."""
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes):
+        """Cache a value, evicting least recently used ones to fit it."""
+        with self._lock:
+            self._put(key, data)
+
+    def _put(self, key: Hashable, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._items[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last = False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def discard(self, match: Callable[[Hashable], bool]):
+        """Drop the cached values whose key matches, and the values of
+        those being prefetched once loaded (they may be outdated)."""
+        with self._lock:
+            for key in [key for key in self._items if match(key)]:
+                self.size -= len(self._items.pop(key))
+            self._stale.update(key for key in self._loading if match(key))
+
+    def get_or_load(self, key: Hashable, load: Callable[[], bytes]) -> bytes:
+        """Return the cached value of `key`, loading and caching it on a miss."""
+        data = self.get(key)
+        if data is None:
+            data = load()
+            self.put(key, data)
+        return data
+
+    def prefetch(self, keys: Iterable[Hashable],
+                 load: Callable[[Hashable], bytes]):
+        """Load the values of uncached `keys` with `load(key)` in the
+        background. Failures are ignored: the value is loaded on use."""
+        with self._lock:
+            keys = [key for key in keys
+                    if key not in self._items and key not in self._loading]
+            self._loading.update(keys)
+        for key in keys:
+            self._executor.submit(self._prefetch_one, key, load)
+
+    def _prefetch_one(self, key: Hashable, load: Callable[[Hashable], bytes]):
+        data = None
+        try:
+            data = load(key)
+        except Exception as e:
+            print(f"Warning: Failed to prefetch {key}: {e}")
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+                if key in self._stale:
+                    self._stale.discard(key)
+                elif data is not None:
+                    self._put(key, data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'items': len(self._items),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
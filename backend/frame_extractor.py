@@ -0,0 +1,174 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, NamedTuple, Optional
+import multiprocessing
+import os
+import threading
+import cv2
+import numpy as np
+from frame_index import FrameIndex
+from phash import NearDuplicateFilter, phash
+from video_processor import VideoProcessor
+
+# Number of worker processes used to extract frames (defaults to core count)
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', 0)) or os.cpu_count() or 1
+
+# Below this many frames per worker, extraction stays in-process
+MIN_FRAMES_PER_WORKER = 8
+
+# Render settings for extracted frames
+RENDER_HEIGHT = 720
+JPEG_QUALITY = 85
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class EncodedFrame(NamedTuple):
+    """A sampled frame, resized and encoded as JPEG."""
+    frame_num: int
+    data: Optional[bytes]  # None if a worker rejected it as a duplicate
+    width: int
+    height: int
+    phash: int  # perceptual hash of the rendered frame
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the shared extraction pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the parent is a threaded web worker
+            _pool = ProcessPoolExecutor(
+                max_workers = EXTRACT_WORKERS,
+                mp_context = multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def render_frame(frame: np.ndarray, processor: VideoProcessor,
+                 height: int = RENDER_HEIGHT,
+                 transform: Optional[dict] = None) -> np.ndarray:
+    """
+    Crop and rotate a frame as given by `transform` ({'crop': {...},
+    'rotate': 90 | 180}) and resize it to the render height. The result is
+    the processor's pooled buffer for this thread, overwritten by the next
+    call.
+    """
+    transform = transform or {}
+    return processor.transform_batch(
+        frame[np.newaxis], crop = transform.get('crop'), height = height,
+        degrees = transform.get('rotate'))[0]
+
+
+def encode_rendered(rendered: np.ndarray,
+                    quality: int = JPEG_QUALITY) -> tuple[bytes, int, int]:
+    """Encode a rendered frame as JPEG."""
+    ok, buffer = cv2.imencode('.jpg', rendered,
+                              [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Failed to encode frame as JPEG.")
+    return buffer.tobytes(), rendered.shape[1], rendered.shape[0]
+
+
+def _extract_range(video_path: str, frame_numbers: list[int], height: int,
+                   quality: int, transform: Optional[dict],
+                   frame_index: Optional[FrameIndex],
+                   max_distance: int = -1,
+                   hashes: np.ndarray = ()) -> list[EncodedFrame]:
+    """
+    Decode, transform and encode a contiguous range of frames. Frames
+    within `max_distance` of `hashes` or of a kept frame of the range are
+    not encoded (their data is None).
+    """
+    dedup = NearDuplicateFilter(max_distance, hashes)
+    processor = VideoProcessor(video_path, frame_index)
+    try:
+        encoded = []
+        for frame_num, frame in processor.iter_frames(frame_numbers):
+            rendered = render_frame(frame, processor, height, transform)
+            frame_hash = phash(rendered)
+            data = None
+            if dedup.accept(frame_hash):
+                data, _, _ = encode_rendered(rendered, quality)
+            encoded.append(EncodedFrame(frame_num, data, rendered.shape[1],
+                                        rendered.shape[0], frame_hash))
+        return encoded
+    finally:
+        processor.cap.release()
+
+
+def split_ranges(frame_numbers: list[int], n: int) -> list[list[int]]:
+    """Split sorted frame numbers into at most `n` contiguous ranges."""
+    n = max(1, min(n, len(frame_numbers)))
+    size, extra = divmod(len(frame_numbers), n)
+    ranges, start = [], 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(frame_numbers[start:end])
+        start = end
+    return [r for r in ranges if r]
+
+
+def extract_frames(
+    video_path: str,
+    frame_numbers: list[int],
+    workers: Optional[int] = None,
+    height: int = RENDER_HEIGHT,
+    quality: int = JPEG_QUALITY,
+    transform: Optional[dict] = None,
+    frame_index: Optional[FrameIndex] = None,
+    dedup: Optional[NearDuplicateFilter] = None
+) -> Iterator[EncodedFrame]:
+    """
+    Extract, resize and JPEG-encode frames, spreading the work across
+    processes.
+
+    Parameters
+    ----------
+    video_path : str
+        Path of the video file. Each worker opens its own capture on it.
+    frame_numbers : list[int]
+        Sorted frame indices to extract.
+    workers : int, optional
+        Number of worker processes; by default, `EXTRACT_WORKERS`.
+    height : int, optional
+        Render height of the encoded frames; by default, 720.
+    quality : int, optional
+        JPEG quality; by default, 85.
+    transform : dict, optional
+        Crop and rotation applied before resizing (see `render_frame`).
+    frame_index : FrameIndex, optional
+        The keyframe index of the video, used for seeking.
+    dedup : NearDuplicateFilter, optional
+        Workers skip encoding frames that are near-duplicates of the hashes
+        it holds, or of a frame kept earlier in their own range. It is not
+        updated; the caller still decides which frames are kept.
+
+    Yields
+    ------
+    frame : EncodedFrame
+        The encoded frames, in the order of `frame_numbers`. Frames that
+        were not encoded have `data` None.
+    """
+    workers = workers or EXTRACT_WORKERS
+    workers = min(workers, len(frame_numbers) // MIN_FRAMES_PER_WORKER)
+    max_distance, hashes = (dedup.max_distance, dedup.hashes) \
+        if dedup is not None else (-1, ())
+
+    if workers <= 1:
+        yield from _extract_range(video_path, frame_numbers, height, quality,
+                                  transform, frame_index, max_distance, hashes)
+        return
+
+    pool = _get_pool()
+    futures = [
+        pool.submit(_extract_range, video_path, frame_range, height, quality,
+                    transform, frame_index, max_distance, hashes)
+        for frame_range in split_ranges(frame_numbers, workers)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
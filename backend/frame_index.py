@@ -0,0 +1,141 @@
+from typing import Optional
+import io
+import cv2
+import numpy as np
+
+
+class FrameIndex:
+    """
+    A compact per-frame index of a video: presentation timestamps,
+    keyframe flags and the byte offsets and sizes of the compressed
+    packets.
+
+    The index is built from a single demux pass that reads packets without
+    decoding them, so it is cheap even on long videos. Packets are numbered
+    in presentation order, like decoded frames. Its frame count is
+    exact, unlike `CAP_PROP_FRAME_COUNT`, which is estimated from the
+    container header.
+
+    OpenCV doesn't expose where packets sit in the container file, so
+    offsets are positions in the video stream: the total size of the
+    packets before it in decode order.
+    """
+
+    def __init__(
+        self,
+        pts_ms: np.ndarray,
+        keyframes: np.ndarray,
+        offsets: np.ndarray,
+        sizes: np.ndarray,
+        fps: float
+    ):
+        """Initialize the FrameIndex instance.
+
+        Attributes
+        ----------
+        pts_ms : np.ndarray
+            The presentation timestamp of every frame in milliseconds.
+        keyframes : np.ndarray
+            The sorted frame numbers of the keyframes.
+        offsets : np.ndarray
+            The byte offset of every frame's packet in the video stream.
+        sizes : np.ndarray
+            The compressed packet size of every frame in bytes.
+        fps : float
+            The frame rate reported by the container.
+        """
+        self.pts_ms = np.asarray(pts_ms, dtype = np.float64)
+        self.keyframes = np.asarray(keyframes, dtype = np.int64)
+        self.offsets = np.asarray(offsets, dtype = np.uint64)
+        self.sizes = np.asarray(sizes, dtype = np.uint32)
+        self.fps = fps
+
+    def __repr__(self):
+        """Return a string representation of the object."""
+        return f"FrameIndex of {self.total_frames} frames with " \
+               f"{len(self.keyframes)} keyframes"
+
+    @property
+    def total_frames(self) -> int:
+        return len(self.pts_ms)
+
+    @classmethod
+    def build(cls, video_path: str) -> Optional['FrameIndex']:
+        """
+        Build the index of a video file.
+
+        Parameters
+        ----------
+        video_path : str
+            The path of the video file.
+
+        Returns
+        -------
+        index : FrameIndex or None
+            The frame index, or None if the video backend cannot read raw
+            packets.
+        """
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        try:
+            # Read undecoded packets only
+            if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+                return None
+            fps = cap.get(cv2.CAP_PROP_FPS)
+
+            pts_ms, is_key, sizes = [], [], []
+            while cap.grab():
+                is_key.append(bool(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME)))
+                pts_ms.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+                ret, packet = cap.retrieve()
+                sizes.append(packet.size if ret else 0)
+        finally:
+            cap.release()
+
+        if not pts_ms:
+            return None
+
+        # Packets come in decode order; frame numbers follow presentation
+        # order, which differs for streams with B-frames
+        sizes = np.asarray(sizes, dtype = np.uint64)
+        offsets = np.cumsum(sizes) - sizes
+        order = np.argsort(np.asarray(pts_ms), kind = 'stable')
+        pts_ms = np.asarray(pts_ms)[order]
+        keyframes = np.flatnonzero(np.asarray(is_key)[order]).tolist()
+
+        if not keyframes or keyframes[0] != 0:
+            # Decoding always (re)starts at the first frame
+            keyframes.insert(0, 0)
+        return cls(pts_ms, keyframes, offsets[order], sizes[order], fps)
+
+    def keyframe_before(self, frame_number: int) -> int:
+        """Return the last keyframe at or before `frame_number`."""
+        position = np.searchsorted(self.keyframes, frame_number, side = 'right')
+        return int(self.keyframes[max(position - 1, 0)])
+
+    def timestamp(self, frame_number: int) -> float:
+        """Return the presentation timestamp of a frame in milliseconds."""
+        return float(self.pts_ms[frame_number])
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index as a compressed .npz archive."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, pts_ms = self.pts_ms, keyframes = self.keyframes,
+            offsets = self.offsets, sizes = self.sizes,
+            fps = np.float64(self.fps))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'FrameIndex':
+        """Load an index serialized with `to_bytes`."""
+        with np.load(io.BytesIO(data)) as archive:
+            if 'offsets' not in archive.files:
+                # Saved by an older version; rebuild it
+                raise ValueError('Frame index has no packet offsets')
+            index = cls(archive['pts_ms'], archive['keyframes'],
+                        archive['offsets'], archive['sizes'],
+                        float(archive['fps']))
+        if np.any(np.diff(index.pts_ms) < 0):
+            # Saved in decode order by an older version; rebuild it
+            raise ValueError('Frame index is not in presentation order')
+        return index
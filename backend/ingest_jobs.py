@@ -0,0 +1,381 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+import os
+import threading
+import time
+import uuid
+
+# Number of videos ingested concurrently per process
+INGEST_JOB_WORKERS = int(os.getenv('INGEST_JOB_WORKERS', 2))
+
+# Seconds a finished job stays queryable
+INGEST_JOB_TTL = int(os.getenv('INGEST_JOB_TTL', 3600))
+
+# Job state is also written to shared storage, so that any worker (not just
+# the one running the job) can answer status polls and event streams. Changes
+# are written at most every INGEST_JOB_SYNC_INTERVAL seconds, and running
+# jobs at least every INGEST_JOB_HEARTBEAT seconds; a running job not
+# written for INGEST_JOB_STALE_AFTER seconds is reported as failed (its
+# worker died).
+INGEST_JOBS_PREFIX = 'ingest_jobs'
+INGEST_JOB_SYNC_INTERVAL = float(os.getenv('INGEST_JOB_SYNC_INTERVAL', 1))
+INGEST_JOB_HEARTBEAT = int(os.getenv('INGEST_JOB_HEARTBEAT', 60))
+INGEST_JOB_STALE_AFTER = int(os.getenv('INGEST_JOB_STALE_AFTER', 600))
+
+# Stored state is deleted once the job has been finished (or stale) for
+# longer than the TTL: by the worker that ran it, by any worker reading it,
+# and by a sweep each worker runs every INGEST_JOB_SWEEP_INTERVAL seconds
+# (for jobs whose worker died or restarted)
+INGEST_JOB_SWEEP_INTERVAL = int(os.getenv('INGEST_JOB_SWEEP_INTERVAL', 600))
+
+# Seconds between keep-alive comments on an idle event stream
+_KEEPALIVE_INTERVAL = 15
+
+
+class IngestJob:
+    """The state and progress events of a background frame set ingest."""
+
+    def __init__(self, frame_set_id: str, total: int):
+        """Initialize the IngestJob instance.
+
+        Attributes
+        ----------
+        frame_set_id : str
+            The frame set being created.
+        total : int
+            The number of frames to extract.
+        """
+        self.id = uuid.uuid4().hex
+        self.frame_set_id = frame_set_id
+        self.total = total
+        self.done = 0
+        self.status = 'queued'
+        self.error = None
+        self.result = None
+        self.first_frame = None
+        self.first_frame_info = None  # where the first frame is stored
+        self.created_at = time.time()
+        self.finished_at = None
+        self.changed = True  # since last written to storage
+        # Events are numbered; only the latest 'progress' event is kept, as
+        # it supersedes the earlier ones
+        self._seq = 0
+        self._events = []  # (seq, event), except progress
+        self._progress = None  # (seq, event)
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed')
+
+    def emit(self, event: str, **data):
+        """Record an event and wake up any listeners."""
+        with self._cond:
+            self._seq += 1
+            item = (self._seq, {'event': event, 'job_id': self.id, **data})
+            if event == 'progress':
+                self._progress = item
+            else:
+                self._events.append(item)
+            self.changed = True
+            self._cond.notify_all()
+
+    def advance(self, frame_idx: int):
+        """Record that one more frame has been extracted and stored."""
+        with self._cond:
+            self.done += 1
+            done = self.done
+        self.emit('progress', frame_idx = frame_idx, done = done,
+                  total = self.total)
+
+    def set_first_frame(self, first_frame: dict, frame_info: dict = None):
+        """
+        Make the first frame available before the job has finished.
+        `frame_info` (where it is stored) is kept for serving it while the
+        frame set has no metadata yet; it is not sent to clients.
+        """
+        self.first_frame = first_frame
+        self.first_frame_info = frame_info
+        self.emit('first_frame', first_frame = first_frame)
+
+    def finish(self, status: str, **data):
+        """Mark the job completed or failed and emit the final event."""
+        with self._cond:
+            self.status = status
+            self.finished_at = time.time()
+            self.emit(status, **data)
+
+    def events(self) -> Iterator[Optional[dict]]:
+        """
+        Yield all events of the job, waiting for new ones until the job has
+        finished. Of the 'progress' events emitted since the last ones
+        yielded, only the latest is. `None` is yielded when no event arrived
+        for a while.
+        """
+        position = 0
+        while True:
+            with self._cond:
+                if position == self._seq and not self.finished:
+                    self._cond.wait(_KEEPALIVE_INTERVAL)
+                pending = [item for item in self._events if item[0] > position]
+                if self._progress is not None and self._progress[0] > position:
+                    pending.append(self._progress)
+                    pending.sort(key = lambda item: item[0])
+                position = self._seq
+                finished = self.finished
+
+            if not pending and not finished:
+                yield None
+            for _, event in pending:
+                yield event
+            if finished:
+                return
+
+    def first_frame_summary(self) -> Optional[dict]:
+        """
+        `first_frame` without its base64 image (`frame_img`), which is only
+        sent once, in the 'first_frame' event; its `frame_url` can be
+        fetched instead.
+        """
+        if self.first_frame is None:
+            return None
+        return {key: value for key, value in self.first_frame.items()
+                if key != 'frame_img'}
+
+    def to_dict(self) -> dict:
+        """The job's state for status polls."""
+        return {
+            'job_id': self.id,
+            'frame_set_id': self.frame_set_id,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'error': self.error,
+            'first_frame': self.first_frame_summary(),
+            'result': self.result
+        }
+
+
+def snapshot_events(load_snapshot: Callable[[], Optional[dict]],
+                    interval: float = INGEST_JOB_SYNC_INTERVAL
+                    ) -> Iterator[Optional[dict]]:
+    """
+    Like `IngestJob.events`, for a job run by another worker: polls its
+    stored state and yields 'status', 'first_frame', 'progress' (without
+    `frame_idx`) and the final event as the state changes. `None` is
+    yielded while nothing changes.
+    """
+    status = first_frame = done = None
+    idle_since = time.time()
+    while True:
+        state = load_snapshot()
+        if state is None:
+            return
+        events = []
+        if state['status'] != status and state['status'] in ('queued', 'running'):
+            events.append({'event': 'status', 'status': state['status']})
+        if state['first_frame'] is not None and first_frame is None:
+            first_frame = state['first_frame']
+            events.append({'event': 'first_frame', 'first_frame': first_frame})
+        if state['done'] != done and state['done']:
+            events.append({'event': 'progress', 'done': state['done'],
+                           'total': state['total']})
+        if state['status'] == 'completed':
+            events.append({'event': 'completed', 'result': state['result']})
+        elif state['status'] == 'failed':
+            events.append({'event': 'failed', 'error': state['error']})
+        status, done = state['status'], state['done']
+
+        for event in events:
+            yield {**event, 'job_id': state['job_id']}
+        if status in ('completed', 'failed'):
+            return
+        if events:
+            idle_since = time.time()
+        elif time.time() - idle_since >= _KEEPALIVE_INTERVAL:
+            idle_since = time.time()
+            yield None
+        time.sleep(interval)
+
+
+class IngestJobManager:
+    """
+    Runs ingest jobs on a dedicated executor, off the request workers.
+
+    With a `store`, job state is written to shared storage as it changes,
+    so `status` works from any worker process (e.g. behind a load balancer
+    without sticky sessions).
+    """
+
+    def __init__(self, max_workers: int = INGEST_JOB_WORKERS,
+                 ttl: int = INGEST_JOB_TTL, store = None):
+        """Initialize the IngestJobManager instance.
+
+        Attributes
+        ----------
+        max_workers : int
+            The number of jobs run at once.
+        ttl : int
+            Seconds a finished job stays queryable.
+        store : storage.Storage, optional
+            Where job state is shared with other workers.
+        """
+        self.ttl = ttl
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers = max_workers, thread_name_prefix = 'ingest')
+        self._jobs = {}  # job_id -> IngestJob
+        self._synced_at = {}  # job_id -> when its state was last written
+        self._lock = threading.Lock()
+        if store is not None:
+            threading.Thread(target = self._sync_loop, daemon = True,
+                             name = 'ingest-job-sync').start()
+
+    def submit(self, job: IngestJob, fn: Callable[..., Any], *args,
+               **kwargs) -> IngestJob:
+        """
+        Run `fn(job, *args, **kwargs)` in the background. Its return value
+        becomes the job result; an exception fails the job.
+        """
+        self._prune()
+        with self._lock:
+            self._jobs[job.id] = job
+        if self.store is not None:
+            # Before the job id is handed out, so any worker can find it
+            self._sync(job)
+        self._executor.submit(self._run, job, fn, *args, **kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """The job, if this process is running (or ran) it."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """The state of a job run by any worker (see `IngestJob.to_dict`),
+        or None if it is unknown."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is None or not _valid_job_id(job_id):
+            return None
+
+        state = self._load(job_id)
+        if state is None:
+            return None
+        state.pop('first_frame_info', None)
+        updated_at = state.pop('updated_at', 0)
+        if state['status'] in ('queued', 'running') and \
+                time.time() - updated_at > INGEST_JOB_STALE_AFTER:
+            state['status'] = 'failed'
+            state['error'] = 'The worker running the job stopped responding'
+        return state
+
+    def first_frame_info(self, job_id: str) -> Optional[dict]:
+        """The stored frame info of the first frame of a job run by any
+        worker, with its 'frame_set_id', or None."""
+        job = self.get(job_id)
+        if job is not None:
+            frame_set_id, frame_info = job.frame_set_id, job.first_frame_info
+        elif self.store is not None and _valid_job_id(job_id):
+            state = self._load(job_id) or {}
+            frame_set_id = state.get('frame_set_id')
+            frame_info = state.get('first_frame_info')
+        else:
+            return None
+        if frame_info is None:
+            return None
+        return {**frame_info, 'frame_set_id': frame_set_id}
+
+    def _key(self, job_id: str) -> str:
+        return f'{INGEST_JOBS_PREFIX}/{job_id}.json'
+
+    def _expired(self, state: dict, now: float) -> bool:
+        """Whether the stored state of a job is past its TTL."""
+        age = now - state.get('updated_at', 0)
+        if state.get('status') in ('queued', 'running'):
+            # Reported as failed once stale, then kept like finished jobs
+            return age > INGEST_JOB_STALE_AFTER + self.ttl
+        return age > self.ttl
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        """The stored state of a job, or None; deleted if expired."""
+        state = self.store.download_json(self._key(job_id))
+        if state is not None and self._expired(state, time.time()):
+            self.store.delete_file(self._key(job_id))
+            return None
+        return state
+
+    def _sweep(self):
+        """Delete the expired state of jobs run by any worker."""
+        for key in self.store.iter_files(f'{INGEST_JOBS_PREFIX}/'):
+            job_id = key[len(INGEST_JOBS_PREFIX) + 1:-len('.json')]
+            if self.get(job_id) is None and _valid_job_id(job_id):
+                self._load(job_id)
+
+    def _sync(self, job: IngestJob):
+        """Write the job's state to the store."""
+        job.changed = False
+        self._synced_at[job.id] = time.time()
+        state = {**job.to_dict(), 'first_frame_info': job.first_frame_info,
+                 'updated_at': time.time()}
+        if not self.store.upload_json(state, self._key(job.id)):
+            job.changed = True
+
+    def _sync_loop(self):
+        swept_at = time.time()
+        while True:
+            time.sleep(INGEST_JOB_SYNC_INTERVAL)
+            now = time.time()
+            if now - swept_at >= INGEST_JOB_SWEEP_INTERVAL:
+                swept_at = now
+                try:
+                    self._prune()
+                    self._sweep()
+                except Exception as e:
+                    print(f"Warning: Failed to delete expired ingest jobs: {e}")
+            with self._lock:
+                jobs = [job for job in self._jobs.values() if not job.finished]
+            for job in jobs:
+                if job.changed or \
+                        now - self._synced_at.get(job.id, 0) >= INGEST_JOB_HEARTBEAT:
+                    try:
+                        self._sync(job)
+                    except Exception as e:
+                        print(f"Warning: Failed to share state of ingest job {job.id}: {e}")
+
+    def _run(self, job: IngestJob, fn: Callable[..., Any], *args, **kwargs):
+        job.status = 'running'
+        job.emit('status', status = job.status)
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.finish('completed', result = job.result)
+        except Exception as e:
+            print(f"Ingest job {job.id} failed: {e}")
+            job.error = str(e)
+            job.finish('failed', error = job.error)
+
+        # The final state is written right away
+        if self.store is not None:
+            try:
+                self._sync(job)
+            except Exception as e:
+                print(f"Warning: Failed to share state of ingest job {job.id}: {e}")
+
+    def _prune(self):
+        """Forget jobs that finished more than `ttl` seconds ago."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._synced_at.pop(job_id, None)
+        if self.store is not None:
+            for job_id in expired:
+                self.store.delete_file(self._key(job_id))
+
+
+def _valid_job_id(job_id: str) -> bool:
+    """Job ids are uuid4 hex strings; anything else is not a stored key."""
+    return len(job_id) == 32 and all(c in '0123456789abcdef' for c in job_id)
@@ -0,0 +1,386 @@
+from typing import Any, Callable, Optional
+import os
+import queue
+import threading
+import time
+from frame_extractor import (EXTRACT_WORKERS, JPEG_QUALITY, RENDER_HEIGHT,
+                             EncodedFrame, encode_rendered, extract_frames,
+                             render_frame)
+from frame_index import FrameIndex
+from phash import NearDuplicateFilter, phash
+from video_processor import VideoProcessor
+
+# Threads encoding decoded frames when extraction runs in-process
+ENCODE_WORKERS = int(os.getenv('ENCODE_WORKERS', 2))
+
+# Threads uploading encoded frames (uploads are network-bound)
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 8))
+
+# Most frames an uploader hands to `upload_many` at once. Only frames that
+# are already waiting are batched, so uploads never wait for a batch to fill
+UPLOAD_BATCH_SIZE = int(os.getenv('UPLOAD_BATCH_SIZE', 8))
+
+# Capacity of the queues between stages; bounds memory and applies
+# backpressure to the faster stages
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 16))
+
+# How often blocked stages check whether the pipeline was aborted
+_POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class PipelineStats:
+    """Stage stats (see `IngestPipeline.stats`) summed over many runs."""
+
+    def __init__(self):
+        self.runs = 0
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, stats: dict):
+        """Add the stats of a pipeline run."""
+        with self._lock:
+            self.runs += 1
+            for stage, value in stats.items():
+                if isinstance(value, dict):
+                    total = self._totals.setdefault(stage, dict.fromkeys(value, 0))
+                    for name, amount in value.items():
+                        total[name] = total.get(name, 0) + amount
+                else:
+                    self._totals[stage] = self._totals.get(stage, 0) + value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'runs': self.runs,
+                    **{stage: dict(value) if isinstance(value, dict) else value
+                       for stage, value in self._totals.items()}}
+
+
+class IngestPipeline:
+    """
+    A streaming decode → encode → upload pipeline for frame extraction.
+
+    Each stage runs on its own thread(s) and stages are connected by
+    bounded queues, so network round-trips of the upload stage overlap with
+    decoding and encoding instead of adding to them.
+    """
+
+    def __init__(
+        self,
+        upload: Optional[Callable[[int, EncodedFrame], Any]] = None,
+        upload_many: Optional[Callable[[list[tuple[int, EncodedFrame]]],
+                                       dict[int, Any]]] = None,
+        upload_batch_size: int = UPLOAD_BATCH_SIZE,
+        processes: Optional[int] = None,
+        encode_workers: int = ENCODE_WORKERS,
+        upload_workers: int = UPLOAD_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        height: int = RENDER_HEIGHT,
+        quality: int = JPEG_QUALITY,
+        transform: Optional[dict] = None,
+        frame_index: Optional[FrameIndex] = None,
+        dedup: Optional[NearDuplicateFilter] = None
+    ):
+        """Initialize the IngestPipeline instance.
+
+        Attributes
+        ----------
+        upload : callable, optional
+            Called as `upload(idx, frame)` for every encoded frame; its
+            return value is collected as the result for `idx`. Exceptions
+            are logged and the frame is skipped.
+        upload_many : callable, optional
+            Used instead of `upload`: called as `upload_many(frames)` with a
+            list of (idx, frame) pairs, and returns a dict of idx -> result,
+            or the exception if that frame failed (e.g. with
+            `Storage.put_many`).
+        upload_batch_size : int, optional
+            Most frames passed to `upload_many` at once.
+        processes : int, optional
+            Number of extraction processes. If greater than 1, decoding and
+            encoding happen in a process pool (see `extract_frames`);
+            otherwise a decoder thread feeds `encode_workers` threads. By
+            default, `EXTRACT_WORKERS`.
+        encode_workers : int, optional
+            Number of encoder threads for in-process extraction.
+        upload_workers : int, optional
+            Number of uploader threads.
+        queue_size : int, optional
+            Capacity of each inter-stage queue.
+        height : int, optional
+            Render height of the encoded frames; by default, 720.
+        quality : int, optional
+            JPEG quality; by default, 85.
+        transform : dict, optional
+            Crop and rotation fused with the resize (see `render_frame`).
+        frame_index : FrameIndex, optional
+            The keyframe index of the video, used for seeking.
+        dedup : NearDuplicateFilter, optional
+            Decides, in frame order and from the hash of the rendered frame,
+            which frames are kept; the others are dropped before they are
+            encoded. Kept frames are numbered consecutively and listed in
+            `accepted`.
+        """
+        if (upload is None) == (upload_many is None):
+            raise ValueError('Exactly one of upload and upload_many is needed')
+        self.upload = upload
+        self.upload_many = upload_many
+        self.upload_batch_size = max(1, upload_batch_size)
+        self.processes = EXTRACT_WORKERS if processes is None else processes
+        self.encode_workers = max(1, encode_workers)
+        self.upload_workers = max(1, upload_workers)
+        self.queue_size = queue_size
+        self.height = height
+        self.quality = quality
+        self.transform = transform
+        self.frame_index = frame_index
+        self.dedup = dedup
+        self.accepted = []
+        self.stats = {}
+
+    # ------------------------------------------------------------------ #
+    def _record(self, stage: str, busy: float = 0.0, wait: float = 0.0,
+                items: int = 0):
+        with self._lock:
+            stat = self.stats.setdefault(
+                stage, {'items': 0, 'busy_s': 0.0, 'wait_s': 0.0})
+            stat['items'] += items
+            stat['busy_s'] += busy
+            stat['wait_s'] += wait
+
+    def _fail(self, error: BaseException):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item, stage: str) -> bool:
+        """Put an item on a queue; False if the pipeline was aborted."""
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout = _POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self._record(stage, wait = time.perf_counter() - start)
+
+    def _get(self, q: queue.Queue, stage: str):
+        """Get an item from a queue; `_DONE` if the pipeline was aborted."""
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    return q.get(timeout = _POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            return _DONE
+        finally:
+            self._record(stage, wait = time.perf_counter() - start)
+
+    def _accept(self, frame_num: int, frame_hash: int) -> bool:
+        """Decide, in frame order, whether a frame is kept."""
+        if self.dedup is not None and not self.dedup.accept(frame_hash):
+            self._record('rejected', items = 1)
+            return False
+        self.accepted.append(frame_num)
+        return True
+
+    # ------------------------------------------------------------------ #
+    def _decode(self, processor: VideoProcessor, frame_numbers: list[int]):
+        """
+        Decoder stage: render (crop/rotate/resize) and hash the frames, and
+        feed the kept ones to the encoders.
+        """
+        try:
+            frames = processor.iter_frames(frame_numbers)
+            idx = 0
+            while True:
+                start = time.perf_counter()
+                item = next(frames, None)
+                self._record('decode', busy = time.perf_counter() - start,
+                             items = item is not None)
+                if item is None:
+                    break
+                frame_num, frame = item
+                start = time.perf_counter()
+                rendered = render_frame(frame, processor, self.height,
+                                        self.transform)
+                frame_hash = phash(rendered)
+                self._record('render', busy = time.perf_counter() - start,
+                             items = 1)
+                if not self._accept(frame_num, frame_hash):
+                    continue
+                # Copy out of the decoder thread's pooled buffer
+                if not self._put(self._encode_q,
+                                 (idx, frame_num, rendered.copy(), frame_hash),
+                                 'decode'):
+                    return
+                idx += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            processor.cap.release()
+            for _ in range(self.encode_workers):
+                self._put(self._encode_q, _DONE, 'decode')
+
+    def _encode(self):
+        """Encoder stage: JPEG-encode rendered frames."""
+        try:
+            while (item := self._get(self._encode_q, 'encode')) is not _DONE:
+                idx, frame_num, frame, frame_hash = item
+                start = time.perf_counter()
+                data, width, height = encode_rendered(frame, self.quality)
+                self._record('encode', busy = time.perf_counter() - start,
+                             items = 1)
+                frame = EncodedFrame(frame_num, data, width, height,
+                                     frame_hash)
+                if not self._put(self._upload_q, (idx, frame), 'encode'):
+                    return
+        except Exception as e:
+            self._fail(e)
+        finally:
+            # The last encoder to finish closes the upload queue
+            with self._lock:
+                self._encoders_left -= 1
+                last = self._encoders_left == 0
+            if last:
+                for _ in range(self.upload_workers):
+                    self._put(self._upload_q, _DONE, 'encode')
+
+    def _extract(self, video_path: str, frame_numbers: list[int]):
+        """Extraction stage: decode and encode in worker processes."""
+        frames = extract_frames(video_path, frame_numbers, self.processes,
+                                self.height, self.quality, self.transform,
+                                self.frame_index, self.dedup)
+        try:
+            idx = 0
+            while True:
+                start = time.perf_counter()
+                frame = next(frames, None)
+                self._record('extract', busy = time.perf_counter() - start,
+                             items = frame is not None)
+                if frame is None:
+                    break
+                if not self._accept(frame.frame_num, frame.phash):
+                    continue
+                if frame.data is None:
+                    # The worker only saw the hashes of its own range and
+                    # took this frame for a duplicate of one that was
+                    # dropped here; encode it after all
+                    frame = next(extract_frames(
+                        video_path, [frame.frame_num], 1, self.height,
+                        self.quality, self.transform, self.frame_index))
+                    self._record('reextract', items = 1)
+                if not self._put(self._upload_q, (idx, frame), 'extract'):
+                    return
+                idx += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            frames.close()
+            for _ in range(self.upload_workers):
+                self._put(self._upload_q, _DONE, 'extract')
+
+    def _upload_batch(self, frames: list[tuple[int, EncodedFrame]]) -> dict:
+        if self.upload_many is not None:
+            try:
+                return self.upload_many(frames)
+            except Exception as e:
+                return {idx: e for idx, _ in frames}
+        results = {}
+        for idx, frame in frames:
+            try:
+                results[idx] = self.upload(idx, frame)
+            except Exception as e:
+                results[idx] = e
+        return results
+
+    def _upload(self):
+        """
+        Uploader stage: hand encoded frames to the upload callable, batched
+        with the frames already waiting in the queue.
+        """
+        done = False
+        while not done and \
+                (item := self._get(self._upload_q, 'upload')) is not _DONE:
+            frames = [item]
+            while len(frames) < self.upload_batch_size:
+                try:
+                    item = self._upload_q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                frames.append(item)
+
+            start = time.perf_counter()
+            results = self._upload_batch(frames)
+            for idx, frame in frames:
+                result = results.get(idx)
+                if isinstance(result, Exception):
+                    print(f"Error uploading frame {frame.frame_num}: {result}")
+                    continue
+                with self._lock:
+                    self._results[idx] = result
+            self._record('upload', busy = time.perf_counter() - start,
+                         items = len(frames))
+
+    # ------------------------------------------------------------------ #
+    def run(self, video_path: str, frame_numbers: list[int]) -> dict[int, Any]:
+        """
+        Run the pipeline over a video and block until it has drained.
+
+        Parameters
+        ----------
+        video_path : str
+            Path of the video file.
+        frame_numbers : list[int]
+            Sorted frame indices to extract.
+
+        Returns
+        -------
+        results : dict[int, Any]
+            The `upload` (or `upload_many`) results keyed by frame index
+            (position in `accepted`), for the frames that were uploaded
+            successfully.
+        """
+        self.stats = {}
+        self.accepted = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error = None
+        self._results = {}
+        self._encode_q = queue.Queue(maxsize = self.queue_size)
+        self._upload_q = queue.Queue(maxsize = self.queue_size)
+        self._encoders_left = self.encode_workers
+
+        if self.processes > 1:
+            threads = [threading.Thread(
+                target = self._extract, args = (video_path, frame_numbers))]
+        else:
+            processor = VideoProcessor(video_path, self.frame_index)
+            threads = [threading.Thread(
+                target = self._decode, args = (processor, frame_numbers))]
+            threads += [threading.Thread(target = self._encode)
+                        for _ in range(self.encode_workers)]
+        threads += [threading.Thread(target = self._upload)
+                    for _ in range(self.upload_workers)]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats['total_s'] = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+
+        return dict(sorted(self._results.items()))
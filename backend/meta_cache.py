@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from typing import Any, Optional
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# Bounds of the in-memory frame set metadata cache
+META_CACHE_ENTRIES = int(os.getenv('META_CACHE_ENTRIES', 1000))
+META_CACHE_BYTES = int(os.getenv('META_CACHE_MB', 64)) * 1024 * 1024
+
+# Seconds before a cached entry is dropped and reloaded in full
+META_CACHE_TTL = int(os.getenv('META_CACHE_TTL', 3600))
+
+# Seconds a cached entry is trusted before its ETag is checked against the
+# stored meta.json again (a HEAD request)
+META_REVALIDATE_AFTER = float(os.getenv('META_REVALIDATE_AFTER', 10))
+
+
+class FrameSetMeta:
+    """
+    A compact, read-only view of a frame set's meta.json.
+
+    Per-frame data is kept in NumPy arrays indexed by frame index instead
+    of a dict of dicts. R2 keys are derived from the index when they
+    follow the one-object-per-frame layout; otherwise (e.g. frames stored
+    in packs) each distinct key is stored once.
+    """
+
+    def __init__(self, meta: dict, frames_prefix: str, etag: str = None):
+        """Initialize the FrameSetMeta instance.
+
+        Attributes
+        ----------
+        meta : dict
+            The decoded meta.json.
+        frames_prefix : str
+            The R2 prefix of the frame set's frames, e.g.
+            'frame_sets/<id>/frames/'.
+        etag : str, optional
+            The ETag of the stored meta.json `meta` was read from, if known.
+        """
+        self.etag = etag
+        # When `etag` was last known to match the stored meta.json
+        self.checked_at = time.time()
+
+        frame_numbers = meta.get('frame_numbers', [])
+        frame_paths = meta.get('frame_paths', {})
+        infos = [frame_paths.get(str(idx)) or frame_paths.get(idx)
+                 for idx in range(len(frame_numbers))]
+
+        self.fields = {key: value for key, value in meta.items()
+                       if key not in ('frame_numbers', 'frame_paths')}
+        self.frame_numbers = np.asarray(frame_numbers, dtype = np.int64)
+        self._present = np.array([info is not None for info in infos],
+                                 dtype = bool)
+        self._widths = np.array([info['width'] if info else 0
+                                 for info in infos], dtype = np.uint16)
+        self._heights = np.array([info['height'] if info else 0
+                                  for info in infos], dtype = np.uint16)
+
+        hashes = [info.get('phash') if info else None for info in infos]
+        self._phashes = None
+        if hashes and all(hashes):
+            self._phashes = np.array([int(h, 16) for h in hashes],
+                                     dtype = np.uint64)
+
+        # Byte ranges of frames stored inside pack objects
+        self._offsets = self._lengths = None
+        if any(info and 'offset' in info for info in infos):
+            self._offsets = np.array([info.get('offset', -1) if info else -1
+                                      for info in infos], dtype = np.int64)
+            self._lengths = np.array([info.get('length', 0) if info else 0
+                                      for info in infos], dtype = np.uint32)
+
+        self._frames_prefix = frames_prefix
+        self._r2_keys = self._r2_key_ids = None
+        if any(info and info['r2_key'] != self._derived_key(idx)
+               for idx, info in enumerate(infos)):
+            keys = [info['r2_key'] if info else None for info in infos]
+            self._r2_keys = sorted(set(keys) - {None})
+            ids = {key: i for i, key in enumerate(self._r2_keys)}
+            self._r2_key_ids = np.array([ids.get(key, -1) for key in keys],
+                                        dtype = np.int32)
+
+    def _derived_key(self, frame_idx: int) -> str:
+        return f'{self._frames_prefix}frame_{frame_idx}.jpg'
+
+    @property
+    def count(self) -> int:
+        return len(self.frame_numbers)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the entry."""
+        nbytes = len(json.dumps(self.fields)) + self.frame_numbers.nbytes + \
+            self._present.nbytes + self._widths.nbytes + self._heights.nbytes
+        if self._phashes is not None:
+            nbytes += self._phashes.nbytes
+        if self._offsets is not None:
+            nbytes += self._offsets.nbytes + self._lengths.nbytes
+        if self._r2_keys is not None:
+            nbytes += self._r2_key_ids.nbytes + \
+                sum(len(key) + 50 for key in self._r2_keys)
+        return nbytes
+
+    def needs_revalidation(self, min_count: int = 0) -> bool:
+        """Return True if the entry should be checked against the stored
+        meta.json: it was last checked more than META_REVALIDATE_AFTER
+        seconds ago, or it has fewer than `min_count` frames (the frame
+        set may have been extended by another worker)."""
+        return self.count < min_count or \
+            time.time() - self.checked_at > META_REVALIDATE_AFTER
+
+    def get(self, field: str, default: Any = None) -> Any:
+        """Return a top-level field of meta.json (except per-frame data)."""
+        return self.fields.get(field, default)
+
+    def r2_key(self, frame_idx: int) -> str:
+        if self._r2_keys is not None:
+            return self._r2_keys[self._r2_key_ids[frame_idx]]
+        return self._derived_key(frame_idx)
+
+    def frame_info(self, frame_idx: int) -> Optional[dict]:
+        """Return the info of a frame as stored in meta.json, or None."""
+        if frame_idx < 0 or frame_idx >= self.count or \
+                not self._present[frame_idx]:
+            return None
+        info = {
+            'frame_num': int(self.frame_numbers[frame_idx]),
+            'frame_idx': frame_idx,
+            'r2_key': self.r2_key(frame_idx),
+            'width': int(self._widths[frame_idx]),
+            'height': int(self._heights[frame_idx])
+        }
+        if self._offsets is not None and self._offsets[frame_idx] >= 0:
+            info['offset'] = int(self._offsets[frame_idx])
+            info['length'] = int(self._lengths[frame_idx])
+        if self._phashes is not None:
+            info['phash'] = f'{int(self._phashes[frame_idx]):016x}'
+        return info
+
+
+class MetaCache:
+    """A thread-safe LRU cache of FrameSetMeta, bounded by entries and
+    size, whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int = META_CACHE_ENTRIES,
+                 max_bytes: int = META_CACHE_BYTES,
+                 ttl: int = META_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._items = OrderedDict()  # frame_set_id -> (meta, nbytes, expires_at)
+        self._lock = threading.Lock()
+
+    def __contains__(self, frame_set_id: str) -> bool:
+        return self.get(frame_set_id) is not None
+
+    def get(self, frame_set_id: str) -> Optional[FrameSetMeta]:
+        with self._lock:
+            item = self._items.get(frame_set_id)
+            if item is None:
+                return None
+            if item[2] < time.time():
+                self._remove(frame_set_id)
+                return None
+            self._items.move_to_end(frame_set_id)
+            return item[0]
+
+    def put(self, frame_set_id: str, meta: FrameSetMeta):
+        nbytes = meta.nbytes
+        with self._lock:
+            self._remove(frame_set_id)
+            self._items[frame_set_id] = (meta, nbytes, time.time() + self.ttl)
+            self.size += nbytes
+            while self._items and (len(self._items) > self.max_entries or
+                                   self.size > self.max_bytes):
+                self._remove(next(iter(self._items)))
+
+    def invalidate(self, frame_set_id: str):
+        with self._lock:
+            self._remove(frame_set_id)
+
+    def _remove(self, frame_set_id: str):
+        item = self._items.pop(frame_set_id, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self.size,
+                    'max_entries': self.max_entries,
+                    'max_bytes': self.max_bytes}
@@ -0,0 +1,112 @@
+from typing import Iterable, Union
+import cv2
+import numpy as np
+
+# Frames are reduced to _DCT_SIZE x _DCT_SIZE grayscale thumbnails and the
+# lowest HASH_SIZE x HASH_SIZE DCT coefficients form the (64-bit) hash
+HASH_SIZE = 8
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Return the orthonormal DCT-II matrix of size n."""
+    k = np.arange(n)[:, np.newaxis]
+    i = np.arange(n)[np.newaxis, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def phash_batch(frames: Union[np.ndarray, list[np.ndarray]]) -> np.ndarray:
+    """
+    Compute the DCT perceptual hash of a batch of frames.
+
+    Parameters
+    ----------
+    frames : np.ndarray or list[np.ndarray]
+        BGR frames, as an (N, H, W, 3) array or a list of (H, W, 3) arrays.
+
+    Returns
+    -------
+    hashes : np.ndarray
+        The 64-bit hashes as an (N,) uint64 array.
+    """
+    thumbnails = np.empty((len(frames), _DCT_SIZE, _DCT_SIZE),
+                          dtype = np.float32)
+    for i, frame in enumerate(frames):
+        small = cv2.resize(frame, (_DCT_SIZE, _DCT_SIZE),
+                           interpolation = cv2.INTER_AREA)
+        thumbnails[i] = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    # 2-D DCT of every thumbnail at once, keeping the low frequencies
+    coeffs = (_DCT @ thumbnails @ _DCT.T)[:, :HASH_SIZE, :HASH_SIZE]
+    coeffs = coeffs.reshape(len(frames), -1)
+
+    # One bit per coefficient: above the median (ignoring the DC term)
+    median = np.median(coeffs[:, 1:], axis = 1, keepdims = True)
+    bits = np.packbits(coeffs > median, axis = 1)
+    return bits.view('>u8').ravel().astype(np.uint64)
+
+
+def phash(frame: np.ndarray) -> int:
+    """Compute the DCT perceptual hash of a single frame."""
+    return int(phash_batch(frame[np.newaxis])[0])
+
+
+def hamming(hash_: int, hashes: np.ndarray) -> np.ndarray:
+    """Return the Hamming distances between one hash and an array of them."""
+    xor = np.bitwise_xor(np.asarray(hashes, dtype = np.uint64),
+                         np.uint64(hash_))
+    return np.unpackbits(xor.view(np.uint8)).reshape(
+        len(xor), 64).sum(axis = 1)
+
+
+def to_hex(hash_: int) -> str:
+    return f'{hash_:016x}'
+
+
+def from_hex(hash_: str) -> int:
+    return int(hash_, 16)
+
+
+class NearDuplicateFilter:
+    """Keeps frames whose hash is not near the hash of a kept frame."""
+
+    def __init__(self, max_distance: int, hashes: Iterable[int] = ()):
+        """Initialize the NearDuplicateFilter instance.
+
+        Attributes
+        ----------
+        max_distance : int
+            Frames within this Hamming distance of a kept frame are
+            duplicates. A negative distance disables the filter.
+        hashes : iterable of int, optional
+            Hashes of frames that were already kept.
+        """
+        self.max_distance = max_distance
+        # Grown geometrically, so that keeping n frames copies O(n) hashes
+        self._hashes = np.fromiter(hashes, dtype = np.uint64)
+        self._count = len(self._hashes)
+        self.rejected = 0
+
+    @property
+    def hashes(self) -> np.ndarray:
+        """The hashes of the kept frames, as a view of the internal buffer."""
+        return self._hashes[:self._count]
+
+    def accept(self, hash_: int) -> bool:
+        """Return True, and remember the hash, if the frame is kept."""
+        if self.max_distance >= 0 and self._count and \
+                hamming(hash_, self.hashes).min() <= self.max_distance:
+            self.rejected += 1
+            return False
+        if self._count == len(self._hashes):
+            grown = np.empty(max(16, 2 * self._count), dtype = np.uint64)
+            grown[:self._count] = self._hashes
+            self._hashes = grown
+        self._hashes[self._count] = hash_
+        self._count += 1
+        return True
@@ -0,0 +1,190 @@
+from typing import Callable, Iterable, Optional
+import random
+import cv2
+import numpy as np
+from frame_index import FrameIndex
+from video_processor import VideoProcessor
+
+# Candidates analyzed per requested frame by the 'diverse' sampler
+DIVERSE_CANDIDATES_PER_FRAME = 8
+DIVERSE_MAX_CANDIDATES = 2000
+
+# Size of the grayscale thumbnails compared by the 'diverse' sampler
+DIVERSE_THUMBNAIL_SIZE = 32
+
+# Thumbnails closer than this (RMS difference in gray levels) are taken for
+# duplicates by the 'diverse' sampler (e.g. compression noise)
+DIVERSE_MIN_DIFFERENCE = 2.0
+
+# Signature: sampler(available, num_frames, video_path, frame_index)
+#   available : sorted np.ndarray of frame numbers that may be picked
+#   returns   : np.ndarray of `num_frames` distinct picks from `available`
+Sampler = Callable[[np.ndarray, int, str, Optional[FrameIndex]], np.ndarray]
+
+SAMPLERS: dict[str, Sampler] = {}
+
+
+def sampler(name: str) -> Callable[[Sampler], Sampler]:
+    """Register a sampling strategy under `name`."""
+    def register(fn: Sampler) -> Sampler:
+        SAMPLERS[name] = fn
+        return fn
+    return register
+
+
+def sample_frames(
+    video_path: str,
+    total_frames: int,
+    num_frames: int,
+    strategy: str = 'random',
+    exclude: Optional[Iterable[int]] = None,
+    frame_index: Optional[FrameIndex] = None
+) -> list[int]:
+    """
+    Choose which frames of a video to extract.
+
+    Parameters
+    ----------
+    video_path : str
+        The path of the video file (read by the 'diverse' strategy).
+    total_frames : int
+        The number of frames in the video.
+    num_frames : int
+        The number of frames to choose. Capped at the number of frames
+        available.
+    strategy : str, optional
+        One of `SAMPLERS`: 'random', 'uniform', 'stratified',
+        'keyframe-aligned' or 'diverse'; by default, 'random'.
+    exclude : iterable of int, optional
+        Frame numbers that must not be chosen (e.g. already extracted).
+    frame_index : FrameIndex, optional
+        The keyframe index of the video.
+
+    Returns
+    -------
+    frame_numbers : list[int]
+        The chosen frame numbers, sorted.
+    """
+    if strategy not in SAMPLERS:
+        raise ValueError(f"Invalid sampling strategy: {strategy}. "
+                         f"Must be one of {sorted(SAMPLERS)}.")
+
+    available = np.arange(total_frames)
+    if exclude:
+        available = np.setdiff1d(available, np.fromiter(exclude, dtype = int))
+    num_frames = min(num_frames, len(available))
+    if num_frames <= 0:
+        return []
+
+    picks = SAMPLERS[strategy](available, num_frames, video_path, frame_index)
+    return sorted(int(n) for n in picks)
+
+
+def _evenly_spaced(available: np.ndarray, num_frames: int) -> np.ndarray:
+    positions = np.linspace(0, len(available) - 1, num_frames)
+    return available[np.unique(positions.round().astype(int))]
+
+
+def _stratified(available: np.ndarray, num_frames: int) -> np.ndarray:
+    # One random pick from each of `num_frames` equal-width strata
+    edges = np.linspace(0, len(available), num_frames + 1).astype(int)
+    offsets = np.random.randint(0, np.maximum(edges[1:] - edges[:-1], 1))
+    return available[edges[:-1] + offsets]
+
+
+@sampler('random')
+def _random_sampler(available, num_frames, video_path, frame_index):
+    return np.array(random.sample(available.tolist(), num_frames))
+
+
+@sampler('uniform')
+def _uniform_sampler(available, num_frames, video_path, frame_index):
+    return _evenly_spaced(available, num_frames)
+
+
+@sampler('stratified')
+def _stratified_sampler(available, num_frames, video_path, frame_index):
+    return _stratified(available, num_frames)
+
+
+@sampler('keyframe-aligned')
+def _keyframe_sampler(available, num_frames, video_path, frame_index):
+    """
+    Prefer keyframes, which decode without any preceding frames. If there
+    are too few, the remaining picks are stratified over the other frames.
+    """
+    if frame_index is None:
+        return _stratified(available, num_frames)
+
+    keyframes = np.intersect1d(frame_index.keyframes, available)
+    if len(keyframes) >= num_frames:
+        return _evenly_spaced(keyframes, num_frames)
+
+    others = np.setdiff1d(available, keyframes)
+    return np.concatenate(
+        [keyframes, _stratified(others, num_frames - len(keyframes))])
+
+
+@sampler('diverse')
+def _diverse_sampler(available, num_frames, video_path, frame_index):
+    """
+    Pick maximally different frames. Rather than every frame, a stratified
+    pool of candidates (DIVERSE_CANDIDATES_PER_FRAME per pick, at most
+    DIVERSE_MAX_CANDIDATES) is decoded in one pass, which bounds the cost
+    on long videos, and downscaled to grayscale thumbnails. Starting from
+    the strongest scene change, the candidate farthest from all frames
+    picked so far is added until `num_frames` are picked. If the pool runs
+    out of distinct frames, the remaining picks are stratified over the
+    other frames.
+    """
+    num_candidates = min(len(available),
+                         num_frames * DIVERSE_CANDIDATES_PER_FRAME,
+                         max(DIVERSE_MAX_CANDIDATES, num_frames))
+    if num_candidates <= num_frames:
+        return _stratified(available, num_frames)
+    candidates = np.sort(_stratified(available, num_candidates))
+
+    size = DIVERSE_THUMBNAIL_SIZE
+    thumbnails = np.empty((num_candidates, size * size), dtype = np.float32)
+    decoded = 0
+    processor = VideoProcessor(video_path, frame_index)
+    try:
+        for i, (_, frame) in enumerate(processor.iter_frames(candidates)):
+            small = cv2.resize(frame, (size, size),
+                               interpolation = cv2.INTER_AREA)
+            thumbnails[i] = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).ravel()
+            decoded = i + 1
+    except ValueError:
+        pass  # past the end of the stream (the frame count is an estimate)
+    finally:
+        processor.cap.release()
+    candidates, thumbnails = candidates[:decoded], thumbnails[:decoded]
+
+    picked = []
+    if decoded:
+        # Scene-change score: difference to the previous candidate in time
+        motion = np.zeros(decoded, dtype = np.float32)
+        motion[1:] = np.abs(np.diff(thumbnails, axis = 0)).mean(axis = 1)
+
+        # Greedy farthest-point selection, while frames differ from the
+        # picked ones
+        min_difference = DIVERSE_MIN_DIFFERENCE * size  # as an L2 distance
+        picked = [int(np.argmax(motion))]
+        min_dist = np.linalg.norm(thumbnails - thumbnails[picked[0]], axis = 1)
+        min_dist[picked[0]] = -1
+        while len(picked) < num_frames and min_dist.max() > min_difference:
+            pick = int(np.argmax(min_dist))
+            picked.append(pick)
+            np.minimum(min_dist,
+                       np.linalg.norm(thumbnails - thumbnails[pick], axis = 1),
+                       out = min_dist)
+            min_dist[pick] = -1
+
+    picks = candidates[picked]
+    if len(picks) < num_frames:
+        # Spread the rest across the video rather than taking the first
+        # duplicates
+        others = np.setdiff1d(available, picks)
+        picks = np.concatenate(
+            [picks, _stratified(others, num_frames - len(picks))])
+    return picks
@@ -1,3 +1,20 @@
-from .r2_storage import R2Storage, r2_storage
+import os
+from .base import Storage
+from .local_storage import LocalStorage
+from .r2_storage import R2Storage
 
-__all__ = ['R2Storage', 'r2_storage']
+# Storage backend: 'r2' (Cloudflare R2 or any S3-compatible service) or
+# 'local' (files under LOCAL_STORAGE_DIR)
+STORAGE_BACKENDS = {'r2': R2Storage, 'local': LocalStorage}
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'r2')
+
+
+def get_storage(backend: str = None) -> Storage:
+    """Create the configured storage backend."""
+    backend = backend or STORAGE_BACKEND
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of {sorted(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[backend]()
+
+
+__all__ = ['Storage', 'R2Storage', 'LocalStorage', 'get_storage']
@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+
+def make_temp_file(directory):
+    """
+    Create a temporary file ('.tmp-*') in `directory`, creating the
+    directory if needed; returns (fd, path) as `tempfile.mkstemp`.
+
+    A concurrent cleanup (e.g. `LocalStorage.delete_folder`) may remove the
+    directory between its creation and the file's; it is then recreated.
+    Once the file exists, the directory is not empty and can't be removed.
+    """
+    while True:
+        try:
+            os.makedirs(directory, exist_ok = True)
+            return tempfile.mkstemp(dir = directory, prefix = '.tmp-')
+        except (FileNotFoundError, FileExistsError):
+            # Removed while being created (makedirs can fail both ways)
+            if os.path.exists(directory) and not os.path.isdir(directory):
+                raise
+
+
+def write_atomic(path, write):
+    """
+    Write a file atomically: `write(f)` fills a temporary file next to it,
+    which is then renamed over `path`, so readers only ever see complete
+    files.
+    """
+    fd, tmp_path = make_temp_file(os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,171 @@
+from abc import ABC, abstractmethod
+import tempfile
+
+
+class Storage(ABC):
+    """
+    The interface of a frame set storage backend: a flat namespace of
+    objects addressed by '/'-separated keys.
+
+    Methods that report success with True/False print their errors, like
+    the original R2 helpers; `put_bytes` and `get_bytes` raise instead.
+    """
+
+    # Whether `get_presigned_url(s)` can hand out direct download URLs
+    supports_presigned = False
+
+    @abstractmethod
+    def put_bytes(self, object_key, data, content_type=None):
+        """
+        Store an object, replacing any existing one
+
+        :param object_key: Object name
+        :param data: Contents of the object
+        :param content_type: Content type of the object
+        """
+
+    @abstractmethod
+    def get_bytes(self, object_key, offset=None, length=None):
+        """
+        Read an object, or `length` bytes of it starting at `offset`
+
+        :param object_key: Object name
+        :return: The bytes read; raises if the object does not exist
+        """
+
+    @abstractmethod
+    def upload_file(self, file_path, object_key=None):
+        """Store a local file; True if it was stored, else False"""
+
+    @abstractmethod
+    def upload_file_obj(self, file_obj, object_key):
+        """Store a file-like object; True if it was stored, else False"""
+
+    @abstractmethod
+    def download_file(self, object_key, local_path):
+        """Copy an object to a local file; True if copied, else False"""
+
+    @abstractmethod
+    def upload_json(self, data, object_key, if_match=None):
+        """
+        Store data as JSON, optionally only if the object's ETag still
+        matches `if_match`; True if stored, else False
+        """
+
+    @abstractmethod
+    def download_json(self, object_key):
+        """Read a JSON object; the parsed data, or None"""
+
+    @abstractmethod
+    def download_json_with_etag(self, object_key):
+        """Read a JSON object and its ETag; (data, ETag) or (None, None)"""
+
+    @abstractmethod
+    def get_etag(self, object_key):
+        """The object's current ETag (as in `download_json_with_etag`), or
+        None if it does not exist"""
+
+    @abstractmethod
+    def file_exists(self, object_key):
+        """True if the object exists, else False"""
+
+    @abstractmethod
+    def delete_file(self, object_key):
+        """Delete an object; True if deleted, else False"""
+
+    @abstractmethod
+    def delete_folder(self, prefix, progress=None):
+        """
+        Delete all objects whose name starts with `prefix`, calling
+        `progress` with the number deleted so far; True if all were deleted
+        """
+
+    @abstractmethod
+    def iter_files(self, prefix=""):
+        """Generate the names of all objects starting with `prefix`"""
+
+    @abstractmethod
+    def open_pack(self, object_key):
+        """
+        Start writing a pack object (see `storage.frame_pack`); returns a
+        writer with `append(data) -> (offset, length)`, `close()` and
+        `abort()`
+        """
+
+    def local_path(self, object_key):
+        """
+        The path of a local file holding the object, which can be sent
+        without copying it (e.g. with `send_file`), or None
+        """
+        return None
+
+    def get_presigned_url(self, object_key):
+        """A short-lived direct download URL, or None unless
+        `supports_presigned`"""
+        return None
+
+    def get_presigned_urls(self, object_keys):
+        """Direct download URLs of many objects, if `supports_presigned`"""
+        return {key: self.get_presigned_url(key) for key in object_keys}
+
+    def list_files(self, prefix=""):
+        """
+        List all files with a given prefix
+
+        :param prefix: Prefix to filter files
+        :return: List of file keys
+        """
+        try:
+            return list(self.iter_files(prefix))
+        except Exception as e:
+            print(f"Error listing files: {e}")
+            return []
+
+    def download_to_temp(self, object_key, suffix=""):
+        """
+        Download file to temporary location and return path.
+
+        :param object_key: Object name to download
+        :param suffix: Suffix for the temporary file
+        :return: Path to the temporary file if successful, None otherwise
+        """
+        with tempfile.NamedTemporaryFile(delete = False, suffix = suffix) as f:
+            path = f.name
+        return path if self.download_file(object_key, path) else None
+
+    def put_many(self, items, content_type=None):
+        """
+        Store many objects
+
+        :param items: Dict of object name -> bytes
+        :param content_type: Content type of all objects
+        :return: Dict of object name -> None if stored, else the exception
+        """
+        results = {}
+        for key, data in items.items():
+            try:
+                self.put_bytes(key, data, content_type)
+                results[key] = None
+            except Exception as e:
+                print(f"Error uploading {key}: {e}")
+                results[key] = e
+        return results
+
+    def get_many(self, requests):
+        """
+        Read many objects, or byte ranges of objects
+
+        :param requests: Object names, or (object name, offset, length)
+            tuples for byte ranges
+        :return: Dict of request -> bytes if read, else the exception
+        """
+        results = {}
+        for request in requests:
+            key, offset, length = request if isinstance(request, tuple) \
+                else (request, None, None)
+            try:
+                results[request] = self.get_bytes(key, offset, length)
+            except Exception as e:
+                print(f"Error downloading {key}: {e}")
+                results[request] = e
+        return results
@@ -3,7 +3,7 @@ Test script to verify R2 storage is configured correctly
 Run this before deploying to make sure everything works
 
 Usage:
-    python test_r2_connection.py
+    python -m storage.check_r2_conn  (from backend/)
 """
 
 from dotenv import load_dotenv
@@ -46,7 +46,9 @@ if missing_vars:
 
 print("\n2. Testing R2 connection...")
 try:
-    from r2_storage import r2_storage
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from storage.r2_storage import R2Storage
+    r2_storage = R2Storage()
     print("   ✓ R2 storage module imported successfully")
 except Exception as e:
     print(f"   ✗ Failed to import R2 storage: {e}")
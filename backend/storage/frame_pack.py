@@ -0,0 +1,117 @@
+import os
+import threading
+
+# Size of the parts of a frame pack's multipart upload (R2 and S3 require
+# at least 5 MB for every part but the last)
+PACK_PART_SIZE = int(os.getenv('PACK_PART_SIZE_MB', 8)) * 1024 * 1024
+
+
+class FramePackWriter:
+    """
+    Writes many small blobs (encoded frames) into a single R2 object, the
+    "pack", with one multipart upload, and records where each one lands.
+
+    Blobs can be added from several threads in any order; each is placed
+    right after the previous one. Full parts are uploaded while further
+    blobs are added. Packs smaller than one part are written with a
+    single PUT.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, object_key: str,
+                 part_size: int = PACK_PART_SIZE):
+        """Initialize the FramePackWriter instance.
+
+        Attributes
+        ----------
+        s3_client : botocore client
+            The S3-compatible client to upload with.
+        bucket_name : str
+            The bucket of the pack.
+        object_key : str
+            The object key of the pack.
+        part_size : int
+            The size of the uploaded parts in bytes.
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.part_size = part_size
+        self.size = 0
+        self._buffer = []
+        self._buffered = 0
+        self._upload_id = None
+        self._parts = []  # {'PartNumber', 'ETag'}
+        self._lock = threading.Lock()
+
+    def append(self, data: bytes) -> tuple[int, int]:
+        """
+        Add a blob to the pack.
+
+        Returns
+        -------
+        offset, length : int
+            The byte range of the blob in the pack.
+        """
+        with self._lock:
+            offset = self.size
+            self.size += len(data)
+            self._buffer.append(data)
+            self._buffered += len(data)
+            part = self._take_part() if self._buffered >= self.part_size else None
+
+        if part is not None:
+            self._upload_part(*part)
+        return offset, len(data)
+
+    def _take_part(self) -> tuple[int, bytes]:
+        """Remove the buffered data as the next part (holding the lock)."""
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(
+                Bucket = self.bucket_name, Key = self.object_key,
+                ContentType = 'application/octet-stream')['UploadId']
+        part_number = len(self._parts) + 1
+        self._parts.append(None)  # reserve the number
+        data = b''.join(self._buffer)
+        self._buffer, self._buffered = [], 0
+        return part_number, data
+
+    def _upload_part(self, part_number: int, data: bytes):
+        response = self.s3_client.upload_part(
+            Bucket = self.bucket_name, Key = self.object_key,
+            UploadId = self._upload_id, PartNumber = part_number, Body = data)
+        with self._lock:
+            self._parts[part_number - 1] = {'PartNumber': part_number,
+                                            'ETag': response['ETag']}
+
+    def close(self):
+        """Upload the remaining data and complete the pack."""
+        with self._lock:
+            if self._upload_id is None:
+                data = b''.join(self._buffer)
+                self._buffer, self._buffered = [], 0
+                part = None
+            else:
+                part = self._take_part() if self._buffered else None
+
+        if part is None and self._upload_id is None:
+            self.s3_client.put_object(
+                Bucket = self.bucket_name, Key = self.object_key, Body = data,
+                ContentType = 'application/octet-stream')
+            return
+
+        if part is not None:
+            self._upload_part(*part)
+        self.s3_client.complete_multipart_upload(
+            Bucket = self.bucket_name, Key = self.object_key,
+            UploadId = self._upload_id,
+            MultipartUpload = {'Parts': self._parts})
+
+    def abort(self):
+        """Discard the pack, e.g. after a failed ingest."""
+        if self._upload_id is not None:
+            try:
+                self.s3_client.abort_multipart_upload(
+                    Bucket = self.bucket_name, Key = self.object_key,
+                    UploadId = self._upload_id)
+            except Exception as e:
+                print(f"Warning: Failed to abort upload of {self.object_key}: {e}")
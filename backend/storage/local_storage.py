@@ -0,0 +1,205 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+from .atomic import make_temp_file, write_atomic
+from .base import Storage
+
+# Root directory of the local storage backend
+LOCAL_STORAGE_DIR = os.getenv('LOCAL_STORAGE_DIR', 'local_storage')
+
+
+class LocalPackWriter:
+    """Writes a pack object to a local file (see `FramePackWriter`)."""
+
+    def __init__(self, storage, object_key):
+        self.object_key = object_key
+        self._path = storage._path(object_key)
+        fd, self._tmp_path = make_temp_file(os.path.dirname(self._path))
+        self._file = os.fdopen(fd, 'wb')
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def append(self, data):
+        with self._lock:
+            offset = self.size
+            self._file.write(data)
+            self.size += len(data)
+        return offset, len(data)
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
+
+
+class LocalStorage(Storage):
+    """
+    Stores objects as files under a local directory, e.g. for single-node
+    installs and offline testing. Writes are atomic (temporary file, then
+    rename); byte ranges are read through mmap and whole objects can be
+    sent straight from their files.
+    """
+
+    def __init__(self, root=LOCAL_STORAGE_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok = True)
+
+    def _path(self, object_key):
+        parts = object_key.split('/')
+        if any(part in ('', '.', '..') or part.startswith('.tmp-')
+               for part in parts):
+            raise ValueError(f"Invalid object key: {object_key}")
+        return os.path.join(self.root, *parts)
+
+    @staticmethod
+    def _etag(data):
+        return f'"{hashlib.md5(data).hexdigest()}"'
+
+    def put_bytes(self, object_key, data, content_type=None):
+        write_atomic(self._path(object_key), lambda f: f.write(data))
+
+    def get_bytes(self, object_key, offset=None, length=None):
+        with open(self._path(object_key), 'rb') as f:
+            if offset is None:
+                return f.read()
+            if length == 0:
+                return b''
+            with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as m:
+                return m[offset:offset + length]
+
+    def open_pack(self, object_key):
+        return LocalPackWriter(self, object_key)
+
+    def local_path(self, object_key):
+        path = self._path(object_key)
+        return path if os.path.isfile(path) else None
+
+    def upload_file(self, file_path, object_key=None):
+        try:
+            path = self._path(object_key or os.path.basename(file_path))
+            with open(file_path, 'rb') as src:
+                write_atomic(path, lambda f: shutil.copyfileobj(src, f))
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Error uploading file: {e}")
+            return False
+
+    def upload_file_obj(self, file_obj, object_key):
+        try:
+            write_atomic(self._path(object_key),
+                               lambda f: shutil.copyfileobj(file_obj, f))
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Error uploading file object: {e}")
+            return False
+
+    def download_file(self, object_key, local_path):
+        try:
+            shutil.copyfile(self._path(object_key), local_path)
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Error downloading file: {e}")
+            return False
+
+    def upload_json(self, data, object_key, if_match=None):
+        try:
+            body = json.dumps(data, indent = 2).encode('utf-8')
+            path = self._path(object_key)
+            if if_match is None:
+                write_atomic(path, lambda f: f.write(body))
+                return True
+
+            # Compare and replace under a lock shared by all processes
+            with open(os.path.join(self.root, '.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    with open(path, 'rb') as f:
+                        current = self._etag(f.read())
+                except FileNotFoundError:
+                    current = None
+                if current != if_match:
+                    print(f"Error uploading JSON data: {object_key} was modified")
+                    return False
+                write_atomic(path, lambda f: f.write(body))
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Error uploading JSON data: {e}")
+            return False
+
+    def download_json(self, object_key):
+        return self.download_json_with_etag(object_key)[0]
+
+    def download_json_with_etag(self, object_key):
+        try:
+            data = self.get_bytes(object_key)
+            return json.loads(data.decode('utf-8')), self._etag(data)
+        except (OSError, ValueError) as e:
+            print(f"Error downloading JSON data: {e}")
+            return None, None
+
+    def get_etag(self, object_key):
+        try:
+            return self._etag(self.get_bytes(object_key))
+        except (OSError, ValueError):
+            return None
+
+    def file_exists(self, object_key):
+        try:
+            return os.path.isfile(self._path(object_key))
+        except ValueError:
+            return False
+
+    def delete_file(self, object_key):
+        try:
+            os.unlink(self._path(object_key))
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Error deleting file: {e}")
+            return False
+
+    def delete_folder(self, prefix, progress=None):
+        deleted, ok = 0, True
+        for key in list(self.iter_files(prefix)):
+            if self.delete_file(key):
+                deleted += 1
+                if progress is not None and deleted % 1000 == 0:
+                    progress(deleted)
+            else:
+                ok = False
+        if progress is not None and deleted % 1000:
+            progress(deleted)
+
+        # Remove the directories left empty, but only those inside the
+        # prefix: others may be about to receive a file (see `make_temp_file`)
+        base = os.path.join(self.root, *prefix.split('/')[:-1])
+        for root, _, _ in sorted(os.walk(base), reverse = True):
+            key = os.path.relpath(root, self.root).replace(os.sep, '/') + '/'
+            if root != self.root and key.startswith(prefix):
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+        return ok
+
+    def iter_files(self, prefix=""):
+        # Only walk the directory the prefix points into
+        base = os.path.join(self.root, *prefix.split('/')[:-1])
+        for root, dirs, files in os.walk(base):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.'):
+                    continue
+                key = os.path.relpath(os.path.join(root, name),
+                                      self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    yield key
@@ -2,12 +2,41 @@ import boto3
 import os
 import json
 import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
+from .base import Storage
+from .frame_pack import FramePackWriter
 
 load_dotenv()
 
-class R2Storage:
+# Lifetime of presigned GET URLs in seconds. A signed URL is reused while
+# at least half of its lifetime is left, so the same URL (and the
+# browser's cached copy of the object) stays valid for TTL / 2 or longer.
+PRESIGNED_URL_TTL = int(os.getenv('PRESIGNED_URL_TTL', 900))
+
+# Max number of signed URLs kept; the least recently used go first
+PRESIGNED_URL_CACHE_SIZE = 100000
+
+# HTTP connections kept open to R2, shared by every thread of the process
+# (ingest uploads, frame fetches, prefetches), and the number of threads
+# running put_many / get_many transfers
+R2_MAX_POOL_CONNECTIONS = int(os.getenv('R2_MAX_POOL_CONNECTIONS', 64))
+R2_TRANSFER_WORKERS = int(os.getenv('R2_TRANSFER_WORKERS', 32))
+
+# Max keys per delete_objects request (an S3 API limit)
+DELETE_BATCH_SIZE = 1000
+
+# Attempts per request, with client-side rate limiting when R2 throttles
+R2_MAX_ATTEMPTS = int(os.getenv('R2_MAX_ATTEMPTS', 5))
+
+class R2Storage(Storage):
+    supports_presigned = True
+
     def __init__(self):
         self.account_id = os.getenv("CF_ACCOUNT_ID")
         self.access_key = os.getenv("CF_ACCESS_KEY")
@@ -21,9 +50,55 @@ class R2Storage:
             endpoint_url = os.getenv("S3_API"),
             aws_access_key_id = self.access_key,
             aws_secret_access_key = self.secret_key,
-            region_name = 'auto'
+            region_name = 'auto',
+            config = Config(
+                max_pool_connections = R2_MAX_POOL_CONNECTIONS,
+                retries = {'max_attempts': R2_MAX_ATTEMPTS, 'mode': 'adaptive'}
+            )
         )
+        self._executor = ThreadPoolExecutor(
+            max_workers = R2_TRANSFER_WORKERS, thread_name_prefix = 'r2')
+
+        self._presigned_urls = OrderedDict()  # object_key -> (url, expires_at)
+        self._presigned_lock = threading.Lock()
     
+    def put_bytes(self, object_key, data, content_type=None):
+        """
+        Upload bytes to R2
+
+        :param object_key: S3 object name
+        :param data: Contents of the object
+        :param content_type: Content type of the object
+        """
+        extra = {'ContentType': content_type} if content_type else {}
+        self.s3_client.put_object(Bucket = self.bucket_name, Key = object_key,
+                                  Body = data, **extra)
+
+    def get_bytes(self, object_key, offset=None, length=None):
+        """
+        Download an object, or a byte range of it, from R2
+
+        :param object_key: S3 object name
+        :param offset: First byte to read
+        :param length: Number of bytes to read
+        :return: The bytes read
+        """
+        extra = {}
+        if offset is not None:
+            extra['Range'] = f"bytes={offset}-{offset + length - 1}"
+        response = self.s3_client.get_object(Bucket = self.bucket_name,
+                                             Key = object_key, **extra)
+        return response['Body'].read()
+
+    def open_pack(self, object_key):
+        """
+        Start a multipart upload of a pack object
+
+        :param object_key: S3 object name
+        :return: FramePackWriter
+        """
+        return FramePackWriter(self.s3_client, self.bucket_name, object_key)
+
     def upload_file(self, file_path, object_key=None):
         """Upload a file to the R2 bucket
 
@@ -84,20 +159,22 @@ class R2Storage:
             print(f"Error downloading file to temp: {e}")
             return None
     
-    def upload_json(self, data, object_key):
+    def upload_json(self, data, object_key, if_match=None):
         """
         Upload JSON data to R2
 
         :param data: Data to upload (will be converted to JSON)
         :param object_key: S3 object name
+        :param if_match: Only overwrite the object if its ETag still matches
         :return: True if upload was successful, False otherwise
         """
         try:
             json_str = json.dumps(data, indent = 2)
+            extra = {'IfMatch': if_match} if if_match else {}
             self.s3_client.put_object(
                 Bucket = self.bucket_name,
                 Key = object_key, Body = json_str.encode('utf-8'),
-                ContentType = 'application/json'
+                ContentType = 'application/json', **extra
             )
             return True
         except ClientError as e:
@@ -119,6 +196,77 @@ class R2Storage:
             print(f"Error downloading JSON data: {e}")
             return None
     
+    def download_json_with_etag(self, object_key):
+        """
+        Download JSON data from R2 together with the object's ETag, for a
+        later conditional `upload_json(..., if_match=etag)`
+
+        :param object_key: S3 object name
+        :return: (parsed JSON data, ETag) if successful, (None, None) otherwise
+        """
+        try:
+            response = self.s3_client.get_object(Bucket = self.bucket_name, Key = object_key)
+            data = response['Body'].read().decode('utf-8')
+            return json.loads(data), response['ETag']
+        except ClientError as e:
+            print(f"Error downloading JSON data: {e}")
+            return None, None
+
+    def put_many(self, items, content_type=None):
+        """
+        Upload many objects concurrently
+
+        :param items: Dict of object name -> bytes
+        :param content_type: Content type of all objects
+        :return: Dict of object name -> None if uploaded, else the exception
+        """
+        extra = {'ContentType': content_type} if content_type else {}
+
+        def put(key):
+            try:
+                self.s3_client.put_object(Bucket = self.bucket_name, Key = key,
+                                          Body = items[key], **extra)
+                return None
+            except Exception as e:
+                print(f"Error uploading {key}: {e}")
+                return e
+
+        return dict(zip(items, self._executor.map(put, items)))
+
+    def get_many(self, requests):
+        """
+        Download many objects, or byte ranges of objects, concurrently
+
+        :param requests: Object names, or (object name, offset, length)
+            tuples for byte ranges
+        :return: Dict of request -> bytes if downloaded, else the exception
+        """
+        def get(request):
+            key, offset, length = request if isinstance(request, tuple) \
+                else (request, None, None)
+            try:
+                return self.get_bytes(key, offset, length)
+            except Exception as e:
+                print(f"Error downloading {key}: {e}")
+                return e
+
+        requests = list(requests)
+        return dict(zip(requests, self._executor.map(get, requests)))
+
+    def get_etag(self, object_key):
+        """
+        Get the ETag of a file in R2, without downloading it
+
+        :param object_key: S3 object name
+        :return: The ETag if the file exists, None otherwise
+        """
+        try:
+            response = self.s3_client.head_object(Bucket = self.bucket_name, Key = object_key)
+            return response['ETag']
+        except ClientError as e:
+            print(f"Error getting file ETag: {e}")
+            return None
+
     def file_exists(self, object_key):
         """
         Check if a file exists in R2
@@ -147,31 +295,66 @@ class R2Storage:
             print(f"Error deleting file: {e}")
             return False
     
-    def delete_folder(self, prefix):
+    def delete_folder(self, prefix, progress=None):
         """
-        Delete all files with a give prefix (folder) from R2
+        Delete all files with a give prefix (folder) from R2. Keys are
+        deleted in batches of 1000 (the most one request can delete), sent
+        concurrently while further keys are listed.
 
         :param prefix: Prefix of the folder to delete
+        :param progress: Optional callback, called with the number of files
+            deleted so far after each batch
         :return: True if folder was deleted, False otherwise
         """
-        try:
-            # Get all objects with the given prefix
-            objects = self.s3_client.list_objects_v2(Bucket = self.bucket_name, Prefix = prefix)
-
-            if 'Contents' not in objects:
-                return True
-            
-            # Delete all objects
-            delete_keys = [{'Key': obj['Key']} for obj in objects['Contents']]
-            self.s3_client.delete_objects(
+        def delete(keys):
+            response = self.s3_client.delete_objects(
                 Bucket = self.bucket_name,
-                Delete = {'Objects': delete_keys}
+                Delete = {'Objects': [{'Key': key} for key in keys], 'Quiet': True}
             )
-            return True
+            for error in response.get('Errors', []):
+                print(f"Error deleting {error.get('Key')}: {error.get('Message')}")
+            return len(keys) - len(response.get('Errors', [])), not response.get('Errors')
+
+        futures, batch = [], []
+        try:
+            for key in self.iter_files(prefix):
+                batch.append(key)
+                if len(batch) == DELETE_BATCH_SIZE:
+                    futures.append(self._executor.submit(delete, batch))
+                    batch = []
+            if batch:
+                futures.append(self._executor.submit(delete, batch))
         except ClientError as e:
             print(f"Error deleting folder: {e}")
             return False
+
+        deleted, ok = 0, True
+        for future in futures:
+            try:
+                count, batch_ok = future.result()
+            except ClientError as e:
+                print(f"Error deleting folder: {e}")
+                ok = False
+                continue
+            deleted += count
+            ok = ok and batch_ok
+            if progress is not None:
+                progress(deleted)
+        return ok
     
+    def iter_files(self, prefix=""):
+        """
+        Iterate over all files in R2 with a given prefix, one page of
+        listing results at a time
+
+        :param prefix: Prefix to filter files
+        :return: Generator of file keys
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket = self.bucket_name, Prefix = prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key']
+
     def list_files(self, prefix=""):
         """
         List all files in R2 with a given prefix
@@ -180,16 +363,62 @@ class R2Storage:
         :return: List of file keys
         """
         try:
-            response = self.s3_client.list_objects_v2(Bucket = self.bucket_name, Prefix = prefix)
-
-            if 'Contents' not in response:
-                return []
-            
-            return [obj['Key'] for obj in response['Contents']]
+            return list(self.iter_files(prefix))
         except ClientError as e:
             print(f"Error listing files: {e}")
             return []
     
+    def get_presigned_url(self, object_key, expires_in=PRESIGNED_URL_TTL):
+        """
+        Get a short-lived presigned GET URL for a file in R2
+
+        :param object_key: S3 object name
+        :param expires_in: Lifetime of newly signed URLs in seconds
+        :return: Presigned URL of the file
+        """
+        return self.get_presigned_urls([object_key], expires_in)[object_key]
+
+    def get_presigned_urls(self, object_keys, expires_in=PRESIGNED_URL_TTL):
+        """
+        Get presigned GET URLs for many files at once. URLs are signed
+        locally (no request to R2) and cached until half their lifetime
+        has passed, up to PRESIGNED_URL_CACHE_SIZE of them.
+
+        :param object_keys: S3 object names
+        :param expires_in: Lifetime of newly signed URLs in seconds
+        :return: Dict of object name -> presigned URL
+        """
+        now = time.time()
+        urls, missing = {}, []
+        with self._presigned_lock:
+            for key in object_keys:
+                cached = self._presigned_urls.get(key)
+                if cached and cached[1] - now >= expires_in / 2:
+                    urls[key] = cached[0]
+                    self._presigned_urls.move_to_end(key)
+                else:
+                    missing.append(key)
+
+        signed = {
+            key: self.s3_client.generate_presigned_url(
+                'get_object',
+                Params = {'Bucket': self.bucket_name, 'Key': key},
+                ExpiresIn = expires_in
+            )
+            for key in missing
+        }
+
+        if signed:
+            with self._presigned_lock:
+                for key, url in signed.items():
+                    self._presigned_urls[key] = (url, now + expires_in)
+                    self._presigned_urls.move_to_end(key)
+                while len(self._presigned_urls) > PRESIGNED_URL_CACHE_SIZE:
+                    self._presigned_urls.popitem(last = False)
+            urls.update(signed)
+
+        return urls
+
     def get_public_url(self, object_key):
         """
         Get the public URL for a file in R2
@@ -198,7 +427,3 @@ class R2Storage:
         :return: Public URL of the file
         """
         return f"{self.public_url}/{object_key}"
-    
-
-# Singleton instance
-r2_storage = R2Storage()
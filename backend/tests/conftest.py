@@ -0,0 +1,76 @@
+"""
+Shared fixtures. Tests that need storage run against a local S3-compatible
+stand-in (moto's server), so no R2 credentials are needed:
+
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+
+The database tests also need a scratch PostgreSQL database, given as
+TEST_DATABASE_URL; they are skipped without it.
+"""
+import os
+import sys
+import tempfile
+import cv2
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope = 'session')
+def s3_server():
+    """Start a local S3 server with an empty bucket; yields its endpoint."""
+    boto3 = pytest.importorskip('boto3')
+    moto_server = pytest.importorskip('moto.server')
+
+    server = moto_server.ThreadedMotoServer(ip_address = '127.0.0.1', port = 0)
+    server.start()
+    host, port = server.get_host_and_port()
+    endpoint = f'http://{host}:{port}'
+
+    os.environ.update({
+        'S3_API': endpoint,
+        'CF_ACCESS_KEY': 'test',
+        'CF_SECRET_ACCESS_KEY': 'test',
+        'BUCKET_NAME': 'test-bucket',
+        'STORAGE_BACKEND': 'r2',
+        'DISK_CACHE_DIR': tempfile.mkdtemp(prefix = 'disk-cache-'),
+        'VIDEO_CACHE_DIR': tempfile.mkdtemp(prefix = 'video-cache-'),
+        'EXTRACT_WORKERS': '1'
+    })
+    os.environ.pop('DATABASE_URL', None)
+    boto3.client('s3', endpoint_url = endpoint, aws_access_key_id = 'test',
+                 aws_secret_access_key = 'test', region_name = 'us-east-1'
+                 ).create_bucket(Bucket = 'test-bucket')
+    yield endpoint
+    server.stop()
+
+
+@pytest.fixture(scope = 'session')
+def api(s3_server):
+    """The Flask app module, configured to use the local S3 server."""
+    os.chdir(BACKEND_DIR)
+    import api as api_module
+    return api_module
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture(scope = 'session')
+def video_path(tmp_path_factory) -> str:
+    """A short clip whose frames all differ (60 frames, 320x240)."""
+    path = str(tmp_path_factory.mktemp('videos') / 'clip.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30,
+                             (320, 240))
+    rng = np.random.default_rng(0)
+    for _ in range(60):
+        frame = cv2.resize(rng.integers(0, 255, (6, 8, 3), dtype = np.uint8),
+                           (320, 240), interpolation = cv2.INTER_NEAREST)
+        writer.write(frame)
+    writer.release()
+    return path
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+from storage.r2_storage import DELETE_BATCH_SIZE
+
+
+def _put_objects(storage, prefix: str, count: int) -> list[str]:
+    keys = [f'{prefix}frame_{i}.jpg' for i in range(count)]
+    with ThreadPoolExecutor(16) as executor:
+        list(executor.map(lambda key: storage.put_bytes(key, b'x'), keys))
+    return keys
+
+
+def test_delete_folder_in_batches(api):
+    storage = api.storage_backend
+    count = 2 * DELETE_BATCH_SIZE + 50
+    _put_objects(storage, 'cleanup-test/many/', count)
+    _put_objects(storage, 'cleanup-test/other/', 3)
+
+    progress = []
+    assert storage.delete_folder('cleanup-test/many/', progress.append)
+    assert progress[-1] == count
+    assert storage.list_files('cleanup-test/many/') == []
+    # Nothing outside the prefix is deleted
+    assert len(storage.list_files('cleanup-test/other/')) == 3
+
+
+def test_frame_set_files_deleted_in_background(api):
+    prefix = f'{api.R2_FRAMESETS_PREFIX}/cleanup-test-set/'
+    _put_objects(api.storage_backend, f'{prefix}frames/', 5)
+
+    api._delete_frame_set_files_later('cleanup-test-set').result(timeout = 30)
+    assert api.storage_backend.list_files(prefix) == []
+
+
+def test_background_delete_failure_is_logged(api, monkeypatch, capsys):
+    def fail(prefix, progress = None):
+        raise ConnectionError('storage unreachable')
+
+    monkeypatch.setattr(api.storage_backend, 'delete_folder', fail)
+    future = api._delete_frame_set_files_later('cleanup-test-failed')
+    assert isinstance(future.exception(timeout = 30), ConnectionError)
+
+    # Callbacks run just after waiters are woken up
+    out = ''
+    for _ in range(100):
+        out += capsys.readouterr().out
+        if 'cleanup-test-failed' in out:
+            break
+        time.sleep(0.01)
+    assert 'Error deleting files of frame set cleanup-test-failed' in out
+    assert 'storage unreachable' in out
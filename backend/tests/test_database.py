@@ -0,0 +1,223 @@
+"""
+Annotation storage tests against a real PostgreSQL database, given as
+TEST_DATABASE_URL (skipped without it). Its tables are dropped and
+recreated, so don't point it at a database holding data.
+"""
+import os
+import psycopg2
+import pytest
+from database import database
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL,
+                                reason = 'TEST_DATABASE_URL is not set')
+
+SIZES = {'orig_width': 1920, 'orig_height': 1080, 'render_width': 960,
+         'render_height': 540}
+
+
+def _query(sql: str, params = None) -> list:
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if cursor.description else None
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """The database module on freshly created tables."""
+    _query("""
+        DROP TABLE IF EXISTS frame_annotations, annotation_sessions,
+            user_tokens CASCADE;
+        DROP FUNCTION IF EXISTS apply_annotation_progress CASCADE
+    """)
+    monkeypatch.setattr(database, 'DATABASE_URL', TEST_DATABASE_URL)
+    monkeypatch.setattr(database, '_pool', None)
+    database._TOKEN_CACHE.clear()
+    database._OWNER_CACHE.clear()
+    assert database.init_db()
+    yield database
+    database.get_pool().closeall()
+
+
+def _session(frame_set_id: str = 'fs') -> tuple:
+    return _query("""
+        SELECT total_frames, annotated_frames, status, user_token
+        FROM annotation_sessions WHERE frame_set_id = %s
+    """, (frame_set_id,))[0]
+
+
+def _auto_save(db, frame_num: int, is_completed: bool = True, **kwargs):
+    return db.auto_save_frame_annotation(**{
+        'frame_set_id': 'fs', 'video_id': 'video', 'frame_num': frame_num,
+        'annotations': {'nose': {'x': frame_num, 'y': 1}},
+        'is_completed': is_completed, 'total_frames': 3, **SIZES, **kwargs})
+
+
+# ================================= AUTO-SAVE ================================
+
+def test_auto_save_creates_the_session_and_frame(db):
+    assert _auto_save(db, 0, last_frame_annotated = 0)
+    assert _auto_save(db, 0, is_completed = False,
+                      annotations = {'nose': {'x': 5, 'y': 5}})
+
+    session = db.load_annotation_session('fs')
+    assert session['session']['video_id'] == 'video'
+    assert session['session']['render_width'] == 960
+    assert session['frames'] == [{'frame_num': 0, 'is_completed': False,
+                                  'annotations': {'nose': {'x': 5, 'y': 5}}}]
+
+
+def test_auto_save_checks_the_token(db):
+    token = db.create_user_token()
+    assert _auto_save(db, 0, user_token = token)
+    assert _session()[3] == token
+    assert db.get_session_owner('fs') == (True, token)
+
+    db.deactivate_user_token(token)
+    assert not _auto_save(db, 1, user_token = token)
+    assert not _auto_save(db, 0, frame_set_id = 'other',
+                          user_token = 'unknown')
+    assert [frame['frame_num'] for frame in
+            db.load_annotation_session('fs')['frames']] == [0]
+    assert db.load_annotation_session('other') is None
+
+
+def test_auto_save_keeps_the_stored_frame_count(db):
+    _auto_save(db, 0)
+    db.update_session_total_frames('fs', 10)
+    # The client's count may be stale
+    _auto_save(db, 1, total_frames = 3)
+    assert _session()[0] == 10
+
+
+def _count_statements(db, monkeypatch) -> list:
+    """Record the statements run on pooled connections from now on."""
+    statements = []
+
+    class CountingCursor(psycopg2.extensions.cursor):
+        def execute(self, query, params = None):
+            statements.append(query)
+            return super().execute(query, params)
+
+    pool = db.get_pool()
+    getconn = pool.getconn
+
+    def counting_getconn():
+        conn = getconn()
+        conn.cursor_factory = CountingCursor
+        return conn
+
+    monkeypatch.setattr(pool, 'getconn', counting_getconn)
+    return statements
+
+
+def test_auto_save_is_one_statement(db, monkeypatch):
+    _auto_save(db, 0)
+    statements = _count_statements(db, monkeypatch)
+    assert _auto_save(db, 1)
+    assert len(statements) == 1
+
+
+# ================================= BULK SAVE ================================
+
+def _bulk_save(db, rows, **kwargs) -> int:
+    return db.save_frame_annotations_bulk(**{
+        'frame_set_id': 'fs', 'video_id': 'video', 'total_frames': 5,
+        'rows': rows, **SIZES, **kwargs})
+
+
+def test_bulk_save(db):
+    assert _bulk_save(db, [(0, {'a': 1}, True), (2, {'b': 2}, False),
+                           (0, {'a': 3}, True)]) == 2
+    # Existing frames are updated, others added
+    assert _bulk_save(db, [(2, {'b': 4}, True), (4, {}, False)],
+                      last_frame_annotated = 4) == 2
+
+    session = db.load_annotation_session('fs')
+    assert session['session']['last_frame_annotated'] == 4
+    assert [(frame['frame_num'], frame['annotations'], frame['is_completed'])
+            for frame in session['frames']] == [
+        (0, {'a': 3}, True), (2, {'b': 4}, True), (4, {}, False)]
+
+
+def test_bulk_save_without_frames_saves_the_session(db):
+    assert _bulk_save(db, []) == 0
+    assert _session()[:3] == (5, 0, 'in_progress')
+
+
+def test_bulk_save_statements(db, monkeypatch):
+    statements = _count_statements(db, monkeypatch)
+    _bulk_save(db, [(n, {}, False) for n in range(10)], total_frames = 2000)
+    # The session, then all frames in one batch
+    assert len(statements) == 2
+
+    statements.clear()
+    _bulk_save(db, [(n, {}, False) for n in range(1500)], total_frames = 2000)
+    assert len(statements) == 3
+    assert len(db.load_annotation_session('fs')['frames']) == 1500
+
+
+# ============================= PROGRESS TRIGGERS ============================
+
+def test_progress_follows_completed_frames(db):
+    _auto_save(db, 0)
+    _auto_save(db, 0)  # saving again doesn't count twice
+    _auto_save(db, 1, is_completed = False)
+    assert _session()[:3] == (3, 1, 'in_progress')
+
+    _auto_save(db, 1)
+    _auto_save(db, 2)
+    assert _session()[:3] == (3, 3, 'completed')
+
+    _auto_save(db, 2, is_completed = False)
+    assert _session()[:3] == (3, 2, 'in_progress')
+
+    _query("DELETE FROM frame_annotations WHERE frame_num = 0")
+    assert _session()[:3] == (3, 1, 'in_progress')
+
+
+def test_progress_of_bulk_saves(db):
+    _bulk_save(db, [(n, {}, n % 2 == 0) for n in range(5)])
+    assert _session()[:3] == (5, 3, 'in_progress')
+    _bulk_save(db, [(n, {}, True) for n in range(5)])
+    assert _session()[:3] == (5, 5, 'completed')
+
+    # Several sessions in one statement
+    _bulk_save(db, [(0, {}, True)], frame_set_id = 'other', total_frames = 2)
+    _query("UPDATE frame_annotations SET is_completed = FALSE")
+    assert _session()[1:3] == (0, 'in_progress')
+    assert _session('other')[1:3] == (0, 'in_progress')
+
+
+def test_extending_updates_the_status(db):
+    for n in range(3):
+        _auto_save(db, n)
+    assert _session()[2] == 'completed'
+    db.update_session_total_frames('fs', 6)
+    assert _session()[:3] == (6, 3, 'in_progress')
+
+
+def test_init_recounts_progress_once(db):
+    # Sessions saved before the triggers existed
+    _query("""
+        DROP TRIGGER frame_annotations_progress_insert ON frame_annotations;
+        DROP TRIGGER frame_annotations_progress_update ON frame_annotations;
+        DROP TRIGGER frame_annotations_progress_delete ON frame_annotations
+    """)
+    _auto_save(db, 0)
+    _auto_save(db, 1)
+    _query("UPDATE annotation_sessions SET annotated_frames = 7")
+
+    assert db.init_db()
+    assert _session()[:3] == (3, 2, 'in_progress')
+    # The triggers exist now: initializing again changes nothing
+    assert db.init_db()
+    _auto_save(db, 2)
+    assert _session()[:3] == (3, 3, 'completed')
@@ -0,0 +1,316 @@
+"""
+Connection pool, request scope and cache tests, against fake psycopg2
+connections (no database needed).
+"""
+import threading
+import time
+import psycopg2
+import pytest
+from psycopg2 import extensions
+from database import database
+from database.cache import MISSING, TTLCache
+from database.pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 1
+
+    def execute(self, query, params = None):
+        if self.conn.fail:
+            raise psycopg2.OperationalError('connection lost')
+        self.conn.status = extensions.TRANSACTION_STATUS_INTRANS
+        self.conn.log.append(query.split()[0])
+
+    def fetchone(self):
+        return self.conn.row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.fail = False
+        self.row = (True,)
+        self.log = []
+
+    def cursor(self, cursor_factory = None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.log.append('COMMIT')
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.log.append('ROLLBACK')
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return self.status
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Make psycopg2.connect return fake connections; yields those made."""
+    made = []
+
+    def connect(dsn):
+        made.append(FakeConnection())
+        return made[-1]
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    return made
+
+
+@pytest.fixture
+def db(connections, monkeypatch):
+    """The database module with a fresh pool of fake connections."""
+    monkeypatch.setattr(database, 'DATABASE_URL', 'postgresql://fake')
+    monkeypatch.setattr(database, '_pool', None)
+    database._TOKEN_CACHE.clear()
+    database._OWNER_CACHE.clear()
+    yield database
+    # Don't leak a scope into other tests on this thread
+    database._request_scope.active = False
+    database._request_scope.conn = None
+
+
+# ============================== CONNECTION POOL =============================
+
+def test_pool_reuses_connections(connections):
+    pool = ConnectionPool('fake', min_size = 1, max_size = 2)
+    assert len(connections) == 1
+
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert pool.stats()['created'] == 1
+    assert pool.stats()['checkouts'] == 2
+
+
+def test_pool_rolls_back_returned_transaction(connections):
+    pool = ConnectionPool('fake', min_size = 0)
+    conn = pool.getconn()
+    conn.cursor().execute('UPDATE t SET x = 1')
+    pool.putconn(conn)
+
+    assert conn.log[-1] == 'ROLLBACK'
+    assert pool.getconn() is conn
+
+
+def test_pool_waits_for_a_free_connection(connections):
+    pool = ConnectionPool('fake', min_size = 0, max_size = 2, timeout = 0.2)
+    first, second = pool.getconn(), pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+    threading.Timer(0.05, pool.putconn, (first,)).start()
+    assert pool.getconn() is first
+    stats = pool.stats()
+    assert stats['timeouts'] == 1
+    assert stats['waits'] == 1
+    assert stats['size'] == 2
+
+
+def test_pool_replaces_old_and_closed_connections(connections):
+    pool = ConnectionPool('fake', min_size = 0, max_age = 0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.stats()['size'] == 0
+
+    pool.max_age = 100
+    conn = pool.getconn()
+    conn.closed = 1
+    pool.putconn(conn)
+    assert pool.getconn() is not conn
+    assert pool.stats()['closed'] == 2
+
+
+def test_pool_pings_idle_connections(connections):
+    pool = ConnectionPool('fake', min_size = 0, check_after = 0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert conn.log == ['SELECT', 'ROLLBACK']
+
+    pool.putconn(conn)
+    conn.fail = True
+    replacement = pool.getconn()
+    assert replacement is not conn and conn.closed
+    assert pool.stats()['failed_checks'] == 1
+
+
+def test_pool_frees_slot_when_connect_fails(monkeypatch):
+    def connect(dsn):
+        raise psycopg2.OperationalError('server unreachable')
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    pool = ConnectionPool('fake', min_size = 1, max_size = 1)
+    for _ in range(2):
+        with pytest.raises(psycopg2.OperationalError):
+            pool.getconn()
+    assert pool.stats()['size'] == 0
+
+
+def test_pool_under_concurrency(connections):
+    pool = ConnectionPool('fake', min_size = 0, max_size = 3)
+
+    def work():
+        for _ in range(50):
+            pool.putconn(pool.getconn())
+
+    threads = [threading.Thread(target = work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    assert stats['checkouts'] == 400
+    assert stats['in_use'] == 0
+    assert len(connections) <= 3
+
+
+# =============================== REQUEST SCOPE ==============================
+
+def test_calls_outside_a_scope_commit_each(db, connections):
+    db.validate_user_token('a')
+    db.validate_user_token('b')
+
+    conn, = connections
+    assert conn.log == ['SELECT', 'COMMIT', 'SELECT', 'COMMIT']
+    assert db.pool_stats()['in_use'] == 0
+
+
+def test_scope_shares_one_transaction(db, connections):
+    db.begin_request_scope()
+    db.validate_user_token('a')
+    db.get_session_owner('fs')
+    assert db.pool_stats()['in_use'] == 1
+    db.end_request_scope()
+
+    conn, = connections
+    assert conn.log == ['SELECT', 'SELECT', 'COMMIT']
+    assert db.pool_stats()['in_use'] == 0
+    assert db.pool_stats()['checkouts'] == 1
+
+
+def test_scope_without_queries_takes_no_connection(db, connections):
+    db.begin_request_scope()
+    db.end_request_scope()
+    assert connections == []
+
+
+def test_scope_rolls_back(db, connections):
+    db.begin_request_scope()
+    db.deactivate_user_token('a')
+    db.end_request_scope(commit = False)
+
+    conn, = connections
+    assert conn.log == ['UPDATE', 'ROLLBACK']
+    assert db.pool_stats()['in_use'] == 0
+
+
+def test_failed_call_rolls_back_scope(db, connections):
+    db.begin_request_scope()
+    db.validate_user_token('a')
+    conn, = connections
+    conn.fail = True
+    with pytest.raises(psycopg2.OperationalError):
+        db.validate_user_token('b')
+    assert conn.log == ['SELECT', 'ROLLBACK']
+    db.end_request_scope(commit = False)
+    assert db.pool_stats()['in_use'] == 0
+
+
+def test_invalidation_waits_for_commit(db, connections):
+    assert db.validate_user_token('a')
+
+    db.begin_request_scope()
+    assert db.deactivate_user_token('a')
+    # Not committed yet: other requests still see the token as active
+    assert db._TOKEN_CACHE.get('a') is True
+    db.end_request_scope()
+
+    assert db._TOKEN_CACHE.get('a') is db.MISSING
+    connections[0].row = (False,)
+    assert not db.validate_user_token('a')
+
+
+def test_invalidation_outside_a_scope(db, connections):
+    assert db.get_session_owner('fs') == (True, True)
+    db.delete_annotation_session('fs')
+    assert db._OWNER_CACHE.get('fs') is db.MISSING
+
+
+# =================================== CACHES =================================
+
+def test_ttl_cache_lru_and_expiry():
+    cache = TTLCache(max_entries = 2, ttl = 0.2)
+    cache.put('a', None)  # falsy values are cached too
+    cache.put('b', False)
+    assert cache.get('a') is None  # now more recent than 'b'
+    cache.put('c', True)
+    assert cache.get('b') is MISSING
+    assert cache.get('c') is True
+
+    time.sleep(0.25)
+    assert cache.get('c') is MISSING
+    assert cache.stats()['entries'] == 1
+
+
+def test_ttl_cache_invalidation_is_per_key():
+    cache = TTLCache(max_entries = 10, ttl = 10)
+    other = next(key for key in map(str, range(100))
+                 if cache._stripe(key) != cache._stripe('a'))
+
+    generation = cache.generation('a')
+    cache.invalidate(other)
+    cache.put('a', 1, generation)
+    assert cache.get('a') == 1
+
+    # Invalidated while it was loaded: the value may be stale
+    generation = cache.generation('a')
+    cache.invalidate('a')
+    cache.put('a', 2, generation)
+    assert cache.get('a') is MISSING
+
+    generation = cache.generation('a')
+    cache.clear()
+    cache.put('a', 3, generation)
+    assert cache.get('a') is MISSING
+
+
+def test_lookups_are_cached(db, connections):
+    assert db.validate_user_token('a')
+    assert db.get_session_owner('fs') == (True, True)
+    assert db.validate_user_token('a')
+    assert db.get_session_owner('fs') == (True, True)
+    assert connections[0].log.count('SELECT') == 2
+
+
+def test_missing_sessions_are_not_cached(db, connections):
+    db.validate_user_token('a')
+    connections[0].row = None
+    assert db.get_session_owner('fs') == (False, None)
+    # It may be created by another worker next
+    assert db._OWNER_CACHE.get('fs') is MISSING
+
+
+def test_saves_only_invalidate_their_session(db, connections):
+    assert db.get_session_owner('fs') == (True, True)
+    assert db.get_session_owner('other') == (True, True)
+    db.delete_annotation_session('fs')
+    assert db._OWNER_CACHE.get('fs') is MISSING
+    assert db._OWNER_CACHE.get('other') == (True, True)
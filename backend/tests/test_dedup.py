@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+from frame_extractor import extract_frames
+from phash import (NearDuplicateFilter, from_hex, hamming, phash, phash_batch,
+                   to_hex)
+
+
+def _frame(seed: int, noise: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    frame = cv2.resize(rng.integers(0, 255, (6, 8, 3), dtype = np.uint8),
+                       (320, 240), interpolation = cv2.INTER_NEAREST)
+    if noise:
+        jitter = np.random.default_rng(seed + 1000).integers(
+            -noise, noise + 1, frame.shape)
+        frame = np.clip(frame.astype(int) + jitter, 0, 255).astype(np.uint8)
+    return frame
+
+
+def test_phash_near_and_far():
+    base = phash(_frame(0))
+    assert phash(_frame(0)) == base
+    assert hamming(base, [phash(_frame(0, noise = 8))])[0] <= 4
+    assert hamming(base, [phash(_frame(1))])[0] > 16
+
+
+def test_phash_batch_matches_single_hashes():
+    frames = [_frame(seed) for seed in range(5)]
+    assert phash_batch(frames).tolist() == [phash(frame) for frame in frames]
+    assert phash_batch(np.stack(frames)).dtype == np.uint64
+
+
+def test_hamming_and_hex():
+    assert hamming(0b1011, [0, 0b1011, 2 ** 64 - 1]).tolist() == [3, 0, 61]
+    assert to_hex(255) == '00000000000000ff'
+    assert from_hex(to_hex(2 ** 63 + 5)) == 2 ** 63 + 5
+
+
+def test_filter_rejects_near_duplicates():
+    dedup = NearDuplicateFilter(2, [0b0])
+    assert not dedup.accept(0b11)
+    assert dedup.accept(0b111)
+    assert not dedup.accept(0b1111)  # near the frame kept just before
+    assert dedup.hashes.tolist() == [0, 0b111]
+    assert dedup.rejected == 2
+
+
+def test_filter_disabled():
+    dedup = NearDuplicateFilter(-1)
+    assert all(dedup.accept(7) for _ in range(3))
+    assert dedup.hashes.tolist() == [7, 7, 7]
+
+
+def test_filter_keeps_many_hashes():
+    hashes = [2 ** 63 + i * 2 ** 40 for i in range(100)]
+    dedup = NearDuplicateFilter(0, hashes[:10])
+    assert all(dedup.accept(hash_) for hash_ in hashes[10:])
+    assert dedup.hashes.tolist() == hashes
+    assert not dedup.accept(hashes[50])
+
+
+def test_extraction_skips_duplicates(video_path):
+    frames = list(extract_frames(video_path, [0, 1, 2], workers = 1))
+    assert all(frame.data is not None for frame in frames)
+
+    # Frames near the hashes given are not encoded
+    dedup = NearDuplicateFilter(4, [frames[1].phash])
+    frames = list(extract_frames(video_path, [0, 1, 2], workers = 1,
+                                 dedup = dedup))
+    assert [frame.data is None for frame in frames] == [False, True, False]
+    assert len(dedup.hashes) == 1  # the caller decides what is kept
+
+
+def test_renumbered_frames_keep_their_keys(api):
+    frame_paths = {
+        idx: {'frame_idx': idx, 'frame_num': num,
+              'r2_key': f'frame_sets/fs/frames/frame_{idx}.jpg'}
+        for idx, num in enumerate([10, 40, 20, 30], start = 5)}
+    kept, renumbered = api._renumber_frames('fs', [10, 40, 20, 30],
+                                            frame_paths, 5)
+    assert kept == [10, 20, 30, 40]
+    assert [(idx, info['frame_num'], info['r2_key'][-11:])
+            for idx, info in sorted(renumbered.items())] == [
+        (5, 10, 'frame_5.jpg'), (6, 20, 'frame_7.jpg'),
+        (7, 30, 'frame_8.jpg'), (8, 40, 'frame_6.jpg')]
+    assert all(info['frame_idx'] == idx for idx, info in renumbered.items())
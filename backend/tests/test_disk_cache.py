@@ -0,0 +1,108 @@
+import os
+import time
+from disk_cache import DiskCache, prune_lru
+
+
+def _age(path: str, seconds: float):
+    """Make a file look last used `seconds` ago."""
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def _wait_pruned(cache: DiskCache):
+    for _ in range(500):
+        with cache._lock:
+            if not cache._pruning:
+                return
+        time.sleep(0.01)
+    raise TimeoutError
+
+
+def test_put_get_delete(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes = 1000)
+    assert cache.get('a') is None
+    cache.put('a', b'data')
+    assert cache.get('a') == b'data'
+    with open(cache.path('a'), 'rb') as f:
+        assert f.read() == b'data'
+
+    # Shared by a second instance (e.g. another worker) of the directory
+    assert DiskCache(str(tmp_path), max_bytes = 1000).get('a') == b'data'
+
+    cache.delete('a')
+    assert cache.get('a') is None
+    cache.delete('a')  # already gone
+
+
+def test_identical_values_are_stored_once(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes = 1000)
+    cache.put('a', b'same')
+    cache.put('b', b'same')
+    assert cache.path('a') == cache.path('b')
+    cache.delete('a')
+    assert cache.get('b') == b'same'
+
+
+def test_disabled(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache'), max_bytes = 0)
+    cache.put('a', b'data')
+    assert cache.get('a') is None and cache.path('a') is None
+    assert not os.path.exists(tmp_path / 'cache')
+
+
+def test_prune_lru(tmp_path):
+    for i in range(10):
+        path = tmp_path / f'{i}.bin'
+        path.write_bytes(b'x' * 100)
+        _age(path, 100 - i)  # 0.bin is the least recently used
+    (tmp_path / '.tmp-partial').write_bytes(b'x' * 500)
+
+    assert prune_lru(str(tmp_path), 2000) == 0
+    # Over the limit: evict down to 90% of it
+    assert prune_lru(str(tmp_path), 500) == 600
+    assert sorted(os.listdir(tmp_path)) == [
+        '.tmp-partial', '6.bin', '7.bin', '8.bin', '9.bin']
+
+
+def test_prune_lru_with_evict(tmp_path):
+    for i in range(3):
+        path = tmp_path / f'{i}.bin'
+        path.write_bytes(b'x' * 100)
+        _age(path, 100 - i)
+
+    def evict(path):
+        if path.endswith('0.bin'):
+            return False
+        os.unlink(path)
+        return True
+
+    assert prune_lru(str(tmp_path), 150, evict) == 200
+    assert sorted(os.listdir(tmp_path)) == ['0.bin']
+
+
+def test_prune_evicts_least_recently_used_and_their_refs(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes = 10 ** 6)
+    for i in range(5):
+        cache.put(f'key{i}', bytes([i]) * 100)
+        _age(cache.path(f'key{i}'), 100 - i)
+    cache.get('key0')  # reading marks it as recently used
+
+    cache.max_bytes = 350
+    cache.prune()
+    assert [cache.get(f'key{i}') is not None for i in range(5)] == [
+        True, False, False, True, True]
+    refs = [name for _, _, names in os.walk(tmp_path / 'refs')
+            for name in names]
+    assert len(refs) == 3
+
+
+def test_writes_prune_in_the_background(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes = 1000)
+    for i in range(30):
+        cache.put(f'key{i}', bytes([i]) * 100)
+        _wait_pruned(cache)
+    sizes = [os.path.getsize(os.path.join(root, name))
+             for root, _, names in os.walk(tmp_path / 'objects')
+             for name in names]
+    assert sum(sizes) <= 1000
+    assert cache.get('key29') == bytes([29]) * 100
@@ -0,0 +1,95 @@
+import threading
+import time
+from frame_cache import FrameCache
+
+
+def _wait_idle(cache: FrameCache):
+    for _ in range(500):
+        with cache._lock:
+            if not cache._loading:
+                return
+        time.sleep(0.01)
+    raise TimeoutError
+
+
+def test_lru_bounded_by_size():
+    cache = FrameCache(max_bytes = 10)
+    cache.put('a', b'aaaa')
+    cache.put('b', b'bbbb')
+    assert cache.get('a') == b'aaaa'  # now more recent than 'b'
+    cache.put('c', b'cccc')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'aaaa' and cache.get('c') == b'cccc'
+    cache.put('big', b'x' * 11)  # larger than the whole cache
+    assert cache.get('big') is None
+    stats = cache.stats()
+    assert (stats['items'], stats['bytes'], stats['evictions']) == (2, 8, 1)
+    assert (stats['hits'], stats['misses']) == (3, 2)
+
+
+def test_replacing_a_value_updates_the_size():
+    cache = FrameCache(max_bytes = 10)
+    cache.put('a', b'aaaa')
+    cache.put('a', b'aa')
+    assert cache.size == 2
+
+
+def test_discard():
+    cache = FrameCache()
+    for idx in range(4):
+        cache.put(('fs', idx), b'x')
+    cache.put(('other', 0), b'y')
+    cache.discard(lambda key: key[0] == 'fs' and key[1] >= 2)
+    assert sorted(cache._items) == [('fs', 0), ('fs', 1), ('other', 0)]
+    assert cache.size == 3
+
+
+def test_get_or_load():
+    cache = FrameCache()
+    loads = []
+    load = lambda: loads.append(1) or b'data'
+    assert cache.get_or_load('a', load) == b'data'
+    assert cache.get_or_load('a', load) == b'data'
+    assert len(loads) == 1
+
+
+def test_prefetch():
+    cache = FrameCache()
+    cache.put('cached', b'old')
+    loaded = []
+
+    def load(key):
+        loaded.append(key)
+        if key == 'broken':
+            raise OSError('not found')
+        return key.encode()
+
+    cache.prefetch(['cached', 'a', 'b', 'broken'], load)
+    _wait_idle(cache)
+    assert sorted(loaded) == ['a', 'b', 'broken']
+    assert cache.get('a') == b'a' and cache.get('cached') == b'old'
+    assert cache.get('broken') is None
+
+
+def test_discard_during_prefetch():
+    cache = FrameCache()
+    started, release = threading.Event(), threading.Event()
+
+    def load(key):
+        started.set()
+        release.wait(5)
+        return b'outdated'
+
+    cache.prefetch([('fs', 1)], load)
+    assert started.wait(5)
+    # The frame set is deleted or re-extracted while the frame is loading
+    cache.discard(lambda key: key[0] == 'fs')
+    release.set()
+    _wait_idle(cache)
+    assert cache.get(('fs', 1)) is None
+
+    # Later prefetches are cached again
+    cache.prefetch([('fs', 1)], lambda key: b'new')
+    _wait_idle(cache)
+    assert cache.get(('fs', 1)) == b'new'
@@ -0,0 +1,69 @@
+import io
+import numpy as np
+import pytest
+from frame_index import FrameIndex
+from video_processor import VideoProcessor
+
+
+@pytest.fixture(scope = 'module')
+def frame_index(video_path) -> FrameIndex:
+    index = FrameIndex.build(video_path)
+    if index is None:
+        pytest.skip('The video backend cannot read raw packets')
+    return index
+
+
+def test_build(frame_index):
+    assert frame_index.total_frames == 60
+    assert frame_index.fps == pytest.approx(30)
+    assert frame_index.keyframes[0] == 0
+    assert np.all(np.diff(frame_index.pts_ms) > 0)
+    assert frame_index.timestamp(30) == pytest.approx(1000, abs = 1)
+
+    # Offsets are the running total of the packet sizes in decode order
+    order = np.argsort(frame_index.offsets)
+    ends = frame_index.offsets[order] + frame_index.sizes[order]
+    assert np.all(frame_index.sizes > 0)
+    assert frame_index.offsets[order][0] == 0
+    assert np.array_equal(frame_index.offsets[order][1:], ends[:-1])
+
+
+def test_keyframe_before(frame_index):
+    keyframes = frame_index.keyframes
+    assert frame_index.keyframe_before(0) == 0
+    assert frame_index.keyframe_before(59) == keyframes[-1]
+    for keyframe in keyframes[1:]:
+        assert frame_index.keyframe_before(keyframe) == keyframe
+        assert frame_index.keyframe_before(keyframe - 1) < keyframe
+
+
+def test_round_trip(frame_index):
+    loaded = FrameIndex.from_bytes(frame_index.to_bytes())
+    for name in ('pts_ms', 'keyframes', 'offsets', 'sizes'):
+        assert np.array_equal(getattr(loaded, name), getattr(frame_index, name))
+    assert loaded.fps == frame_index.fps
+
+
+def test_rejects_old_archives():
+    index = FrameIndex([0, 40, 80], [0], [0, 10, 20], [10, 10, 10], 25)
+    data = index.to_bytes()
+    assert FrameIndex.from_bytes(data).total_frames == 3
+
+    out_of_order = FrameIndex([0, 80, 40], [0], [0, 10, 20], [10, 10, 10], 25)
+    with pytest.raises(ValueError):
+        FrameIndex.from_bytes(out_of_order.to_bytes())
+
+    # Without offsets, as saved before they were added
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, pts_ms = index.pts_ms, keyframes = index.keyframes,
+                        sizes = index.sizes, fps = np.float64(25))
+    with pytest.raises(ValueError):
+        FrameIndex.from_bytes(buffer.getvalue())
+
+
+def test_processor_uses_exact_frame_count(video_path, frame_index):
+    processor = VideoProcessor(video_path, frame_index)
+    try:
+        assert processor.total_frames == 60
+    finally:
+        processor.cap.release()
@@ -0,0 +1,96 @@
+import threading
+import pytest
+from storage import LocalStorage
+from storage.frame_pack import FramePackWriter
+from test_frame_serving import _ingest, _wait
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(params = ['r2', 'local'])
+def storage(request, tmp_path):
+    if request.param == 'local':
+        return LocalStorage(str(tmp_path))
+    return request.getfixturevalue('api').storage_backend
+
+
+def _blobs(count: int, size: int) -> list[bytes]:
+    return [bytes([i % 256]) * size for i in range(count)]
+
+
+def test_small_pack(storage):
+    pack = storage.open_pack('packs/small.pack')
+    ranges = [pack.append(blob) for blob in _blobs(5, 100)]
+    pack.close()
+
+    assert ranges == [(100 * i, 100) for i in range(5)]
+    for blob, (offset, length) in zip(_blobs(5, 100), ranges):
+        assert storage.get_bytes('packs/small.pack', offset, length) == blob
+
+
+def test_concurrent_appends(storage):
+    pack = storage.open_pack('packs/concurrent.pack')
+    ranges = {}
+
+    def append(i, blob):
+        ranges[i] = pack.append(blob)
+
+    threads = [threading.Thread(target = append, args = (i, blob))
+               for i, blob in enumerate(_blobs(40, 1000))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pack.close()
+
+    # Each blob lands in its own range, with no gaps
+    assert sorted(ranges.values()) == [(1000 * i, 1000) for i in range(40)]
+    for i, (offset, length) in ranges.items():
+        assert storage.get_bytes('packs/concurrent.pack', offset, length) == \
+            _blobs(40, 1000)[i]
+
+
+def test_aborted_pack_is_not_stored(storage):
+    pack = storage.open_pack('packs/aborted.pack')
+    pack.append(b'data')
+    pack.abort()
+    assert isinstance(storage.get_many(['packs/aborted.pack'])
+                      ['packs/aborted.pack'], Exception)
+
+
+def test_multipart_pack(api):
+    storage = api.storage_backend
+    pack = FramePackWriter(storage.s3_client, storage.bucket_name,
+                           'packs/multipart.pack', part_size = 5 * MB)
+    blobs = _blobs(12, MB)
+    ranges = [pack.append(blob) for blob in blobs]
+    assert pack._upload_id is not None  # full parts are uploaded early
+    pack.close()
+
+    assert len(pack._parts) == 3
+    for blob, (offset, length) in zip(blobs, ranges):
+        assert storage.get_bytes('packs/multipart.pack', offset, length) == blob
+
+
+def test_ingest_and_extend_with_pack_layout(api, client, video_path):
+    frame_set = _ingest(client, video_path, layout = 'pack',
+                        keep_video = 'true')
+    frame_set_id = frame_set['frame_set_id']
+    meta = api._load_meta(frame_set_id)
+    assert meta.get('layout') == 'pack'
+    assert meta.r2_key(0).endswith('frames.0.pack')
+    assert 'offset' in meta.frame_info(4)
+
+    resp = client.post(f'/frame-set/{frame_set_id}/extend?count=3')
+    assert resp.status_code == 202, resp.json
+    assert _wait(client, resp.json['job_id'])['status'] == 'completed'
+
+    info = client.get(f'/frame-set/{frame_set_id}/info').json
+    assert len(info['frame_urls']) == 8
+    meta = api._load_meta(frame_set_id)
+    # The extension went into a pack of its own
+    assert {meta.r2_key(idx).rsplit('/', 1)[1] for idx in range(8)} == {
+        'frames.0.pack', 'frames.5.pack'}
+    for idx in range(8):
+        resp = client.get(f'/frame-set/{frame_set_id}/frame/{idx}.jpg')
+        assert resp.status_code == 200 and resp.data[:3] == b'\xff\xd8\xff'
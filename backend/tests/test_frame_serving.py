@@ -0,0 +1,157 @@
+import json
+import struct
+import threading
+import time
+import urllib.request
+from ingest_jobs import IngestJob, IngestJobManager
+
+
+def _wait(client, job_id: str) -> dict:
+    for _ in range(600):
+        job = client.get(f'/frame-set/jobs/{job_id}').json
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.1)
+    raise TimeoutError(job_id)
+
+
+def _ingest(client, video_path: str, **form) -> dict:
+    with open(video_path, 'rb') as f:
+        resp = client.post('/frame-set', data = {
+            'video': (f, 'clip.mp4'), 'num_frames': '5', **form})
+    assert resp.status_code == 202, resp.json
+    job = _wait(client, resp.json['job_id'])
+    assert job['status'] == 'completed', job['error']
+    return job['result']
+
+
+def test_presigned_urls(api, client, video_path, monkeypatch):
+    monkeypatch.setattr(api, 'FRAME_SERVING', 'presigned')
+    frame_set = _ingest(client, video_path)
+    frame_set_id = frame_set['frame_set_id']
+
+    urls = client.get(f'/frame-set/{frame_set_id}/info').json['frame_urls']
+    assert len(urls) == 5
+    # The frame is fetched straight from storage, not through the app
+    with urllib.request.urlopen(urls[1]) as resp:
+        assert resp.read(3) == b'\xff\xd8\xff'
+
+    # Signed URLs are reused, and the image route redirects to them
+    assert client.get(f'/frame-set/{frame_set_id}/info').json['frame_urls'] == urls
+    resp = client.get(f'/frame-set/{frame_set_id}/frame/1.jpg')
+    assert resp.status_code == 302
+    assert resp.headers['Location'] == urls[1]
+
+
+def test_proxied_frame(api, client, video_path):
+    frame_set = _ingest(client, video_path)
+    frame_set_id = frame_set['frame_set_id']
+    # The image is only sent in the 'first_frame' event
+    assert 'frame_img' not in frame_set['first_frame']
+    assert frame_set['first_frame']['frame_url']
+
+    resp = client.get(f'/frame-set/{frame_set_id}/frame/2.jpg')
+    assert resp.status_code == 200
+    assert resp.data[:3] == b'\xff\xd8\xff'
+    resp = client.get(f'/frame-set/{frame_set_id}/frame/2.jpg',
+                      headers = {'If-None-Match': resp.headers['ETag']})
+    assert resp.status_code == 304
+
+
+def test_first_frame_before_metadata(api, client, video_path):
+    """The first frame's URL works while the ingest is still running."""
+    job = IngestJob('0' * 32, 5)
+    release = threading.Event()
+
+    def extract_and_wait(job: IngestJob):
+        api._extract_unique_frames(job, video_path, 'video', [0, 10, 20],
+                                   60, 'uniform', None, None, None)
+        release.wait(30)  # meta.json is not written yet
+
+    api.INGEST_JOBS.submit(job, extract_and_wait)
+    try:
+        for _ in range(300):
+            if job.first_frame is not None:
+                break
+            time.sleep(0.1)
+        url = job.first_frame['frame_url']
+        assert url == f'/frame-set/{job.frame_set_id}/frame/0.jpg?job={job.id}'
+
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert resp.data[:3] == b'\xff\xd8\xff'
+        # Not without the job, nor for other frames
+        assert client.get(url.split('?')[0]).status_code == 404
+        assert client.get(url.replace('/0.jpg', '/1.jpg')).status_code == 404
+
+        # Other workers find it through the shared job state
+        api.INGEST_JOBS._sync(job)
+        other_worker = IngestJobManager(store = api.storage_backend)
+        info = other_worker.first_frame_info(job.id)
+        assert info['frame_set_id'] == job.frame_set_id
+        assert info['frame_num'] == 0
+        assert 'first_frame_info' not in other_worker.status(job.id)
+    finally:
+        release.set()
+
+
+def test_frame_image_route(api, client, video_path):
+    frame_set = _ingest(client, video_path)
+    frame_set_id = frame_set['frame_set_id']
+
+    resp = client.get(f'/frame-set/{frame_set_id}/frame/4.jpg')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'image/jpeg'
+    assert 'max-age' in resp.headers['Cache-Control']
+    assert client.get(f'/frame-set/{frame_set_id}/frame/5.jpg').status_code == 404
+
+    # Pipeline stage timings are reported by the health check
+    stats = client.get('/health').json['ingest_pipeline']
+    assert stats['runs'] >= 1
+    assert stats['upload']['items'] >= 5
+
+
+def test_presigned_url_cache_is_bounded(api, monkeypatch):
+    from storage import r2_storage
+    monkeypatch.setattr(r2_storage, 'PRESIGNED_URL_CACHE_SIZE', 3)
+    storage = api.storage_backend
+    monkeypatch.setattr(storage, '_presigned_urls', type(storage._presigned_urls)())
+
+    first = storage.get_presigned_url('bounded/0.jpg')
+    storage.get_presigned_urls([f'bounded/{i}.jpg' for i in range(1, 3)])
+    assert storage.get_presigned_url('bounded/0.jpg') == first  # used again
+    storage.get_presigned_urls(['bounded/3.jpg', 'bounded/4.jpg'])
+
+    # Live URLs are evicted too, least recently used first
+    assert list(storage._presigned_urls) == [
+        'bounded/0.jpg', 'bounded/3.jpg', 'bounded/4.jpg']
+
+
+def _unpack(data: bytes) -> tuple[dict, bytes]:
+    header_len = struct.unpack('>I', data[:4])[0]
+    return json.loads(data[4:4 + header_len]), data[4 + header_len:]
+
+
+def test_packed_frame_batch(api, client, video_path):
+    frame_set = _ingest(client, video_path)
+    frame_set_id = frame_set['frame_set_id']
+
+    resp = client.get(f'/frame-set/{frame_set_id}/frames?start=1&count=10')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/octet-stream'
+    header, body = _unpack(resp.data)
+    assert header['frame_count'] == 5 and header['start'] == 1
+    # Cut at the end of the set
+    assert [frame['frame_idx'] for frame in header['frames']] == [1, 2, 3, 4]
+    for frame in header['frames']:
+        image = client.get(f"/frame-set/{frame_set_id}/frame/{frame['frame_idx']}.jpg")
+        assert body[frame['offset']:frame['offset'] + frame['length']] == \
+            image.data
+    assert header['frames'][-1]['offset'] + header['frames'][-1]['length'] == \
+        len(body)
+
+    for query in ('start=5', 'start=-1', 'count=0',
+                  f'count={api.FRAMES_BATCH_MAX + 1}'):
+        assert client.get(f'/frame-set/{frame_set_id}/frames?{query}'
+                          ).status_code == 400
+    assert client.get('/frame-set/missing/frames').status_code == 404
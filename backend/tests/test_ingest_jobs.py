@@ -0,0 +1,79 @@
+import time
+from ingest_jobs import IngestJob, IngestJobManager
+from storage import LocalStorage
+
+
+def _finished_job(manager: IngestJobManager, result = None) -> IngestJob:
+    job = IngestJob('f' * 32, 3)
+    manager.submit(job, lambda job: result)
+    for _ in range(100):
+        if job.finished:
+            break
+        time.sleep(0.01)
+    return job
+
+
+def test_progress_events_are_coalesced():
+    job = IngestJob('frame-set', 100)
+    job.emit('status', status = 'running')
+    for idx in range(100):
+        job.advance(idx)
+    job.set_first_frame({'frame_idx': 0, 'frame_img': 'abc', 'frame_url': '/0'})
+    job.advance(100)
+    job.finish('completed', result = {})
+
+    assert len(job._events) == 3  # progress isn't accumulated
+    events = [(event['event'], event.get('done')) for event in job.events()]
+    assert events == [('status', None), ('first_frame', None),
+                      ('progress', 101), ('completed', None)]
+
+
+def test_listener_gets_latest_progress():
+    job = IngestJob('frame-set', 3)
+    events = job.events()
+    job.advance(0)
+    assert next(events)['done'] == 1
+    job.advance(1)
+    job.advance(2)
+    assert next(events)['done'] == 3
+    job.finish('failed', error = 'boom')
+    assert next(events)['event'] == 'failed'
+    assert next(events, None) is None
+
+
+def test_status_leaves_out_first_frame_image():
+    job = IngestJob('frame-set', 1)
+    job.set_first_frame({'frame_idx': 0, 'frame_img': 'abc', 'frame_url': '/0'})
+    assert job.to_dict()['first_frame'] == {'frame_idx': 0, 'frame_url': '/0'}
+    assert job.first_frame['frame_img'] == 'abc'
+
+
+def test_expired_state_deleted_on_read(tmp_path):
+    store = LocalStorage(str(tmp_path))
+    runner = IngestJobManager(store = store)
+    job = _finished_job(runner, result = {'count': 3})
+
+    other_worker = IngestJobManager(store = store)
+    assert other_worker.status(job.id)['result'] == {'count': 3}
+    other_worker.ttl = -1
+    assert other_worker.status(job.id) is None
+    assert store.list_files('ingest_jobs/') == []
+
+
+def test_sweep_deletes_jobs_of_dead_workers(tmp_path):
+    store = LocalStorage(str(tmp_path))
+    finished = _finished_job(IngestJobManager(store = store))
+    running = IngestJob('a' * 32, 3)
+    IngestJobManager(store = store)._sync(running)
+    store.put_bytes('ingest_jobs/not-a-job.json', b'{}')
+
+    sweeper = IngestJobManager(store = store, ttl = 60)
+    sweeper._sweep()
+    assert len(store.list_files('ingest_jobs/')) == 3
+
+    sweeper.ttl = -1
+    sweeper._sweep()
+    # Running jobs are kept until they have been stale for the TTL too
+    assert sorted(store.list_files('ingest_jobs/')) == [
+        f'ingest_jobs/{running.id}.json', 'ingest_jobs/not-a-job.json']
+    assert sweeper.status(finished.id) is None
@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from ingest_pipeline import IngestPipeline, PipelineStats
+from phash import NearDuplicateFilter
+
+
+def test_needs_one_upload_callable():
+    with pytest.raises(ValueError):
+        IngestPipeline()
+    with pytest.raises(ValueError):
+        IngestPipeline(lambda idx, frame: None,
+                       upload_many = lambda frames: {})
+
+
+def test_upload_many_batches_waiting_frames(video_path):
+    batches, lock = [], threading.Lock()
+
+    def upload_many(frames):
+        time.sleep(0.05)  # let frames queue up behind the upload
+        with lock:
+            batches.append([idx for idx, _ in frames])
+        return {idx: OSError('refused') if idx == 3 else frame.frame_num
+                for idx, frame in frames}
+
+    pipeline = IngestPipeline(upload_many = upload_many, processes = 1,
+                              upload_workers = 1, upload_batch_size = 4)
+    results = pipeline.run(video_path, list(range(0, 40, 2)))
+
+    assert sorted(idx for batch in batches for idx in batch) == list(range(20))
+    assert max(len(batch) for batch in batches) == 4
+    assert len(batches) < 20
+    # The failed frame is left out of the results
+    assert results == {idx: 2 * idx for idx in range(20) if idx != 3}
+    assert pipeline.stats['upload']['items'] == 20
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_frames_are_encoded_and_indexed_in_order(video_path, processes):
+    pipeline = IngestPipeline(lambda idx, frame: frame, processes = processes,
+                              height = 120)
+    results = pipeline.run(video_path, [1, 7, 20, 33, 59])
+
+    assert list(results) == [0, 1, 2, 3, 4]
+    assert [frame.frame_num for frame in results.values()] == [1, 7, 20, 33, 59]
+    assert pipeline.accepted == [1, 7, 20, 33, 59]
+    for frame in results.values():
+        assert frame.data[:3] == b'\xff\xd8\xff'
+        assert (frame.width, frame.height) == (160, 120)
+    assert pipeline.stats['upload']['items'] == 5
+    assert pipeline.stats['total_s'] > 0
+
+
+def test_in_process_and_process_pool_agree(video_path):
+    frame_numbers = list(range(0, 60, 6))
+    single = IngestPipeline(lambda idx, frame: frame, processes = 1)
+    pooled = IngestPipeline(lambda idx, frame: frame, processes = 2)
+    for a, b in zip(single.run(video_path, frame_numbers).values(),
+                    pooled.run(video_path, frame_numbers).values()):
+        assert (a.frame_num, a.phash, a.data) == (b.frame_num, b.phash, b.data)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_dedup_drops_frames_before_encoding(video_path, processes):
+    first = IngestPipeline(lambda idx, frame: frame, processes = 1)
+    hashes = [frame.phash for frame in first.run(video_path, [10, 30]).values()]
+
+    dedup = NearDuplicateFilter(4, hashes[:1])
+    pipeline = IngestPipeline(lambda idx, frame: frame.frame_num,
+                              processes = processes, dedup = dedup)
+    results = pipeline.run(video_path, [5, 10, 30, 50])
+    # Kept frames are numbered consecutively
+    assert results == {0: 5, 1: 30, 2: 50}
+    assert pipeline.accepted == [5, 30, 50]
+    assert pipeline.stats['rejected']['items'] == 1
+
+
+def test_failed_uploads_are_skipped(video_path):
+    def upload(idx, frame):
+        if idx == 1:
+            raise OSError('refused')
+        return idx
+
+    pipeline = IngestPipeline(upload, processes = 1)
+    assert pipeline.run(video_path, [0, 1, 2]) == {0: 0, 2: 2}
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_decode_errors_abort_the_run(video_path, processes):
+    pipeline = IngestPipeline(lambda idx, frame: idx, processes = processes)
+    with pytest.raises(ValueError):
+        pipeline.run(video_path, [10, 200])
+
+
+def test_pipeline_stats_are_summed():
+    stats = PipelineStats()
+    stats.add({'upload': {'items': 2, 'busy_s': 1.0}, 'total_s': 1.5})
+    stats.add({'upload': {'items': 3, 'busy_s': 0.5}, 'total_s': 1.0,
+               'rejected': {'items': 1}})
+    assert stats.stats() == {
+        'runs': 2, 'upload': {'items': 5, 'busy_s': 1.5}, 'total_s': 2.5,
+        'rejected': {'items': 1}}
@@ -0,0 +1,107 @@
+import uuid
+import pytest
+from meta_cache import FrameSetMeta, MetaCache
+
+PREFIX = 'frame_sets/fs/frames/'
+
+
+def _meta(num_frames: int, **frame_info) -> dict:
+    return {
+        'frame_set_id': 'fs',
+        'num_frames': num_frames,
+        'frame_numbers': [10 * idx for idx in range(num_frames)],
+        'frame_paths': {
+            str(idx): {'frame_idx': idx, 'frame_num': 10 * idx,
+                       'r2_key': f'{PREFIX}frame_{idx}.jpg',
+                       'width': 320, 'height': 240, **frame_info}
+            for idx in range(num_frames)}
+    }
+
+
+def test_compact_view():
+    meta = _meta(3, phash = '00000000000000ff')
+    frame_set_meta = FrameSetMeta(meta, PREFIX)
+    assert frame_set_meta.frame_info(1) == meta['frame_paths']['1']
+
+    del meta['frame_paths']['1']
+    frame_set_meta = FrameSetMeta(meta, PREFIX)
+    assert frame_set_meta.count == 3
+    assert frame_set_meta.get('num_frames') == 3
+    assert frame_set_meta.get('frame_paths') is None
+    assert frame_set_meta.frame_info(1) is None
+    assert frame_set_meta.frame_info(3) is None
+    assert frame_set_meta.frame_info(2)['r2_key'] == f'{PREFIX}frame_2.jpg'
+    # Keys following the layout are derived, not stored
+    assert frame_set_meta._r2_keys is None
+
+
+def test_stored_keys_and_pack_ranges():
+    meta = _meta(2)
+    for idx, info in meta['frame_paths'].items():
+        info.update(r2_key = f'{PREFIX}pack_0.bin', offset = 100 * int(idx),
+                    length = 100)
+    frame_set_meta = FrameSetMeta(meta, PREFIX)
+
+    assert frame_set_meta._r2_keys == [f'{PREFIX}pack_0.bin']
+    assert frame_set_meta.frame_info(1) == meta['frame_paths']['1']
+
+
+def test_lru_bounded_by_entries_and_size():
+    cache = MetaCache(max_entries = 2)
+    for frame_set_id in ('a', 'b'):
+        cache.put(frame_set_id, FrameSetMeta(_meta(1), PREFIX))
+    assert 'a' in cache  # now more recent than 'b'
+    cache.put('c', FrameSetMeta(_meta(1), PREFIX))
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+
+    small = FrameSetMeta(_meta(1), PREFIX)
+    cache = MetaCache(max_bytes = small.nbytes)
+    cache.put('a', small)
+    cache.put('b', FrameSetMeta(_meta(1), PREFIX))
+    assert cache.stats()['entries'] == 1 and 'b' in cache
+
+
+def test_entries_expire():
+    cache = MetaCache(ttl = -1)
+    cache.put('a', FrameSetMeta(_meta(1), PREFIX))
+    assert cache.get('a') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_needs_revalidation(monkeypatch):
+    frame_set_meta = FrameSetMeta(_meta(2), PREFIX, 'etag')
+    assert not frame_set_meta.needs_revalidation()
+    assert not frame_set_meta.needs_revalidation(min_count = 2)
+    assert frame_set_meta.needs_revalidation(min_count = 3)
+    monkeypatch.setattr('meta_cache.META_REVALIDATE_AFTER', -1)
+    assert frame_set_meta.needs_revalidation()
+
+
+def test_memory_copy_revalidated(api, monkeypatch):
+    frame_set_id = str(uuid.uuid4())
+    meta_key = f'{api.R2_FRAMESETS_PREFIX}/{frame_set_id}/meta.json'
+    assert api.storage_backend.upload_json(_meta(2), meta_key)
+    assert api._load_meta(frame_set_id).count == 2
+
+    # Another worker extends the frame set: the memory copy is trusted for
+    # a while, unless a frame past its end is asked for
+    assert api.storage_backend.upload_json(_meta(3), meta_key)
+    assert api._load_meta(frame_set_id).count == 2
+    assert api._load_meta(frame_set_id, min_count = 3).count == 3
+
+    assert api.storage_backend.upload_json(_meta(4), meta_key)
+    monkeypatch.setattr('meta_cache.META_REVALIDATE_AFTER', -1)
+    assert api._load_meta(frame_set_id).count == 4
+
+    # Unchanged: only the ETag is checked
+    downloads = []
+    download = api.storage_backend.download_json_with_etag
+    monkeypatch.setattr(api.storage_backend, 'download_json_with_etag',
+                        lambda key: downloads.append(key) or download(key))
+    assert api._load_meta(frame_set_id).count == 4
+    assert downloads == []
+
+    api.storage_backend.delete_file(meta_key)
+    with pytest.raises(FileNotFoundError):
+        api._load_meta(frame_set_id)
+    assert frame_set_id not in api.FRAME_SETS_META
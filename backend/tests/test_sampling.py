@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+import pytest
+from frame_index import FrameIndex
+from sampling import SAMPLERS, sample_frames
+
+
+@pytest.fixture(scope = 'module')
+def still_then_moving(tmp_path_factory) -> str:
+    """A clip whose first 40 frames are the same and last 20 all differ."""
+    path = str(tmp_path_factory.mktemp('videos') / 'still.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30,
+                             (320, 240))
+    rng = np.random.default_rng(1)
+    still = np.full((240, 320, 3), 128, dtype = np.uint8)
+    for i in range(60):
+        frame = still if i < 40 else cv2.resize(
+            rng.integers(0, 255, (6, 8, 3), dtype = np.uint8), (320, 240),
+            interpolation = cv2.INTER_NEAREST)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize('strategy', sorted(set(SAMPLERS) - {'diverse'}))
+def test_picks_distinct_available_frames(strategy):
+    exclude = set(range(0, 100, 3))
+    picks = sample_frames('unused.mp4', 100, 20, strategy, exclude)
+    assert len(picks) == 20
+    assert picks == sorted(set(picks))
+    assert not exclude & set(picks)
+    assert all(0 <= n < 100 for n in picks)
+
+
+def test_capped_at_available_frames():
+    assert sample_frames('unused.mp4', 10, 50, 'uniform', range(5)) == \
+        [5, 6, 7, 8, 9]
+    assert sample_frames('unused.mp4', 10, 5, 'random', range(10)) == []
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        sample_frames('unused.mp4', 10, 5, 'best')
+
+
+def test_uniform_and_stratified_spread():
+    assert sample_frames('unused.mp4', 100, 5, 'uniform') == [0, 25, 50, 74, 99]
+    picks = sample_frames('unused.mp4', 100, 10, 'stratified')
+    # One pick from each tenth of the video
+    assert [n // 10 for n in picks] == list(range(10))
+
+
+def test_keyframe_aligned():
+    index = FrameIndex(np.arange(100) * 40.0, [0, 25, 50, 75],
+                       np.zeros(100), np.ones(100), 25)
+    assert sample_frames('unused.mp4', 100, 3, 'keyframe-aligned',
+                         frame_index = index) == [0, 50, 75]
+    picks = sample_frames('unused.mp4', 100, 6, 'keyframe-aligned',
+                          frame_index = index)
+    assert {0, 25, 50, 75} < set(picks)
+
+
+def test_diverse_prefers_distinct_frames(still_then_moving):
+    picks = sample_frames(still_then_moving, 60, 10, 'diverse')
+    assert len(picks) == 10
+    # The still part contributes a single frame
+    assert sum(n < 40 for n in picks) <= 1
+
+
+def test_diverse_spreads_duplicates(still_then_moving):
+    # Mostly duplicates: after the distinct frames, picks are spread
+    # across the still part rather than taken from its start
+    picks = sample_frames(still_then_moving, 60, 40, 'diverse')
+    assert len(picks) == len(set(picks)) == 40
+    still = [n for n in picks if n < 40]
+    assert max(still) - min(still) > 30
+
+
+def test_diverse_past_end_of_stream(video_path):
+    # The header may claim more frames than the stream has
+    picks = sample_frames(video_path, 90, 10, 'diverse')
+    assert len(picks) == len(set(picks)) == 10
@@ -0,0 +1,44 @@
+import pytest
+from storage import LocalStorage
+
+
+@pytest.fixture(params = ['r2', 'local'])
+def storage(request, tmp_path):
+    if request.param == 'local':
+        return LocalStorage(str(tmp_path))
+    return request.getfixturevalue('api').storage_backend
+
+
+def test_put_many_and_get_many(storage):
+    items = {f'many/{i}.bin': bytes([i]) * (i + 1) for i in range(20)}
+    assert storage.put_many(items, 'application/octet-stream') == \
+        dict.fromkeys(items)
+
+    results = storage.get_many(list(items) + [('many/5.bin', 2, 3)])
+    assert {key: results[key] for key in items} == items
+    assert results[('many/5.bin', 2, 3)] == b'\x05' * 3
+    assert isinstance(storage.get_many(['many/missing.bin'])
+                      ['many/missing.bin'], Exception)
+
+
+def test_put_many_reports_failures(storage, monkeypatch):
+    put_bytes = storage.put_bytes
+    if hasattr(storage, 's3_client'):
+        put_object = storage.s3_client.put_object
+
+        def failing_put_object(**kwargs):
+            if kwargs['Key'].endswith('bad'):
+                raise OSError('refused')
+            return put_object(**kwargs)
+        monkeypatch.setattr(storage.s3_client, 'put_object', failing_put_object)
+    else:
+        def failing_put_bytes(key, data, content_type = None):
+            if key.endswith('bad'):
+                raise OSError('refused')
+            return put_bytes(key, data, content_type)
+        monkeypatch.setattr(storage, 'put_bytes', failing_put_bytes)
+
+    results = storage.put_many({'failing/good': b'1', 'failing/bad': b'2'})
+    assert results['failing/good'] is None
+    assert isinstance(results['failing/bad'], OSError)
+    assert storage.get_bytes('failing/good') == b'1'
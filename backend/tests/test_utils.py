@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import utils
+from frame_extractor import render_frame
+from video_processor import VideoProcessor
+
+
+def _annotations(points: dict, **dims) -> dict:
+    """Annotations of frame 3 with keypoints {name: (x, y)}."""
+    return {**dims, '3': {
+        name: {'x': x, 'y': y, 'not_visible': x is None}
+        for name, (x, y) in points.items()}}
+
+
+def test_scales_to_original_size():
+    df = utils.process_annotations(_annotations(
+        {'Left Knee': (10, 20), 'Nose': (100, 50), 'right_eye': (None, None)},
+        orig_width = 1920, orig_height = 1080, render_width = 960,
+        render_height = 540))
+
+    assert list(df.columns) == ['frame_num', 'keypoint_id', 'keypoint_name',
+                                'x', 'y', 'visible']
+    assert df['keypoint_name'].tolist() == ['nose', 'right_eye', 'left_knee']
+    assert df['keypoint_id'].tolist() == [0, 2, 13]
+    assert df['x'][[0, 2]].tolist() == [200, 20]
+    assert df['y'][[0, 2]].tolist() == [100, 40]
+    assert df['x'].isna().tolist() == [False, True, False]
+    assert df['visible'].tolist() == [True, False, True]
+
+
+@pytest.mark.parametrize('transform', [
+    {'crop': None, 'rotate': 90},
+    {'crop': {'width_perc': 0.5}, 'rotate': None},
+    {'crop': {'width_perc': 0.5, 'cropped_side': 'right'}, 'rotate': 180},
+    {'crop': {'width_px': 200, 'height_px': 150, 'from_center': False},
+     'rotate': 90},
+    {'crop': {'height_perc': 0.5, 'cropped_side': 'bottom'}, 'rotate': 90}])
+def test_maps_rendered_points_back_to_the_original_frame(video_path,
+                                                         transform):
+    processor = VideoProcessor(video_path)
+    processor.cap.release()
+    if transform['crop']:
+        transform['crop_box'] = processor.crop_box(**transform['crop'])
+    x_box, y_box, width, height = transform.get('crop_box') or (0, 0, 320, 240)
+
+    # Mark a point inside the rendered region of the original frame
+    x0, y0 = x_box + width // 3, y_box + height // 4
+    frame = np.zeros((240, 320, 3), dtype = np.uint8)
+    frame[y0 - 2:y0 + 2, x0 - 2:x0 + 2] = 255
+
+    # Where it lands after cropping, rotating and resizing
+    rendered = render_frame(frame, processor, 120, transform)
+    ys, xs = np.nonzero(rendered[..., 0] > 127)
+    df = utils.process_annotations(_annotations(
+        {'nose': (xs.mean() + 0.5, ys.mean() + 0.5)}, orig_width = 320,
+        orig_height = 240, render_width = rendered.shape[1],
+        render_height = rendered.shape[0], transform = transform))
+
+    assert df['x'][0] == pytest.approx(x0, abs = 2)
+    assert df['y'][0] == pytest.approx(y0, abs = 2)
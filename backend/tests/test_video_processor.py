@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+import pytest
+import video_processor
+from frame_index import FrameIndex
+from video_processor import VideoProcessor
+
+
+@pytest.fixture(scope = 'module')
+def all_frames(video_path) -> list[np.ndarray]:
+    """Every frame of the clip, read sequentially."""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while (frame := cap.read()[1]) is not None:
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def _iter(video_path, frame_numbers, frame_index = None) -> list:
+    processor = VideoProcessor(video_path, frame_index)
+    try:
+        return list(processor.iter_frames(frame_numbers))
+    finally:
+        processor.cap.release()
+
+
+@pytest.mark.parametrize('frame_numbers', [
+    [0, 1, 2], [5, 17, 18, 40, 59], [30, 10, 45]])
+def test_iter_frames_matches_sequential_read(video_path, all_frames,
+                                             frame_numbers):
+    frames = _iter(video_path, frame_numbers)
+    assert [n for n, _ in frames] == frame_numbers
+    for n, frame in frames:
+        assert np.array_equal(frame, all_frames[n])
+
+
+def test_iter_frames_seeks_over_gaps(video_path, all_frames, monkeypatch):
+    # Probe with a seek, then pick the cheaper of grabbing and seeking
+    monkeypatch.setattr(video_processor, '_SEEK_PROBE_GAP', 3)
+    frame_numbers = [0, 10, 12, 30, 31, 55]
+    for n, frame in _iter(video_path, frame_numbers):
+        assert np.array_equal(frame, all_frames[n])
+
+
+def test_iter_frames_with_frame_index(video_path, all_frames):
+    frame_index = FrameIndex.build(video_path)
+    if frame_index is None:
+        pytest.skip('The video backend cannot read raw packets')
+    frame_numbers = [3, 14, 15, 44, 58]
+    for n, frame in _iter(video_path, frame_numbers, frame_index):
+        assert np.array_equal(frame, all_frames[n])
+
+
+def test_iter_frames_past_the_end(video_path):
+    with pytest.raises(ValueError):
+        _iter(video_path, [58, 60])
+
+
+# ============================ BATCH TRANSFORMS ==============================
+
+@pytest.fixture
+def processor(video_path):
+    processor = VideoProcessor(video_path)
+    yield processor
+    processor.cap.release()
+
+
+@pytest.fixture(scope = 'module')
+def batch() -> np.ndarray:
+    rng = np.random.default_rng(2)
+    return rng.integers(0, 255, (3, 240, 320, 3), dtype = np.uint8)
+
+
+@pytest.mark.parametrize('crop, width, height, degrees', [
+    (None, None, 120, None),
+    ({'width_perc': 0.5}, None, None, None),
+    ({'width_px': 200, 'height_px': 100, 'from_center': False}, 100, None, 90),
+    ({'height_perc': 0.5, 'cropped_side': 'bottom'}, 160, 60, 180),
+    (None, None, None, 90)])
+def test_transform_batch_matches_single_frames(processor, batch, crop, width,
+                                               height, degrees):
+    transformed = processor.transform_batch(batch, crop, width, height, degrees)
+    for frame, result in zip(batch, transformed):
+        expected = processor.crop(frame, **crop) if crop else frame
+        if degrees == 90:
+            # The output size is given after rotation
+            expected = processor.resize(
+                expected, height, width) if width or height else expected
+        else:
+            expected = processor.resize(expected, width, height)
+        if degrees:
+            expected = processor.rotate(expected, degrees)
+        assert np.array_equal(result, expected)
+
+
+def test_batch_wrappers(processor, batch):
+    assert np.array_equal(processor.resize_batch(batch, height = 120)[1],
+                          processor.resize(batch[1], height = 120))
+    assert np.array_equal(processor.rotate_batch(batch, 90)[2],
+                          processor.rotate(batch[2], 90))
+    cropped = processor.crop_batch(batch, width_perc = 0.5)
+    assert cropped.shape == (3, 240, 160, 3)
+    assert np.shares_memory(cropped, batch)  # a view, not a copy
+
+
+def test_transform_batch_output_buffers(processor, batch):
+    first = processor.transform_batch(batch, height = 120)
+    # Pooled per shape: the next batch of that shape reuses the buffer
+    assert processor.transform_batch(batch[::-1], height = 120) is first
+
+    out = np.empty((3, 120, 160, 3), dtype = np.uint8)
+    assert processor.transform_batch(batch, height = 120, out = out) is out
+    with pytest.raises(ValueError):
+        processor.transform_batch(batch, height = 100, out = out)
+
+    # Nothing to do but a crop: the input view is returned as is
+    assert np.shares_memory(
+        processor.transform_batch(batch, {'width_perc': 0.5}), batch)
+
+
+@pytest.mark.parametrize('crop, box', [
+    ({}, (0, 0, 320, 240)),
+    ({'width_perc': 0.5}, (80, 0, 160, 240)),
+    ({'width_px': 100, 'height_px': 50, 'from_center': False}, (0, 0, 100, 50)),
+    ({'width_perc': 0.5, 'cropped_side': 'right'}, (160, 0, 160, 240)),
+    ({'height_perc': 0.25, 'cropped_side': 'bottom'}, (0, 180, 320, 60))])
+def test_crop_box(processor, batch, crop, box):
+    assert processor.crop_box(**crop) == box
+    x, y, width, height = box
+    assert np.array_equal(processor.crop(batch[0], **crop),
+                          batch[0][y:y + height, x:x + width])
@@ -9,7 +9,8 @@ def process_annotations(data: dict) -> pd.DataFrame:
     data : dict
         Annotations data with frame numbers as keys and keypoint data as
         values. Should also contain 'orig_width', 'orig_height',
-        'render_width', and 'render_height'.
+        'render_width', and 'render_height', and may contain the 'transform'
+        (crop and rotation) the frames were extracted with.
 
     Returns
     -------
@@ -22,6 +23,7 @@ def process_annotations(data: dict) -> pd.DataFrame:
     orig_height = data.pop('orig_height')
     render_width = data.pop('render_width')
     render_height = data.pop('render_height')
+    transform = data.pop('transform', None) or {}
 
     # Create long-format DataFrame
     records = []
@@ -60,15 +62,35 @@ def process_annotations(data: dict) -> pd.DataFrame:
     annotations_df['keypoint_id'] = annotations_df['keypoint_name'].map(
         keypoint_mapping)
 
+    # Region of the original frame that was rendered (before rotation)
+    crop_x, crop_y, crop_width, crop_height = transform.get('crop_box') or (
+        0, 0, orig_width, orig_height)
+    rotate = transform.get('rotate')
+
+    # Size of the rendered frame at original scale (after rotation)
+    if rotate == 90:
+        rotated_width, rotated_height = crop_height, crop_width
+    else:
+        rotated_width, rotated_height = crop_width, crop_height
+
     # Calculate scale factors for coordinate conversion
-    scale_x = orig_width / render_width if render_width else 1
-    scale_y = orig_height / render_height if render_height else 1
+    scale_x = rotated_width / render_width if render_width else 1
+    scale_y = rotated_height / render_height if render_height else 1
 
     # Rescale coordinates to original dimensions
-    annotations_df['x'] = (annotations_df['x'] * scale_x).apply(
-        lambda x: int(x) if pd.notna(x) else None)
-    annotations_df['y'] = (annotations_df['y'] * scale_y).apply(
-        lambda y: int(y) if pd.notna(y) else None)
+    x = annotations_df['x'] * scale_x
+    y = annotations_df['y'] * scale_y
+
+    # Undo the rotation, then the crop offset
+    if rotate == 90:
+        x, y = y, crop_height - x
+    elif rotate == 180:
+        x, y = crop_width - x, crop_height - y
+    x = x + crop_x
+    y = y + crop_y
+
+    annotations_df['x'] = x.apply(lambda x: int(x) if pd.notna(x) else None)
+    annotations_df['y'] = y.apply(lambda y: int(y) if pd.notna(y) else None)
 
     # Sort values and reorder columns
     annotations_df = annotations_df.sort_values(
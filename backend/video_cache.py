@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator
+import fcntl
+import glob
+import os
+import tempfile
+from disk_cache import prune_lru
+from storage.atomic import make_temp_file
+
+# Local copies of kept videos, for extending frame sets
+VIDEO_CACHE_DIR = os.getenv(
+    'VIDEO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pose-annotator-videos'))
+
+# Max total size of the cached videos (default: 10 GB)
+VIDEO_CACHE_BYTES = int(os.getenv('VIDEO_CACHE_MB', 10240)) * 1024 * 1024
+
+
+class VideoCache:
+    """
+    A size-bounded directory of downloaded videos, shared by all workers on
+    the machine. The least recently used videos are evicted once it is
+    full, except those in use: users hold a shared `flock` on the file,
+    and eviction only deletes a file it can lock exclusively.
+    """
+
+    def __init__(self, directory: str = VIDEO_CACHE_DIR,
+                 max_bytes: int = VIDEO_CACHE_BYTES):
+        """Initialize the VideoCache instance.
+
+        Attributes
+        ----------
+        directory : str
+            The cache directory; created on first use.
+        max_bytes : int
+            The max total size of the cached videos.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @contextmanager
+    def open(self, name: str,
+             download: Callable[[str], bool]) -> Iterator[str]:
+        """
+        Yield the path of the cached video `name`, downloading it with
+        `download(path)` if missing. It is not evicted until the block
+        exits, so it can be reopened by path (e.g. by worker processes).
+        """
+        path = os.path.join(self.directory, name)
+        while True:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                self._download(path, download)
+                continue
+
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                # Evicted between open() and flock(): fetch it again
+                if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                    raise FileNotFoundError(path)
+            except FileNotFoundError:
+                os.close(fd)
+                continue
+            break
+
+        try:
+            os.utime(path)  # mark as recently used
+            yield path
+        finally:
+            os.close(fd)
+
+    def _download(self, path: str, download: Callable[[str], bool]):
+        fd, temp_path = make_temp_file(self.directory)
+        os.close(fd)
+        try:
+            if not download(temp_path):
+                raise RuntimeError(f'Failed to download {os.path.basename(path)}')
+            # Atomic, so readers never see a partial file
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self.prune(keep = path)
+
+    def prune(self, keep: str = None):
+        """Evict the least recently used videos not in use while over the
+        max size."""
+        def evict(path: str) -> bool:
+            if path == keep:
+                return False
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False  # in use
+            else:
+                os.unlink(path)
+                return True
+            finally:
+                os.close(fd)
+
+        prune_lru(self.directory, self.max_bytes, evict)
+
+    def delete(self, prefix: str):
+        """Delete the cached videos whose name starts with `prefix`."""
+        for path in glob.glob(os.path.join(self.directory, f'{glob.escape(prefix)}*')):
+            try:
+                os.unlink(path)
+            except OSError as e:
+                print(f"Warning: Failed to delete cached video {path}: {e}")
@@ -1,14 +1,21 @@
-from typing import Literal, Optional, Union
+from typing import Iterable, Iterator, Literal, Optional, Union
 from os import path
+import threading
+import time
 import cv2
 import numpy as np
+from frame_index import FrameIndex
+
+# Gap (in frames) beyond which an unmeasured seek is tried in `iter_frames`
+_SEEK_PROBE_GAP = 250
 
 class VideoProcessor:
     """A class to process a video for the Pose Annotator."""
 
     def __init__(
         self,
-        video_path: str
+        video_path: str,
+        frame_index: Optional[FrameIndex] = None
     ):
         """Initialize the VideoProcessor instance.
 
@@ -16,19 +23,31 @@ class VideoProcessor:
         ----------
         video_path : str
             The path of the input video file.
+        frame_index : FrameIndex, optional
+            The keyframe index of the video, used to seek straight to the
+            nearest keyframe.
         """
         self.video_path = video_path
         self.video_file = path.basename(video_path)
+        self.frame_index = frame_index
         self.cap = cv2.VideoCapture(video_path)
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._buffers = threading.local()  # pooled batch output buffers
 
     def __repr__(self):
         """Return a string representation of the object."""
         return f"VideoProcessor object for '{self.video_file}' at " \
                f"{self.fps:.2f} Hz"
 
+    @property
+    def total_frames(self) -> int:
+        """The number of frames; exact if a frame index is available."""
+        if self.frame_index is not None:
+            return self.frame_index.total_frames
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
     def __timestamp_to_frame(self, timestamp: str) -> int:
         """Convert a timestamp ('MM:SS' or 'MM:SS:MS') to a frame number."""
         time_components = timestamp.split(':')
@@ -75,6 +94,90 @@ class VideoProcessor:
             raise ValueError(f"No frame found.")
         return frame
 
+    def iter_frames(
+        self,
+        frame_numbers: Iterable[int]
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Retrieve multiple frames in a single pass over the video.
+
+        Parameters
+        ----------
+        frame_numbers : iterable of int
+            The frame indices to retrieve, in ascending order.
+
+        Yields
+        ------
+        frame_number, frame : tuple[int, np.ndarray]
+            The frame index and the corresponding video frame.
+
+        Notes
+        -----
+        Frames between two requested indices are skipped with `grab()`,
+        which decodes without converting to a NumPy array, and only the
+        requested frames are `retrieve()`-d. With a frame index, a seek
+        goes to the last keyframe before a requested frame whenever that
+        keyframe lies past the current position. Without one, a large gap is
+        sought over (OpenCV restarts decoding from the keyframe before the
+        target) until the costs of grabbing and seeking have been measured;
+        after that, the cheaper option is taken.
+        """
+        grab_cost = None  # average seconds per grab()
+        seek_cost = None  # average seconds per set()
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+        for frame_number in frame_numbers:
+            gap = frame_number - position
+            keyframe = None
+            if self.frame_index is not None:
+                keyframe = self.frame_index.keyframe_before(frame_number)
+
+            # Seek when going backwards, or when the index or the measured
+            # costs say grabbing through the gap is slower than jumping over
+            # it. Until both costs have been measured, seek once the gap is
+            # large (e.g. straight to the start of a range in the middle of
+            # the video).
+            if gap < 0:
+                do_seek = True
+            elif keyframe is not None:
+                do_seek = keyframe > position
+            elif gap == 0:
+                do_seek = False
+            elif grab_cost is None or seek_cost is None:
+                do_seek = gap > _SEEK_PROBE_GAP
+            else:
+                do_seek = gap * grab_cost > seek_cost
+
+            if do_seek:
+                # Land on the keyframe if known, else let OpenCV find it
+                target = frame_number if keyframe is None else keyframe
+                start = time.perf_counter()
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                elapsed = time.perf_counter() - start
+                seek_cost = elapsed if seek_cost is None else \
+                    0.5 * (seek_cost + elapsed)
+                gap = frame_number - target
+
+            # Skip to the requested frame, then grab it
+            start = time.perf_counter()
+            ret = True
+            for _ in range(gap + 1):
+                ret = self.cap.grab()
+                if not ret:
+                    break
+            elapsed = (time.perf_counter() - start) / (gap + 1)
+            grab_cost = elapsed if grab_cost is None else \
+                0.5 * (grab_cost + elapsed)
+
+            if not ret:
+                raise ValueError(f"No frame found at {frame_number}.")
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                raise ValueError(f"No frame found at {frame_number}.")
+
+            position = frame_number + 1
+            yield frame_number, frame
+
     def resize(
         self,
         frames: Union[np.ndarray, list[np.ndarray]],
@@ -115,24 +218,11 @@ class VideoProcessor:
 
         resized_frames = []
         for frame in frames:
-
-            # Get original dimensions
-            original_height, original_width = frame.shape[:2]
-
             if width is None and height is None:
                 resized = frame
             else:
-                # Calculate missing dimension to maintain aspect ratio
-                if width is None:
-                    aspect_ratio = original_width / original_height
-                    calc_width = int(height * aspect_ratio)
-                    resized = cv2.resize(frame, (calc_width, height))
-                elif height is None:
-                    aspect_ratio = original_width / original_height
-                    calc_height = int(width / aspect_ratio)
-                    resized = cv2.resize(frame, (width, calc_height))
-                else:
-                    resized = cv2.resize(frame, (width, height))
+                size = self._resize_shape(*frame.shape[:2], width, height)
+                resized = cv2.resize(frame, size)
             resized_frames.append(resized)
         return resized_frames if is_list else resized_frames[0]
 
@@ -185,54 +275,12 @@ class VideoProcessor:
 
         cropped_frames = []
         for frame in frames:
-            frame_height, frame_width = frame.shape[:2]
-
-            # Calculate crop width
-            if width_px is not None:
-                crop_width = min(width_px, frame_width)
-            elif width_perc is not None:
-                crop_width = int(frame_width * width_perc)
-            else:
-                crop_width = frame_width
-
-            # Calculate crop height
-            if height_px is not None:
-                crop_height = min(height_px, frame_height)
-            elif height_perc is not None:
-                crop_height = int(frame_height * height_perc)
-            else:
-                crop_height = frame_height
-
-            # Calculate crop coordinates based on cropped_side
-            if cropped_side:
-                if cropped_side == 'left':
-                    x_start = 0
-                    y_start = 0
-                elif cropped_side == 'right':
-                    x_start = frame_width - crop_width
-                    y_start = 0
-                elif cropped_side == 'top':
-                    x_start = 0
-                    y_start = 0
-                elif cropped_side == 'bottom':
-                    x_start = 0
-                    y_start = frame_height - crop_height
-                else:
-                    raise ValueError(
-                        f"Invalid cropped_side: {cropped_side}. "
-                        f"Must be 'left', 'right', 'top', or 'bottom'.")
-            elif from_center:
-                x_start = (frame_width - crop_width) // 2
-                y_start = (frame_height - crop_height) // 2
-            else:
-                x_start = 0
-                y_start = 0
-
-            x_end = x_start + crop_width
-            y_end = y_start + crop_height
+            rows, cols = self._crop_window(
+                *frame.shape[:2], width_perc, height_perc, width_px,
+                height_px, from_center, cropped_side)
 
             # Perform the crop
-            cropped = frame[y_start:y_end, x_start:x_end]
+            cropped = frame[rows, cols]
             cropped_frames.append(cropped)
 
         return cropped_frames if is_list else cropped_frames[0]
@@ -260,16 +308,308 @@ class VideoProcessor:
         """
 
         # Set the rotation code
-        if degrees == 90:
-            rotation_code = cv2.ROTATE_90_CLOCKWISE
-        elif degrees == 180:
-            rotation_code = cv2.ROTATE_180
-        else:
-            raise ValueError(f'`degrees` must be 90 or 180.')
+        rotation_code = self._rotation_code(degrees)
 
         # Rotate frame(s)
         if isinstance(frames, np.ndarray):
             rotated = cv2.rotate(frames, rotation_code)
         else:
             rotated = [cv2.rotate(frame, rotation_code) for frame in frames]
-        return rotated
\ No newline at end of file
+        return rotated
+
+    def crop_box(
+        self,
+        width_perc: Optional[float] = None,
+        height_perc: Optional[float] = None,
+        width_px: Optional[int] = None,
+        height_px: Optional[int] = None,
+        from_center: bool = True,
+        cropped_side: Optional[str] = None
+    ) -> tuple[int, int, int, int]:
+        """
+        Return the crop window `crop` would take from this video's frames.
+
+        Parameters are the same as for `crop`.
+
+        Returns
+        -------
+        x, y, width, height : tuple[int, int, int, int]
+            The top-left corner and size of the crop in original pixels.
+        """
+        rows, cols = self._crop_window(
+            self.height, self.width, width_perc, height_perc, width_px,
+            height_px, from_center, cropped_side)
+        return cols.start, rows.start, cols.stop - cols.start, \
+            rows.stop - rows.start
+
+    # ============================ BATCH TRANSFORMS ==========================
+    # The batch variants take an (N, H, W, 3) uint8 array, compute geometry
+    # once per batch and write into `out` if given, or else into a buffer
+    # pooled per thread and per shape. A pooled result is only valid until
+    # the next batch call of the same shape on the same thread.
+
+    def resize_batch(
+        self,
+        frames: np.ndarray,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Resize a batch of video frames to specified dimensions.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            The input frames as an (N, H, W, 3) array.
+        width : int, optional
+            The target width in pixels (see `resize`).
+        height : int, optional
+            The target height in pixels (see `resize`).
+        out : np.ndarray, optional
+            An (N, height, width, 3) array to write the result into.
+
+        Returns
+        -------
+        resized_frames : np.ndarray
+            The resized frames as an (N, height, width, 3) array.
+        """
+        return self.transform_batch(frames, width = width, height = height,
+                                    out = out)
+
+    def crop_batch(
+        self,
+        frames: np.ndarray,
+        width_perc: Optional[float] = None,
+        height_perc: Optional[float] = None,
+        width_px: Optional[int] = None,
+        height_px: Optional[int] = None,
+        from_center: bool = True,
+        cropped_side: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Crop a batch of video frames to specified dimensions.
+
+        Parameters are the same as for `crop`, with `frames` given as an
+        (N, H, W, 3) array.
+
+        Returns
+        -------
+        cropped_frames : np.ndarray
+            A zero-copy view of the cropped region of every frame.
+        """
+        rows, cols = self._crop_window(
+            *frames.shape[1:3], width_perc, height_perc, width_px, height_px,
+            from_center, cropped_side)
+        return frames[:, rows, cols]
+
+    def rotate_batch(
+        self,
+        frames: np.ndarray,
+        degrees: Literal[90, 180] = 180,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Rotate a batch of video frames by 90° or 180°.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            The input frames as an (N, H, W, 3) array.
+        degrees : int, optional
+            The number of degrees to rotate the frames. Must be either 90 or
+            180; by default, 180.
+        out : np.ndarray, optional
+            An array of the rotated shape to write the result into.
+
+        Returns
+        -------
+        rotated : np.ndarray
+            The rotated frames.
+        """
+        return self.transform_batch(frames, degrees = degrees, out = out)
+
+    def transform_batch(
+        self,
+        frames: np.ndarray,
+        crop: Optional[dict] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        degrees: Optional[Literal[90, 180]] = None,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Crop, resize and rotate a batch of video frames in a single pass.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            The input frames as an (N, H, W, 3) array.
+        crop : dict, optional
+            Keyword arguments for `crop` (`width_perc`, `height_perc`,
+            `width_px`, `height_px`, `from_center`, `cropped_side`).
+        width : int, optional
+            The output width in pixels, after rotation.
+        height : int, optional
+            The output height in pixels, after rotation. As with `resize`,
+            a missing dimension is calculated to maintain aspect ratio.
+        degrees : int, optional
+            Rotate the frames by 90 or 180 degrees after resizing.
+        out : np.ndarray, optional
+            An array of the output shape to write the result into.
+
+        Returns
+        -------
+        transformed : np.ndarray
+            The transformed frames as an (N, height, width, 3) array.
+        """
+        # Geometry is computed once for the whole batch
+        if crop:
+            frames = self.crop_batch(frames, **crop)
+        n, frame_height, frame_width = frames.shape[:3]
+
+        rotation_code = None if degrees is None else \
+            self._rotation_code(degrees)
+        swap = degrees == 90
+
+        # Output size after rotation; the frame is resized to its
+        # pre-rotation equivalent
+        if swap:
+            frame_height, frame_width = frame_width, frame_height
+        if width is None and height is None:
+            out_width, out_height = frame_width, frame_height
+        else:
+            out_width, out_height = self._resize_shape(
+                frame_height, frame_width, width, height)
+        resize_size = (out_height, out_width) if swap else \
+            (out_width, out_height)
+        needs_resize = resize_size != frames.shape[1:3][::-1]
+
+        if rotation_code is None and not needs_resize:
+            # Nothing to do beyond the (zero-copy) crop
+            if out is None:
+                return frames
+            out[...] = frames
+            return out
+
+        out_shape = (n, out_height, out_width) + frames.shape[3:]
+        if out is None:
+            out = self._buffer(out_shape, frames.dtype)
+        elif out.shape != out_shape:
+            raise ValueError(
+                f"`out` has shape {out.shape}, expected {out_shape}.")
+
+        # Intermediate buffer for resize-then-rotate
+        scratch = None
+        if needs_resize and rotation_code is not None:
+            scratch = self._buffer(
+                (resize_size[1], resize_size[0]) + frames.shape[3:],
+                frames.dtype, slot = 'scratch')
+
+        for i in range(n):
+            frame = frames[i]
+            if needs_resize:
+                dst = out[i] if rotation_code is None else scratch
+                frame = cv2.resize(frame, resize_size, dst = dst)
+            if rotation_code is not None:
+                cv2.rotate(frame, rotation_code, dst = out[i])
+        return out
+
+    # ================================ HELPERS ===============================
+    @staticmethod
+    def _resize_shape(
+        frame_height: int,
+        frame_width: int,
+        width: Optional[int],
+        height: Optional[int]
+    ) -> tuple[int, int]:
+        """Return the (width, height) a frame is resized to."""
+        # Calculate missing dimension to maintain aspect ratio
+        aspect_ratio = frame_width / frame_height
+        if width is None:
+            return int(height * aspect_ratio), height
+        if height is None:
+            return width, int(width / aspect_ratio)
+        return width, height
+
+    @staticmethod
+    def _crop_window(
+        frame_height: int,
+        frame_width: int,
+        width_perc: Optional[float] = None,
+        height_perc: Optional[float] = None,
+        width_px: Optional[int] = None,
+        height_px: Optional[int] = None,
+        from_center: bool = True,
+        cropped_side: Optional[str] = None
+    ) -> tuple[slice, slice]:
+        """Return the (rows, columns) slices of a crop (see `crop`)."""
+        # Calculate crop width
+        if width_px is not None:
+            crop_width = min(width_px, frame_width)
+        elif width_perc is not None:
+            crop_width = int(frame_width * width_perc)
+        else:
+            crop_width = frame_width
+
+        # Calculate crop height
+        if height_px is not None:
+            crop_height = min(height_px, frame_height)
+        elif height_perc is not None:
+            crop_height = int(frame_height * height_perc)
+        else:
+            crop_height = frame_height
+
+        # Calculate crop coordinates based on cropped_side
+        if cropped_side:
+            if cropped_side == 'left':
+                x_start = 0
+                y_start = 0
+            elif cropped_side == 'right':
+                x_start = frame_width - crop_width
+                y_start = 0
+            elif cropped_side == 'top':
+                x_start = 0
+                y_start = 0
+            elif cropped_side == 'bottom':
+                x_start = 0
+                y_start = frame_height - crop_height
+            else:
+                raise ValueError(
+                    f"Invalid cropped_side: {cropped_side}. "
+                    f"Must be 'left', 'right', 'top', or 'bottom'.")
+        elif from_center:
+            x_start = (frame_width - crop_width) // 2
+            y_start = (frame_height - crop_height) // 2
+        else:
+            x_start = 0
+            y_start = 0
+
+        x_end = x_start + crop_width
+        y_end = y_start + crop_height
+
+        return slice(y_start, y_end), slice(x_start, x_end)
+
+    @staticmethod
+    def _rotation_code(degrees: int) -> int:
+        """Return the OpenCV rotation code for 90° or 180°."""
+        if degrees == 90:
+            return cv2.ROTATE_90_CLOCKWISE
+        elif degrees == 180:
+            return cv2.ROTATE_180
+        raise ValueError(f'`degrees` must be 90 or 180.')
+
+    def _buffer(
+        self,
+        shape: tuple[int, ...],
+        dtype: np.dtype,
+        slot: str = 'out'
+    ) -> np.ndarray:
+        """Return a pooled array of the given shape for the current thread."""
+        pool = getattr(self._buffers, 'pool', None)
+        if pool is None:
+            pool = self._buffers.pool = {}
+        key = (slot, shape, np.dtype(dtype))
+        if key not in pool:
+            pool[key] = np.empty(shape, dtype = dtype)
+        return pool[key]
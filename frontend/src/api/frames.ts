@@ -0,0 +1,5 @@
+const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+
+// Frame URLs are either API paths or absolute (presigned) storage URLs
+export const frameSrc = (frameUrl: string) =>
+  /^https?:\/\//.test(frameUrl) ? frameUrl : `${API_URL}${frameUrl}`;
@@ -9,6 +9,7 @@ import { BODY_PART } from "../../constants/constants";
 import type { BodyPartAnnotations } from "../../constants/types";
 import { useMutation } from "@tanstack/react-query";
 import { saveAnnotations } from "../../api/annotations";
+import { frameSrc } from "../../api/frames";
 import useTokenContext from "../../providers/useTokenContext";
 
 interface CanvasControl {
@@ -48,12 +49,12 @@ const Toolbar = () => {
 
   const fetchFrame = async (frame_set_id: string, frameIdx: number) => {
     const response = await fetch(
-      `${API_URL}/frame-set/${frame_set_id}/frame?index=${frameIdx}`,
+      `${API_URL}/frame-set/${frame_set_id}/frame/${frameIdx}`,
     );
     if (!response.ok) throw new Error("Failed to fetch frame");
 
     const data = await response.json();
-    setCurrentFrame(data.frame_img);
+    setCurrentFrame(frameSrc(data.frame_url));
     setCurrentFrameNumber(data.frame_num);
     setCurrentFrameIdx(data.frame_idx);
 
@@ -136,14 +137,23 @@ const Toolbar = () => {
     // Send annotations to the backend for CSV conversion
     const json = JSON.stringify(annotations);
 
+    // The frame set's crop/rotation is undone so coordinates refer to the
+    // original video
+    const query = videoData?.frame_set_id
+      ? `?frame_set_id=${encodeURIComponent(videoData.frame_set_id)}`
+      : "";
+
     try {
-      const response = await fetch(`${API_URL}/annotations/export-csv`, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
+      const response = await fetch(
+        `${API_URL}/annotations/export-csv${query}`,
+        {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: json,
         },
-        body: json,
-      });
+      );
 
       if (!response.ok) throw new Error("Failed to export annotations as CSV");
 
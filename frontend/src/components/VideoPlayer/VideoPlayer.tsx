@@ -9,6 +9,7 @@ import AlertIcon from "../../assets/alert.svg";
 import useAutoSave from "../../hooks/useAutoSave";
 import SessionLoader from "../SessionLoader/SessionLoader";
 import toast from "react-hot-toast";
+import { frameSrc } from "../../api/frames";
 
 interface Coordinates {
   x: number;
@@ -17,6 +18,23 @@ interface Coordinates {
 
 const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
+const INGEST_POLL_INTERVAL_MS = 1000;
+
+const waitForIngestJob = async (jobId: string) => {
+  for (;;) {
+    const response = await fetch(`${API_URL}/frame-set/jobs/${jobId}`);
+    if (!response.ok) throw new Error("Failed to get upload status");
+
+    const job = await response.json();
+    if (job.status === "completed") return job.result;
+    if (job.status === "failed") throw new Error(job.error);
+
+    await new Promise((resolve) =>
+      setTimeout(resolve, INGEST_POLL_INTERVAL_MS),
+    );
+  }
+};
+
 const VideoPlayer = () => {
   const {
     videoData,
@@ -63,12 +81,16 @@ const VideoPlayer = () => {
     });
     if (!response.ok) throw new Error("Failed to upload video");
 
-    const data = await response.json();
+    // Frames are extracted by a background job; wait for it to finish
+    let data = await response.json();
+    if (response.status === 202) {
+      data = await waitForIngestJob(data.job_id);
+    }
     setVideoData(data);
     setFrames(data.frame_numbers);
     setNumOfFrames(data.frame_numbers.length);
 
-    setCurrentFrame(data.first_frame.frame_img);
+    setCurrentFrame(frameSrc(data.first_frame.frame_url));
     setCurrentFrameIdx(data.first_frame.frame_idx);
     setCurrentFrameNumber(data.first_frame.frame_num);
 
@@ -118,7 +140,7 @@ const VideoPlayer = () => {
 
       // Load the last annotated frame (or first frame if not found)
       const frameResponse = await fetch(
-        `${API_URL}/frame-set/${frameSetId}/frame?index=${targetFrameIdx}`,
+        `${API_URL}/frame-set/${frameSetId}/frame/${targetFrameIdx}`,
       );
       if (!frameResponse.ok) throw new Error("Failed to load frame");
 
@@ -130,7 +152,7 @@ const VideoPlayer = () => {
         first_frame: {
           frame_idx: frameData.frame_idx,
           frame_num: frameData.frame_num,
-          frame_img: frameData.frame_img,
+          frame_url: frameData.frame_url,
           width: frameData.render_width,
           height: frameData.render_height,
         },
@@ -140,7 +162,7 @@ const VideoPlayer = () => {
 
       setFrames(frameSetData.frame_numbers);
       setNumOfFrames(frameSetData.frame_numbers.length);
-      setCurrentFrame(frameData.frame_img);
+      setCurrentFrame(frameSrc(frameData.frame_url));
       setCurrentFrameIdx(frameData.frame_idx);
       setCurrentFrameNumber(frameData.frame_num);
 
@@ -264,7 +286,7 @@ const VideoPlayer = () => {
         <div className="mt-18">
           <div className="relative mt-8 mx-auto w-fit leading-[0]">
             <img
-              src={`data:image/jpeg;base64,${currentFrame}`}
+              src={currentFrame}
               alt={`Frame ${currentFrameNumber}`}
               className="h-auto max-h-[90vh] shadow-lg"
               ref={imgRef}
@@ -8,7 +8,8 @@ import {
 
 interface FirstFrame {
   frame_idx: number;
-  frame_img: string;
+  frame_img?: string;
+  frame_url: string;
   frame_num: number;
   height: number;
   width: number;